@@ -5,8 +5,8 @@ a = Analysis(
     ['launcher.py'],
     pathex=[],
     binaries=[],
-    datas=[('config.py', '.'), ('token.txt', '.'), ('api_client.py', '.'), ('scraper.py', '.'), ('dispatcher.py', '.'), ('enhanced_scraper.py', '.'), ('real_api_scraper.py', '.'), ('gui_dispatcher.py', '.'), ('gui_scraper.py', '.')],
-    hiddenimports=['tkinter', 'tkinter.ttk', 'tkinter.messagebox', 'tkinter.filedialog', 'tkinter.scrolledtext', 'api_client', 'scraper', 'dispatcher', 'enhanced_scraper', 'real_api_scraper', 'gui_dispatcher', 'gui_scraper', 'pandas', 'openpyxl', 'requests', 'pytz', 'concurrent.futures'],
+    datas=[('config.py', '.'), ('token.txt', '.'), ('api_client.py', '.'), ('scraper.py', '.'), ('dispatcher.py', '.'), ('enhanced_scraper.py', '.'), ('real_api_scraper.py', '.'), ('gui_dispatcher.py', '.'), ('gui_scraper.py', '.'), ('ride_cache.py', '.'), ('async_api_client.py', '.'), ('ride_sync.py', '.'), ('withdraw_scheduler.py', '.'), ('pipeline.py', '.'), ('driver_directory.py', '.'), ('billing_excel.py', '.'), ('snapshot_store.py', '.'), ('billing_engine.py', '.'), ('price_extractor.py', '.'), ('scrape_journal.py', '.'), ('log_sink.py', '.'), ('log_files.py', '.'), ('job_runner.py', '.'), ('schedule_engine.py', '.'), ('time_utils.py', '.'), ('ride_index.py', '.')],
+    hiddenimports=['tkinter', 'tkinter.ttk', 'tkinter.messagebox', 'tkinter.filedialog', 'tkinter.scrolledtext', 'api_client', 'scraper', 'dispatcher', 'enhanced_scraper', 'real_api_scraper', 'gui_dispatcher', 'gui_scraper', 'ride_cache', 'async_api_client', 'ride_sync', 'withdraw_scheduler', 'pipeline', 'driver_directory', 'billing_excel', 'snapshot_store', 'billing_engine', 'price_extractor', 'scrape_journal', 'log_sink', 'log_files', 'job_runner', 'schedule_engine', 'time_utils', 'ride_index', 'pandas', 'openpyxl', 'requests', 'pytz', 'concurrent.futures'],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
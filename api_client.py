@@ -4,8 +4,13 @@ API客户端 - 处理所有与调度系统的API交互
 
 import requests
 import logging
+import random
+import threading
+import time
 from typing import Dict, Any, Optional
 from datetime import datetime
+from email.utils import parsedate_to_datetime
+from log_files import log_file_handler
 import config
 
 # 配置日志
@@ -13,7 +18,7 @@ logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
     handlers=[
-        logging.FileHandler(config.LOG_FILE, encoding='utf-8'),
+        log_file_handler(),  # 按大小轮转并压缩旧日志
         logging.StreamHandler()
     ]
 )
@@ -21,6 +26,118 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+# 需要退避重试的HTTP状态码
+RETRY_STATUSES = {429, 502, 503, 504}
+
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """解析Retry-After响应头（秒数或HTTP日期）"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+        return max(0.0, retry_at.timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _backoff_delay(attempt: int, base: float = 0.5, cap: float = 30.0) -> float:
+    """指数退避 + 随机抖动"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class AdaptiveRateLimiter:
+    """
+    自适应令牌桶限速器
+    
+    服务器响应正常时逐步提高速率；遇到限流/5xx错误或响应延迟明显升高时降低速率。
+    """
+    
+    def __init__(self, rate: float = None, min_rate: float = None, max_rate: float = None):
+        """
+        初始化限速器
+        
+        Args:
+            rate: 初始速率（请求/秒）
+            min_rate: 最低速率
+            max_rate: 最高速率
+        """
+        self.rate = rate or getattr(config, 'RATE_LIMIT_INITIAL', 10.0)
+        self.min_rate = min_rate or getattr(config, 'RATE_LIMIT_MIN', 1.0)
+        self.max_rate = max_rate or getattr(config, 'RATE_LIMIT_MAX', 50.0)
+        self.tokens = max(1.0, self.rate)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._latency = None
+        self._baseline_latency = None
+        self._lock = threading.Lock()
+    
+    def try_acquire(self) -> float:
+        """
+        尝试获取一个令牌（不阻塞，异步客户端用 asyncio.sleep 等待）
+        
+        Returns:
+            0表示已获取，否则为需要等待的秒数
+        """
+        with self._lock:
+            now = time.monotonic()
+            if now < self._blocked_until:
+                return self._blocked_until - now
+            capacity = max(1.0, self.rate)
+            self.tokens = min(capacity, self.tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+    
+    def acquire(self):
+        """获取一个令牌，必要时阻塞等待"""
+        while True:
+            wait = self.try_acquire()
+            if wait <= 0:
+                return
+            time.sleep(wait)
+    
+    def on_success(self, latency: float):
+        """
+        记录一次成功请求
+        
+        Args:
+            latency: 请求耗时（秒）
+        """
+        with self._lock:
+            self._latency = latency if self._latency is None else self._latency * 0.8 + latency * 0.2
+            if self._baseline_latency is None or self._latency < self._baseline_latency:
+                self._baseline_latency = self._latency
+            else:
+                # 基线缓慢跟随，避免服务器整体变慢后一直处于降速状态
+                self._baseline_latency += (self._latency - self._baseline_latency) * 0.01
+            
+            if self._latency > self._baseline_latency * 2 and self._latency > 0.5:
+                self.rate = max(self.min_rate, self.rate * 0.9)
+            else:
+                self.rate = min(self.max_rate, self.rate + 0.5)
+    
+    def on_throttle(self, retry_after: float = None):
+        """
+        记录一次限流/服务器错误，速率减半
+        
+        Args:
+            retry_after: 服务器要求的等待时间（秒）
+        """
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate * 0.5)
+            self.tokens = min(self.tokens, 1.0)
+            if retry_after:
+                self._blocked_until = max(self._blocked_until, time.monotonic() + retry_after)
+            logger.info(f"请求降速: {self.rate:.1f} 次/秒")
+
+
 class APIClient:
     """调度系统API客户端"""
     
@@ -34,6 +151,7 @@ class APIClient:
         self.base_url = config.API_BASE_URL
         self.token = (token or config.BEARER_TOKEN).strip()
         self.session = requests.Session()
+        self.rate_limiter = AdaptiveRateLimiter()
         self._setup_headers()
         logger.info("API客户端初始化成功")
     
@@ -68,6 +186,9 @@ class APIClient:
         """
         发起HTTP请求
         
+        所有请求先经过自适应限速器；遇到 429/502/503/504 时按 Retry-After 或
+        指数退避（带随机抖动）重试，最多重试 config.MAX_RETRIES 次。
+        
         Args:
             method: HTTP方法 (GET, POST, PUT, DELETE等)
             endpoint: API端点
@@ -79,38 +200,66 @@ class APIClient:
             响应数据字典
         """
         url = f"{self.base_url}{endpoint}"
+        max_retries = getattr(config, 'MAX_RETRIES', 3)
+        # POST不是幂等操作，只在服务器明确拒绝处理（429/503）时重试
+        retry_statuses = RETRY_STATUSES if method.upper() != 'POST' else {429, 503}
         
-        try:
-            response = self.session.request(
-                method=method,
-                url=url,
-                params=params,
-                data=data,
-                json=json_data,
-                timeout=config.REQUEST_TIMEOUT
-            )
-            
-            response.raise_for_status()
-            
-            logger.info(f"{method} {endpoint} - 状态码: {response.status_code}")
+        attempt = 0
+        while True:
+            self.rate_limiter.acquire()
+            started = time.monotonic()
             
             try:
-                return response.json()
-            except ValueError:
-                return {"success": True, "data": response.text}
+                response = self.session.request(
+                    method=method,
+                    url=url,
+                    params=params,
+                    data=data,
+                    json=json_data,
+                    timeout=config.REQUEST_TIMEOUT
+                )
                 
-        except requests.exceptions.HTTPError as e:
-            logger.error(f"HTTP错误: {e} - {response.text if 'response' in locals() else ''}")
-            raise
-        except requests.exceptions.ConnectionError as e:
-            logger.error(f"连接错误: {e}")
-            raise
-        except requests.exceptions.Timeout as e:
-            logger.error(f"请求超时: {e}")
-            raise
-        except requests.exceptions.RequestException as e:
-            logger.error(f"请求异常: {e}")
-            raise
+                if response.status_code in retry_statuses:
+                    retry_after = _parse_retry_after(response.headers.get('Retry-After'))
+                    self.rate_limiter.on_throttle(retry_after)
+                    if attempt < max_retries:
+                        delay = retry_after if retry_after is not None else _backoff_delay(attempt)
+                        logger.warning(f"{method} {endpoint} - 状态码: {response.status_code}，"
+                                       f"{delay:.1f}秒后重试 ({attempt + 1}/{max_retries})")
+                        time.sleep(delay)
+                        attempt += 1
+                        continue
+                elif response.status_code < 500:
+                    self.rate_limiter.on_success(time.monotonic() - started)
+                
+                response.raise_for_status()
+                
+                logger.info(f"{method} {endpoint} - 状态码: {response.status_code}")
+                
+                try:
+                    return response.json()
+                except ValueError:
+                    return {"success": True, "data": response.text}
+                    
+            except requests.exceptions.HTTPError as e:
+                logger.error(f"HTTP错误: {e} - {response.text if 'response' in locals() else ''}")
+                raise
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                self.rate_limiter.on_throttle()
+                if method.upper() == 'GET' and attempt < max_retries:
+                    delay = _backoff_delay(attempt)
+                    logger.warning(f"{method} {endpoint} - {type(e).__name__}，{delay:.1f}秒后重试 ({attempt + 1}/{max_retries})")
+                    time.sleep(delay)
+                    attempt += 1
+                    continue
+                if isinstance(e, requests.exceptions.Timeout):
+                    logger.error(f"请求超时: {e}")
+                else:
+                    logger.error(f"连接错误: {e}")
+                raise
+            except requests.exceptions.RequestException as e:
+                logger.error(f"请求异常: {e}")
+                raise
     
     def get(self, endpoint: str, params: Optional[Dict] = None) -> Dict[str, Any]:
         """GET请求"""
@@ -0,0 +1,271 @@
+"""
+异步API客户端 - 基于asyncio/aiohttp的高并发请求后端
+所有请求共享一个连接池，由全局并发上限和按端点的并发上限控制，
+大量订单详情请求可以在一个事件循环中完成，无需为每个批次创建线程池。
+请求速率与同步APIClient共用同一个自适应限速器，429/5xx 按相同规则退避重试。
+"""
+
+import asyncio
+import json
+import re
+import time
+import logging
+from typing import Dict, Any, Optional, List
+import config
+
+logger = logging.getLogger(__name__)
+
+# 默认并发配置（可在config.py中覆盖）
+DEFAULT_MAX_CONCURRENCY = 20
+DEFAULT_ENDPOINT_LIMITS = {
+    '/fleet/rides/{id}': 15,
+    '/fleet/drivers/{id}': 10,
+    '/fleet/cars/{id}': 10,
+}
+
+
+class AsyncAPIClient:
+    """调度系统异步API客户端，提供与APIClient相同的get/post/put/delete接口"""
+    
+    def __init__(self, token: str = None, max_concurrency: int = None,
+                 endpoint_limits: Optional[Dict[str, int]] = None, rate_limiter=None):
+        """
+        初始化异步API客户端
+        
+        Args:
+            token: Bearer token，如果不提供则使用config中的token
+            max_concurrency: 全局同时进行的请求数上限
+            endpoint_limits: 按端点的并发上限，如 {'/fleet/rides/{id}': 15}
+            rate_limiter: 自适应限速器（默认新建；from_client 时与同步客户端共用）
+        """
+        if rate_limiter is None:
+            from api_client import AdaptiveRateLimiter
+            rate_limiter = AdaptiveRateLimiter()
+        self.rate_limiter = rate_limiter
+        self.base_url = config.API_BASE_URL
+        self.token = (token or config.BEARER_TOKEN).strip()
+        self.max_concurrency = max_concurrency or getattr(config, 'ASYNC_MAX_CONCURRENCY', DEFAULT_MAX_CONCURRENCY)
+        self.endpoint_limits = dict(DEFAULT_ENDPOINT_LIMITS)
+        self.endpoint_limits.update(getattr(config, 'ASYNC_ENDPOINT_LIMITS', {}))
+        if endpoint_limits:
+            self.endpoint_limits.update(endpoint_limits)
+        
+        # 会话和信号量绑定在事件循环上，首次请求时创建
+        self._session = None
+        self._global_semaphore = None
+        self._endpoint_semaphores = {}
+    
+    @staticmethod
+    def is_available() -> bool:
+        """是否已安装aiohttp"""
+        import importlib.util
+        return importlib.util.find_spec('aiohttp') is not None
+    
+    @classmethod
+    def from_client(cls, api_client, **kwargs) -> 'AsyncAPIClient':
+        """使用同步APIClient的Token和限速器创建异步客户端"""
+        kwargs.setdefault('rate_limiter', getattr(api_client, 'rate_limiter', None))
+        return cls(token=api_client.token, **kwargs)
+    
+    def update_token(self, new_token: str):
+        """
+        更新Token
+        
+        Args:
+            new_token: 新的Bearer token
+        """
+        self.token = new_token.strip()
+        if self._session is not None:
+            self._session.headers['Authorization'] = self.token
+        logger.info("Token已更新")
+    
+    @staticmethod
+    def endpoint_key(endpoint: str) -> str:
+        """将端点中的数字ID归一化，如 /fleet/rides/123 -> /fleet/rides/{id}"""
+        return re.sub(r'/\d+(?=/|$)', '/{id}', endpoint)
+    
+    async def _ensure_session(self):
+        """创建共享的连接池和并发控制"""
+        if self._session is None or self._session.closed:
+            import aiohttp
+            
+            connector = aiohttp.TCPConnector(limit=self.max_concurrency)
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=config.REQUEST_TIMEOUT),
+                headers={
+                    'Authorization': self.token,
+                    'Content-Type': 'application/json',
+                    'Accept': 'application/json',
+                    'User-Agent': 'RPA-Automation-Script/1.0'
+                }
+            )
+            self._global_semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._endpoint_semaphores = {}
+        return self._session
+    
+    def _endpoint_semaphore(self, endpoint: str) -> Optional[asyncio.Semaphore]:
+        """获取端点对应的并发控制，未配置上限的端点返回None"""
+        key = self.endpoint_key(endpoint)
+        limit = self.endpoint_limits.get(key)
+        if not limit:
+            return None
+        if key not in self._endpoint_semaphores:
+            self._endpoint_semaphores[key] = asyncio.Semaphore(limit)
+        return self._endpoint_semaphores[key]
+    
+    async def _acquire_token(self):
+        """从共用的限速器获取令牌，需要等待时让出事件循环"""
+        while True:
+            wait = self.rate_limiter.try_acquire()
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+    
+    async def _send(self, session, method: str, endpoint: str, **kwargs):
+        """在并发上限内发送一次请求，返回 (响应, 响应文本)"""
+        endpoint_semaphore = self._endpoint_semaphore(endpoint)
+        async with self._global_semaphore:
+            if endpoint_semaphore is not None:
+                await endpoint_semaphore.acquire()
+            try:
+                async with session.request(method, f"{self.base_url}{endpoint}", **kwargs) as response:
+                    return response, await response.text()
+            finally:
+                if endpoint_semaphore is not None:
+                    endpoint_semaphore.release()
+    
+    async def _make_request(
+        self,
+        method: str,
+        endpoint: str,
+        params: Optional[Dict] = None,
+        data: Optional[Dict] = None,
+        json_data: Optional[Dict] = None
+    ) -> Dict[str, Any]:
+        """
+        发起异步HTTP请求
+        
+        与 APIClient._make_request 规则相同：每次请求先从限速器获取令牌；
+        遇到 429/502/503/504 时按 Retry-After 或指数退避重试，最多重试 config.MAX_RETRIES 次。
+        
+        Args:
+            method: HTTP方法 (GET, POST, PUT, DELETE等)
+            endpoint: API端点
+            params: URL参数
+            data: 表单数据
+            json_data: JSON数据
+        
+        Returns:
+            响应数据字典
+        """
+        import aiohttp
+        from api_client import RETRY_STATUSES, _backoff_delay, _parse_retry_after
+        
+        session = await self._ensure_session()
+        max_retries = getattr(config, 'MAX_RETRIES', 3)
+        # POST不是幂等操作，只在服务器明确拒绝处理（429/503）时重试
+        retry_statuses = RETRY_STATUSES if method.upper() != 'POST' else {429, 503}
+        
+        attempt = 0
+        while True:
+            await self._acquire_token()
+            started = time.monotonic()
+            
+            try:
+                response, text = await self._send(session, method, endpoint, params=params, data=data, json=json_data)
+            except (asyncio.TimeoutError, aiohttp.ClientConnectionError) as e:
+                self.rate_limiter.on_throttle()
+                if method.upper() == 'GET' and attempt < max_retries:
+                    delay = _backoff_delay(attempt)
+                    logger.warning(f"{method} {endpoint} - {type(e).__name__}，{delay:.1f}秒后重试 ({attempt + 1}/{max_retries})")
+                    await asyncio.sleep(delay)
+                    attempt += 1
+                    continue
+                if isinstance(e, asyncio.TimeoutError):
+                    logger.error(f"请求超时: {method} {endpoint}")
+                else:
+                    logger.error(f"连接错误: {method} {endpoint} - {e}")
+                raise
+            except Exception as e:
+                logger.error(f"请求异常: {method} {endpoint} - {e}")
+                raise
+            
+            if response.status in retry_statuses:
+                retry_after = _parse_retry_after(response.headers.get('Retry-After'))
+                self.rate_limiter.on_throttle(retry_after)
+                if attempt < max_retries:
+                    delay = retry_after if retry_after is not None else _backoff_delay(attempt)
+                    logger.warning(f"{method} {endpoint} - 状态码: {response.status}，"
+                                   f"{delay:.1f}秒后重试 ({attempt + 1}/{max_retries})")
+                    await asyncio.sleep(delay)
+                    attempt += 1
+                    continue
+            elif response.status < 500:
+                self.rate_limiter.on_success(time.monotonic() - started)
+            
+            if response.status >= 400:
+                logger.error(f"HTTP错误: {response.status} {method} {endpoint} - {text}")
+                response.raise_for_status()
+            
+            logger.info(f"{method} {endpoint} - 状态码: {response.status}")
+            
+            try:
+                return json.loads(text)
+            except ValueError:
+                return {"success": True, "data": text}
+    
+    async def get(self, endpoint: str, params: Optional[Dict] = None) -> Dict[str, Any]:
+        """GET请求"""
+        return await self._make_request('GET', endpoint, params=params)
+    
+    async def post(self, endpoint: str, json_data: Optional[Dict] = None, data: Optional[Dict] = None) -> Dict[str, Any]:
+        """POST请求"""
+        return await self._make_request('POST', endpoint, json_data=json_data, data=data)
+    
+    async def put(self, endpoint: str, json_data: Optional[Dict] = None) -> Dict[str, Any]:
+        """PUT请求"""
+        return await self._make_request('PUT', endpoint, json_data=json_data)
+    
+    async def delete(self, endpoint: str, params: Optional[Dict] = None) -> Dict[str, Any]:
+        """DELETE请求"""
+        return await self._make_request('DELETE', endpoint, params=params)
+    
+    async def close(self):
+        """关闭连接池"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+    
+    async def get_many(self, endpoints: List[str], return_exceptions: bool = True) -> List[Any]:
+        """
+        并发GET多个端点，结果顺序与endpoints一致
+        
+        Args:
+            endpoints: 端点列表
+            return_exceptions: 为True时失败的请求返回异常对象而不是中断整个批次
+        
+        Returns:
+            响应列表
+        """
+        return await asyncio.gather(*(self.get(ep) for ep in endpoints),
+                                    return_exceptions=return_exceptions)
+    
+    def run_get_many(self, endpoints: List[str], return_exceptions: bool = True) -> List[Any]:
+        """
+        在当前线程中运行事件循环，并发GET多个端点（供同步代码/工作线程调用）
+        
+        Args:
+            endpoints: 端点列表
+            return_exceptions: 为True时失败的请求返回异常对象
+        
+        Returns:
+            响应列表
+        """
+        async def run():
+            try:
+                return await self.get_many(endpoints, return_exceptions=return_exceptions)
+            finally:
+                await self.close()
+        
+        return asyncio.run(run())
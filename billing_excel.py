@@ -0,0 +1,232 @@
+"""
+账单Excel导出 - 基于openpyxl只写模式的流式写入
+每位司机的订单行、汇总公式行和底部总计行在写入时一次性带上样式和货币格式，
+无需先构建DataFrame再回头逐个单元格设置样式，行数增加时内存占用保持平稳。
+"""
+
+import logging
+from typing import Dict, Any, Iterable, List
+
+from billing_engine import NO_SHOW_FEE, NO_SHOW_STATUSES
+
+logger = logging.getLogger(__name__)
+
+# 账单列（A-M）
+BILLING_COLUMNS = [
+    '司机姓名', '订单数', '总收入', '订单ID', '接客时间', '接客地点', '送达地点',
+    '乘客姓名', '订单价格', 'NO SHOW', 'Co Pay', 'TOLL', '状态'
+]
+
+# 列宽
+COLUMN_WIDTHS = {
+    'A': 20,  # 司机姓名
+    'B': 10,  # 订单数
+    'C': 12,  # 总收入
+    'D': 12,  # 订单ID
+    'E': 20,  # 接客时间
+    'F': 45,  # 接客地点
+    'G': 45,  # 送达地点
+    'H': 20,  # 乘客姓名
+    'I': 15,  # 订单价格
+    'J': 12,  # NO SHOW
+    'K': 12,  # Co Pay
+    'L': 12,  # TOLL
+    'M': 15,  # 状态
+}
+
+CURRENCY_FORMAT = '$#,##0.00'
+
+# 金额列：订单价格(I)、NO SHOW(J)、Co Pay(K)、TOLL(L)
+AMOUNT_COLUMNS = ['I', 'J', 'K', 'L']
+
+
+class BillingExcelWriter:
+    """流式写入账单详情表：订单行 -> 司机汇总行 -> ... -> 总计行"""
+    
+    def __init__(self, filename: str, sheet_name: str = '账单详情'):
+        """
+        创建只写模式的工作簿
+        
+        Args:
+            filename: 输出文件路径
+            sheet_name: 工作表名称
+        """
+        from openpyxl import Workbook
+        from openpyxl.styles import Alignment, Border, Font, PatternFill, Side
+        
+        self.filename = filename
+        self._workbook = Workbook(write_only=True)
+        self._sheet = self._workbook.create_sheet(sheet_name)
+        
+        # 样式对象只创建一次，所有单元格共享
+        thin = Side(style='thin')
+        self._header_font = Font(bold=True)
+        self._header_border = Border(left=thin, right=thin, top=thin, bottom=thin)
+        self._header_alignment = Alignment(horizontal='center', vertical='top')
+        self._bold_font = Font(bold=True)
+        self._green_fill = PatternFill(start_color='90EE90', end_color='90EE90', fill_type='solid')  # 浅绿色
+        self._yellow_fill = PatternFill(start_color='FFFF00', end_color='FFFF00', fill_type='solid')  # 黄色
+        self._orange_fill = PatternFill(start_color='FFA500', end_color='FFA500', fill_type='solid')  # 橙色
+        
+        # 只写模式下列宽必须在写入第一行之前设置
+        for column, width in COLUMN_WIDTHS.items():
+            self._sheet.column_dimensions[column].width = width
+        
+        self.row = 1  # 最后写入的行号
+        self.ride_count = 0
+        self.driver_count = 0
+        self._total_finished = 0
+        self._summary_rows: List[int] = []  # 各司机汇总行的行号
+        self._closed = False
+        
+        self._write_header()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        return False
+    
+    def _cell(self, value, fill=None, font=None, number_format=None):
+        """创建带样式的只写单元格"""
+        from openpyxl.cell import WriteOnlyCell
+        
+        cell = WriteOnlyCell(self._sheet, value=value)
+        if fill is not None:
+            cell.fill = fill
+        if font is not None:
+            cell.font = font
+        if number_format is not None:
+            cell.number_format = number_format
+        return cell
+    
+    def _write_header(self):
+        """写入表头"""
+        header = []
+        for title in BILLING_COLUMNS:
+            cell = self._cell(title, font=self._header_font)
+            cell.border = self._header_border
+            cell.alignment = self._header_alignment
+            header.append(cell)
+        self._sheet.append(header)
+    
+    def _append(self, values: List[Any], fill=None, font=None, currency_total: bool = False):
+        """
+        写入一行，金额列（I-L）使用货币格式
+        
+        Args:
+            values: 13列的值
+            fill: 整行填充色
+            font: 整行字体
+            currency_total: 总收入列（C）是否也使用货币格式
+        """
+        row = []
+        for idx, value in enumerate(values):
+            number_format = CURRENCY_FORMAT if 8 <= idx <= 11 or (idx == 2 and currency_total) else None
+            if fill is None and font is None and number_format is None:
+                row.append(value)
+            else:
+                row.append(self._cell(value, fill, font, number_format))
+        self._sheet.append(row)
+        self.row += 1
+    
+    @staticmethod
+    def ride_values(driver_name: str, ride: Dict[str, Any]) -> List[Any]:
+        """订单明细行的13列"""
+        status = ride.get('status', '')
+        return [
+            driver_name,
+            None,  # 详细行不显示订单数
+            None,
+            ride.get('id', ''),
+            ride.get('pickup_at', ride.get('schedule_time', '')),
+            ride.get('start_address', ride.get('pickup_address', '')),
+            ride.get('destination_address', ride.get('dropoff_address', '')),
+            f"{ride.get('first_name', '')} {ride.get('last_name', '')}".strip() or ride.get('customer_name', ''),
+            float(ride.get('order_price', 0) or 0),
+            NO_SHOW_FEE if status in NO_SHOW_STATUSES else 0.0,
+            float(ride.get('co_pay', 0) or 0),
+            float(ride.get('toll_fee', 0) or 0),
+            status
+        ]
+    
+    def write_driver(self, billing: Dict[str, Any]):
+        """
+        写入一位司机的所有订单行和汇总行
+        
+        Args:
+            billing: 司机账单 {'driver_name', 'finished_count', 'rides': [...]}，
+                     订单的 has_notes_price 为False时该行标记为绿色
+        """
+        driver_name = billing.get('driver_name', '')
+        start_row = self.row + 1
+        
+        for ride in billing.get('rides', []):
+            fill = None if ride.get('has_notes_price', True) else self._green_fill
+            self._append(self.ride_values(driver_name, ride), fill=fill)
+            self.ride_count += 1
+        
+        # 汇总行：金额列为该司机订单行的SUM，总收入 = 订单价格 + NO SHOW + Co Pay + TOLL
+        summary_row = self.row + 1
+        end_row = summary_row - 1
+        finished_count = billing.get('finished_count', 0)
+        values = [driver_name, finished_count, f'=I{summary_row}+J{summary_row}+K{summary_row}+L{summary_row}']
+        values += [None] * 5
+        values += [f'=SUM({col}{start_row}:{col}{end_row})' for col in AMOUNT_COLUMNS]
+        values.append(None)
+        self._append(values, fill=self._yellow_fill, font=self._bold_font, currency_total=True)
+        
+        self._summary_rows.append(summary_row)
+        self._total_finished += finished_count
+        self.driver_count += 1
+    
+    def write_drivers(self, billing_data: Iterable[Dict[str, Any]]):
+        """依次写入多位司机"""
+        for billing in billing_data:
+            self.write_driver(billing)
+    
+    def _write_total(self):
+        """
+        写入底部总计行
+        
+        只汇总各司机的汇总行：汇总行的订单数列（B）有值而订单行为空，
+        用SUMIF代替逐个相加，司机很多时公式也不会超出Excel的长度限制。
+        """
+        total_row = self.row + 1
+        last_row = total_row - 1
+        values = ['总计', self._total_finished, f'=I{total_row}+J{total_row}+K{total_row}+L{total_row}']
+        values += [None] * 5
+        for col in AMOUNT_COLUMNS:
+            if self._summary_rows:
+                values.append(f'=SUMIF(B2:B{last_row},"<>",{col}2:{col}{last_row})')
+            else:
+                values.append(0)
+        values.append(None)
+        self._append(values, fill=self._orange_fill, font=self._bold_font, currency_total=True)
+    
+    def close(self):
+        """写入总计行并保存文件"""
+        if self._closed:
+            return
+        self._write_total()
+        self._workbook.save(self.filename)
+        self._closed = True
+        logger.info(f"账单已导出: {self.filename} ({self.driver_count} 位司机, {self.ride_count} 条订单)")
+
+
+def export_billing_excel(filename: str, billing_data: Iterable[Dict[str, Any]]) -> str:
+    """
+    将司机账单流式导出为Excel
+    
+    Args:
+        filename: 输出文件路径
+        billing_data: 司机账单列表（或生成器）
+    
+    Returns:
+        文件路径
+    """
+    with BillingExcelWriter(filename) as writer:
+        writer.write_drivers(billing_data)
+    return filename
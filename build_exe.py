@@ -55,14 +55,15 @@ def main():
         'tkinter', 'tkinter.ttk', 'tkinter.messagebox', 'tkinter.filedialog', 
         'tkinter.scrolledtext', 'api_client', 'scraper', 'dispatcher',
         'enhanced_scraper', 'real_api_scraper', 'gui_dispatcher', 'gui_scraper',
-        'pandas', 'openpyxl', 'requests', 'pytz', 'concurrent.futures'
+        'ride_cache', 'async_api_client', 'ride_sync', 'withdraw_scheduler', 'pipeline', 'driver_directory', 'billing_excel', 'snapshot_store', 'billing_engine', 'price_extractor', 'scrape_journal', 'log_sink', 'log_files', 'job_runner', 'schedule_engine', 'time_utils', 'ride_index', 'pandas', 'openpyxl', 'requests', 'pytz', 'concurrent.futures'
     ]
     
     hidden_import_args = ' '.join([f'--hidden-import={imp}' for imp in hidden_imports])
     
     # 添加当前目录到Python路径中的所有.py文件
     py_files = ['api_client.py', 'scraper.py', 'dispatcher.py', 'enhanced_scraper.py', 
-                'real_api_scraper.py', 'gui_dispatcher.py', 'gui_scraper.py']
+                'real_api_scraper.py', 'gui_dispatcher.py', 'gui_scraper.py',
+                'ride_cache.py', 'async_api_client.py', 'ride_sync.py', 'withdraw_scheduler.py', 'pipeline.py', 'driver_directory.py', 'billing_excel.py', 'snapshot_store.py', 'billing_engine.py', 'price_extractor.py', 'scrape_journal.py', 'log_sink.py', 'log_files.py', 'job_runner.py', 'schedule_engine.py', 'time_utils.py', 'ride_index.py']
     add_data_args = ' '.join([f'--add-data="{f};."' for f in py_files if os.path.exists(f)])
     
     # 构建打包命令
@@ -11,12 +11,52 @@ BEARER_TOKEN = "Bearer YOUR_TOKEN_HERE"
 
 # 请求配置
 REQUEST_TIMEOUT = 30  # 请求超时时间(秒)
-MAX_RETRIES = 3  # 最大重试次数
+MAX_RETRIES = 3  # 最大重试次数（遇到429/502/503/504时按退避时间重试）
+
+# 自适应限速配置（请求/秒）
+RATE_LIMIT_INITIAL = 10  # 初始速率
+RATE_LIMIT_MIN = 1  # 最低速率
+RATE_LIMIT_MAX = 50  # 最高速率
+
+# 异步请求并发配置
+ASYNC_MAX_CONCURRENCY = 20  # 全局同时进行的请求数
+ASYNC_ENDPOINT_LIMITS = {  # 按端点的并发上限
+    "/fleet/rides/{id}": 15,
+    "/fleet/drivers/{id}": 10,
+    "/fleet/cars/{id}": 10
+}
+
+# 批量派工/退工配置
+BULK_MAX_WORKERS = 8  # 同时提交的派工/退工请求数
+
+# 司机通讯录缓存配置
+DRIVER_DIRECTORY_TTL = 21600  # 司机姓名/电话缓存有效期(秒)，过期后重新获取司机列表
+DRIVER_DIRECTORY_RETRY = 300  # 获取司机列表或单个司机失败后多少秒内不再重试
+
+# 本地快照配置（需要安装pyarrow）
+SNAPSHOT_ENABLED = True  # 爬取的订单/路线/司机按日期保存为Parquet快照，已结束日期的报表直接读取快照
+SNAPSHOT_FINAL_GRACE_HOURS = 6  # 当天结束多少小时后保存、且没有未完结订单的快照才直接代替API使用
+
+# 爬取断点配置
+SCRAPE_JOURNAL_TTL = 86400  # 断点有效期(秒)，中断的爬取在有效期内重新运行时从断点继续
+
+# 界面日志配置
+LOG_PANE_MAX_LINES = 5000  # 输出框最多保留的行数，超出时删除最早的行
+LOG_FLUSH_INTERVAL_MS = 50  # 输出框批量刷新间隔(毫秒)
 
 # 数据存储配置
 DATA_DIR = "data"  # 数据存储目录
 DRIVER_DATA_FILE = "driver_data.json"  # 司机数据文件
 LOG_FILE = "automation.log"  # 日志文件
+LOG_MAX_BYTES = 10 * 1024 * 1024  # 单个日志文件上限(字节)，超出后轮转，旧日志压缩为 .1.gz、.2.gz ...
+LOG_BACKUP_COUNT = 5  # 保留的旧日志数
+
+# 后台任务设置
+JOB_MAX_WORKERS = 3  # 调度工具中同时运行的后台任务数（派工/退工/转派/查询），超出的排队等待
+
+# 实时退工监控设置
+AUTO_WITHDRAW_RETRY_DELAY = 30  # 无法确认订单状态或退工请求失败时，多少秒后重试
+AUTO_WITHDRAW_MAX_RETRIES = 3  # 最多重试次数，超过后放弃该订单的自动退工
 
 # 调度系统端点
 ENDPOINTS = {
@@ -3,7 +3,8 @@
 """
 
 import logging
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 import config
 from api_client import APIClient
@@ -14,6 +15,9 @@ logger = logging.getLogger(__name__)
 class Dispatcher:
     """调度管理器"""
     
+    # 批量派工/退工的默认并发数（请求速率由APIClient的限速器控制）
+    BULK_WORKERS = 8
+    
     def __init__(self, api_client: APIClient):
         """
         初始化调度管理器
@@ -150,85 +154,188 @@ class Dispatcher:
         """兼容旧接口"""
         return self.transfer_driver(order_id, to_driver_id)
     
+    @staticmethod
+    def _order_items(items: List[Dict[str, Any]], order_by: Optional[str]) -> List[tuple]:
+        """
+        按优先级排列批量操作的提交顺序
+        
+        Args:
+            items: 批量操作项目
+            order_by: 'pickup' 接客时间从早到晚，None 保持原顺序
+            
+        Returns:
+            [(原始序号, 项目)]
+        """
+        indexed = list(enumerate(items))
+        if order_by == 'pickup':
+            indexed.sort(key=lambda x: x[1].get('pickup_at') or '')
+        return indexed
+    
+    def _run_bulk(self, items: List[Dict[str, Any]], action: Callable, order_by: Optional[str] = None,
+                  max_workers: int = None):
+        """
+        并发执行批量操作，按完成顺序逐个返回结果
+        
+        提交顺序由order_by决定，优先级高的订单先执行；请求速率由APIClient的限速器控制。
+        
+        Yields:
+            (原始序号, action的返回值)
+        """
+        ordered = self._order_items(items, order_by)
+        if not ordered:
+            return
+        
+        workers = min(max_workers or getattr(config, 'BULK_MAX_WORKERS', self.BULK_WORKERS), len(ordered))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(action, item): idx for idx, item in ordered}
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+    
+    def _dispatch_item(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        """派工单个项目，异常转换为失败结果"""
+        try:
+            result = self.dispatch_order(
+                driver_id=item.get('driver_id'),
+                order_id=item.get('order_id'),
+                date=item.get('date'),
+                time_slot=item.get('time_slot'),
+                **{k: v for k, v in item.items()
+                   if k not in ['driver_id', 'order_id', 'date', 'time_slot', 'pickup_at']}
+            )
+        except Exception as e:
+            logger.error(f"订单 {item.get('order_id')} 派工异常: {e}")
+            result = {'success': False, 'error': str(e)}
+        
+        return {
+            'order_id': item.get('order_id'),
+            'driver_id': item.get('driver_id'),
+            'result': result
+        }
+    
+    def _withdraw_item(self, item: Dict[str, Any], reason: str = None) -> Dict[str, Any]:
+        """退工单个订单，统一为 {'success', 'data'/'error'} 格式"""
+        order_id = item.get('order_id')
+        try:
+            result = {'success': True, 'data': self.withdraw_order(order_id=order_id, reason=reason)}
+        except Exception as e:
+            logger.error(f"订单 {order_id} 退工异常: {e}")
+            result = {'success': False, 'error': str(e)}
+        
+        return {
+            'order_id': order_id,
+            'result': result
+        }
+    
+    @staticmethod
+    def _withdraw_items(orders: List[Any]) -> List[Dict[str, Any]]:
+        """退工列表可以是订单ID或包含 order_id/pickup_at 的字典"""
+        return [o if isinstance(o, dict) else {'order_id': o} for o in orders]
+    
+    def iter_batch_dispatch(
+        self,
+        dispatch_list: List[Dict[str, Any]],
+        order_by: Optional[str] = None,
+        max_workers: int = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        并发批量派工，每完成一个订单立即返回其结果
+        
+        Args:
+            dispatch_list: 派工列表，每项包含 driver_id, order_id（可选 pickup_at 用于排序）
+            order_by: 提交顺序 - 'pickup' 早单优先，None 按列表顺序
+            max_workers: 同时提交的请求数
+            
+        Yields:
+            {'order_id', 'driver_id', 'result'}
+        """
+        logger.info(f"开始批量派工 - 共 {len(dispatch_list)} 个订单")
+        for _, record in self._run_bulk(dispatch_list, self._dispatch_item, order_by, max_workers):
+            yield record
+    
     def batch_dispatch(
         self,
-        dispatch_list: List[Dict[str, Any]]
+        dispatch_list: List[Dict[str, Any]],
+        order_by: Optional[str] = None,
+        max_workers: int = None
     ) -> List[Dict[str, Any]]:
         """
-        批量派工
+        批量派工（并发提交）
         
         Args:
             dispatch_list: 派工列表，每项包含 driver_id, order_id 等信息
+            order_by: 提交顺序 - 'pickup' 早单优先
+            max_workers: 同时提交的请求数
             
         Returns:
-            批量派工结果列表
+            批量派工结果列表（与dispatch_list顺序一致）
         """
-        results = []
+        results = [None] * len(dispatch_list)
         
         logger.info(f"开始批量派工 - 共 {len(dispatch_list)} 个订单")
         
-        for i, item in enumerate(dispatch_list, 1):
-            logger.info(f"处理第 {i}/{len(dispatch_list)} 个订单")
-            try:
-                result = self.dispatch_order(
-                    driver_id=item.get('driver_id'),
-                    order_id=item.get('order_id'),
-                    date=item.get('date'),
-                    time_slot=item.get('time_slot'),
-                    **{k: v for k, v in item.items() if k not in ['driver_id', 'order_id', 'date', 'time_slot']}
-                )
-                results.append({
-                    'order_id': item.get('order_id'),
-                    'driver_id': item.get('driver_id'),
-                    'result': result
-                })
-            except Exception as e:
-                logger.error(f"订单 {item.get('order_id')} 派工异常: {e}")
-                results.append({
-                    'order_id': item.get('order_id'),
-                    'driver_id': item.get('driver_id'),
-                    'result': {'success': False, 'error': str(e)}
-                })
+        for idx, record in self._run_bulk(dispatch_list, self._dispatch_item, order_by, max_workers):
+            results[idx] = record
         
         success_count = sum(1 for r in results if r['result'].get('success'))
         logger.info(f"批量派工完成 - 成功: {success_count}/{len(dispatch_list)}")
         
         return results
     
+    def iter_batch_withdraw(
+        self,
+        orders: List[Any],
+        reason: str = None,
+        order_by: Optional[str] = None,
+        max_workers: int = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        并发批量退工，每完成一个订单立即返回其结果
+        
+        Args:
+            orders: 订单ID列表，或包含 order_id（可选 pickup_at）的字典列表
+            reason: 退工原因
+            order_by: 提交顺序 - 'pickup' 早单优先，None 按列表顺序
+            max_workers: 同时提交的请求数
+            
+        Yields:
+            {'order_id', 'result'}
+        """
+        items = self._withdraw_items(orders)
+        logger.info(f"开始批量退工 - 共 {len(items)} 个订单")
+        for _, record in self._run_bulk(items, lambda item: self._withdraw_item(item, reason),
+                                        order_by, max_workers):
+            yield record
+    
     def batch_withdraw(
         self,
-        order_ids: List[int],
-        reason: str = None
+        order_ids: List[Any],
+        reason: str = None,
+        order_by: Optional[str] = None,
+        max_workers: int = None
     ) -> List[Dict[str, Any]]:
         """
-        批量退工
+        批量退工（并发提交）
         
         Args:
-            order_ids: 订单ID列表
+            order_ids: 订单ID列表，或包含 order_id（可选 pickup_at）的字典列表
             reason: 退工原因
+            order_by: 提交顺序 - 'pickup' 早单优先
+            max_workers: 同时提交的请求数
             
         Returns:
-            批量退工结果列表
+            批量退工结果列表（与order_ids顺序一致）
         """
-        results = []
+        items = self._withdraw_items(order_ids)
+        results = [None] * len(items)
         
-        logger.info(f"开始批量退工 - 共 {len(order_ids)} 个订单")
+        logger.info(f"开始批量退工 - 共 {len(items)} 个订单")
         
-        for i, order_id in enumerate(order_ids, 1):
-            logger.info(f"处理第 {i}/{len(order_ids)} 个订单")
-            
-            result = self.withdraw_order(
-                order_id=order_id,
-                reason=reason
-            )
-            
-            results.append({
-                'order_id': order_id,
-                'result': result
-            })
+        for idx, record in self._run_bulk(items, lambda item: self._withdraw_item(item, reason),
+                                          order_by, max_workers):
+            results[idx] = record
         
         success_count = sum(1 for r in results if r['result'].get('success'))
-        logger.info(f"批量退工完成 - 成功: {success_count}/{len(order_ids)}")
+        logger.info(f"批量退工完成 - 成功: {success_count}/{len(items)}")
         
         return results
     
@@ -0,0 +1,217 @@
+"""
+司机通讯录 - 缓存司机ID到姓名、电话的映射
+首次使用时通过分页的 /fleet/drivers 列表一次性获取全部司机，保存到本地并设置有效期，
+排班、账单、调度界面按ID直接查询，无需为每位司机单独请求 /fleet/drivers/{id}。
+"""
+
+import json
+import os
+import threading
+import time
+import logging
+from typing import Dict, Any, Optional
+import config
+
+logger = logging.getLogger(__name__)
+
+# 默认有效期（秒），可在config.py中通过DRIVER_DIRECTORY_TTL覆盖
+DEFAULT_TTL = 6 * 3600
+
+# 获取失败后多久（秒）再重试，可在config.py中通过DRIVER_DIRECTORY_RETRY覆盖
+DEFAULT_RETRY = 300
+
+
+class DriverDirectory:
+    """司机ID -> 姓名/电话 的本地通讯录"""
+    
+    def __init__(self, scraper, cache_file: str = None, ttl: int = None):
+        """
+        初始化通讯录
+        
+        Args:
+            scraper: RealAPIScraper实例，用于获取司机列表（None时只使用本地缓存）
+            cache_file: 缓存文件路径（默认 DATA_DIR/driver_directory.json）
+            ttl: 有效期（秒），过期后下次查询时重新获取
+        """
+        if cache_file is None:
+            if not os.path.exists(config.DATA_DIR):
+                os.makedirs(config.DATA_DIR)
+            cache_file = os.path.join(config.DATA_DIR, "driver_directory.json")
+        
+        self.scraper = scraper
+        self.cache_file = cache_file
+        self.ttl = ttl if ttl is not None else getattr(config, 'DRIVER_DIRECTORY_TTL', DEFAULT_TTL)
+        self.retry = getattr(config, 'DRIVER_DIRECTORY_RETRY', DEFAULT_RETRY)
+        self.fetched_at = 0.0
+        self._drivers = {}
+        # 获取失败的时间：司机列表 / 单个司机，重试间隔内不再请求
+        self._refresh_failed_at = 0.0
+        self._missing = {}
+        self._lock = threading.RLock()
+        self._load()
+    
+    @staticmethod
+    def _entry(driver: Dict[str, Any]) -> Dict[str, Any]:
+        """从司机列表/详情中提取通讯录条目"""
+        first_name = driver.get('first_name', '') or ''
+        last_name = driver.get('last_name', '') or ''
+        return {
+            'id': driver.get('id'),
+            'first_name': first_name,
+            'last_name': last_name,
+            'name': f"{first_name} {last_name}".strip() or driver.get('name', '') or '',
+            'phone': driver.get('phone_number', '') or driver.get('phone', '') or '',
+            'email': driver.get('email', '') or ''
+        }
+    
+    def _load(self):
+        """从本地文件读取通讯录"""
+        if not os.path.exists(self.cache_file):
+            return
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self._drivers = {int(k): v for k, v in data.get('drivers', {}).items()}
+            self.fetched_at = data.get('fetched_at', 0.0)
+            logger.info(f"已加载司机通讯录: {len(self._drivers)} 位司机")
+        except Exception as e:
+            logger.warning(f"读取司机通讯录失败: {e}")
+            self._drivers = {}
+            self.fetched_at = 0.0
+    
+    def _save(self):
+        """保存通讯录到本地文件（调用方需持有锁）"""
+        try:
+            tmp_file = self.cache_file + '.tmp'
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump({'fetched_at': self.fetched_at, 'drivers': self._drivers}, f, ensure_ascii=False)
+            os.replace(tmp_file, self.cache_file)
+        except Exception as e:
+            logger.warning(f"保存司机通讯录失败: {e}")
+    
+    def is_fresh(self) -> bool:
+        """通讯录是否在有效期内"""
+        return bool(self._drivers) and time.time() - self.fetched_at < self.ttl
+    
+    def set_scraper(self, scraper):
+        """更换用于获取司机的爬虫（如更新Token后），清除获取失败的记录"""
+        with self._lock:
+            if scraper is self.scraper:
+                return
+            self.scraper = scraper
+            self._refresh_failed_at = 0.0
+            self._missing.clear()
+    
+    def _recently_failed(self, failed_at: float) -> bool:
+        return time.time() - failed_at < self.retry
+    
+    def refresh(self, progress_callback=None) -> int:
+        """
+        从 /fleet/drivers 列表重新获取全部司机
+        
+        Returns:
+            司机数量
+        """
+        if self.scraper is None:
+            return len(self._drivers)
+        try:
+            drivers = self.scraper.get_all_drivers(per_page=100, progress_callback=progress_callback)
+        except Exception as e:
+            logger.warning(f"获取司机列表失败: {e}")
+            drivers = None
+        with self._lock:
+            if not drivers:
+                # 获取失败时保留旧数据，重试间隔内不再请求
+                logger.warning(f"司机列表为空，保留现有通讯录（{self.retry}秒后重试）")
+                self._refresh_failed_at = time.time()
+                return len(self._drivers)
+            
+            self._drivers = {d['id']: self._entry(d) for d in drivers if d.get('id') is not None}
+            self.fetched_at = time.time()
+            self._refresh_failed_at = 0.0
+            self._missing.clear()
+            self._save()
+            logger.info(f"司机通讯录已更新: {len(self._drivers)} 位司机")
+            return len(self._drivers)
+    
+    def ensure_fresh(self):
+        """过期或为空时重新获取（最近获取失败时暂不重试）"""
+        with self._lock:
+            if not self.is_fresh() and not self._recently_failed(self._refresh_failed_at):
+                self.refresh()
+    
+    def get(self, driver_id, fetch_missing: bool = True) -> Optional[Dict[str, Any]]:
+        """
+        按ID查询司机
+        
+        Args:
+            driver_id: 司机ID
+            fetch_missing: 通讯录中没有时（如新入职司机）是否单独请求一次并加入通讯录
+        
+        Returns:
+            {'id', 'first_name', 'last_name', 'name', 'phone', 'email'}，找不到时返回None
+        """
+        if driver_id is None:
+            return None
+        try:
+            driver_id = int(driver_id)
+        except (TypeError, ValueError):
+            return None
+        
+        self.ensure_fresh()
+        with self._lock:
+            entry = self._drivers.get(driver_id)
+            if entry is not None or not fetch_missing or self.scraper is None:
+                return entry
+            if self._recently_failed(self._missing.get(driver_id, 0.0)):
+                return None
+        
+        detail = self.scraper.get_driver_detail(driver_id)
+        if not detail:
+            with self._lock:
+                self._missing[driver_id] = time.time()
+            return None
+        # 详情接口返回格式: {"driver": {...}}
+        driver = detail.get('driver', detail) if isinstance(detail, dict) else {}
+        entry = self._entry({**driver, 'id': driver_id})
+        with self._lock:
+            self._drivers[driver_id] = entry
+            self._save()
+        return entry
+    
+    def name(self, driver_id, default: str = None) -> str:
+        """司机姓名，找不到时返回default（默认 "司机{ID}"）"""
+        entry = self.get(driver_id)
+        if entry and entry.get('name'):
+            return entry['name']
+        return default if default is not None else f"司机{driver_id}"
+    
+    def phone(self, driver_id, default: str = '') -> str:
+        """司机电话"""
+        entry = self.get(driver_id)
+        return (entry or {}).get('phone') or default
+    
+    def __len__(self):
+        with self._lock:
+            return len(self._drivers)
+
+
+_directory = None
+_directory_lock = threading.Lock()
+
+
+def get_driver_directory(scraper) -> DriverDirectory:
+    """
+    获取进程内共享的司机通讯录
+    
+    Args:
+        scraper: RealAPIScraper实例；与上次不同时（如更新Token后重新创建）改用新的实例，
+                 None时沿用之前的实例（没有时只使用本地缓存）
+    """
+    global _directory
+    with _directory_lock:
+        if _directory is None:
+            _directory = DriverDirectory(scraper)
+        elif scraper is not None:
+            _directory.set_scraper(scraper)
+        return _directory
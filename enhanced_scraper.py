@@ -9,7 +9,6 @@ import os
 import logging
 from typing import List, Dict, Any, Optional
 from datetime import datetime
-import time
 import config
 
 logger = logging.getLogger(__name__)
@@ -105,9 +104,6 @@ class EnhancedScraper:
             else:
                 # 如果获取详细信息失败，至少保留基本信息
                 detailed_drivers.append(driver)
-            
-            # 避免请求过快，添加小延迟
-            time.sleep(0.1)
         
         logger.info(f"完成！共获取 {len(detailed_drivers)} 位司机的详细信息")
         return detailed_drivers
@@ -155,8 +151,6 @@ class EnhancedScraper:
                 detailed_cars.append(combined)
             else:
                 detailed_cars.append(car)
-            
-            time.sleep(0.1)
         
         logger.info(f"完成！共获取 {len(detailed_cars)} 辆车的详细信息")
         return detailed_cars
@@ -1,18 +1,45 @@
 """
 爬取指定订单的数据
+
+不带参数运行时爬取内置的订单列表并逐条打印详情；
+批量核查时从文件或标准输入读取订单ID，并发获取后逐条写入NDJSON或CSV：
+    
+    python fetch_orders.py ids.txt -o result.ndjson
+    python fetch_orders.py ids.txt -o result.csv --format csv --workers 16
+    type ids.txt | python fetch_orders.py - -o result.ndjson
+
+每完成一个订单就把ID追加到断点文件（默认为 输出文件.done），中断后用相同命令重新运行即从断点继续；
+获取失败的订单写入单独的错误文件（默认为 输出文件.errors，每次运行重新生成），不计入断点，下次运行时重试，
+输出文件中每个订单只有一条记录。
 """
 
+import argparse
+import csv
+import json
+import logging
+import re
 import sys
 import os
-import re
+import threading
 
 # 添加当前目录到路径  
 current_dir = os.path.dirname(os.path.abspath(__file__))
 sys.path.insert(0, current_dir)
 
 from api_client import APIClient
+from price_extractor import extract_price, extract_prices, RULES_DAILY
+from ride_cache import RideDetailCache
 import config
 
+# 批量模式输出的字段
+BULK_FIELDS = [
+    'order_id', 'status', 'passenger', 'driver', 'driver_id', 'pickup_at', 'start_address', 'destination_address',
+    'vendor_amount', 'driver_net', 'original_price', 'co_pay', 'order_price', 'toll_fee', 'error'
+]
+
+# 错误文件的字段
+ERROR_FIELDS = ['order_id', 'error']
+
 def fetch_order_details(order_ids):
     """爬取指定订单的详细数据"""
     api_client = APIClient(config.BEARER_TOKEN)
@@ -34,61 +61,17 @@ def fetch_order_details(order_ids):
             passenger = f"{ride.get('first_name', '')} {ride.get('last_name', '')}".strip()
             driver = f"{ride.get('driver_first_name', '')} {ride.get('driver_last_name', '')}".strip()
             
-            # 价格信息
-            vendor_amount = float(ride.get('vendor_amount', 0) or 0)
-            driver_net = float(ride.get('driver_net', 0) or 0)
-            
-            # 从events中提取原始订单价格
+            # 价格信息：从events中提取原始订单价格，从notes中提取Co Pay，按单日账单规则计算
+            price = extract_price(ride, RULES_DAILY)
+            vendor_amount = price.vendor_amount
+            driver_net = price.driver_net
+            original_price = price.original_price
+            co_pay = price.co_pay
+            co_pay_note = price.co_pay_note
+            order_price = price.order_price
+            toll_fee = price.toll_fee
             events = ride.get('events', [])
-            original_price = 0
-            for event in events:
-                body = event.get('body', '')
-                match = re.search(r'reserved.*for\s+\$([0-9]+\.?[0-9]*)', body, re.IGNORECASE)
-                if match:
-                    original_price = float(match.group(1))
-                    break
-            
-            # 提取Co Pay信息
             notes = ride.get('notes', [])
-            co_pay = 0
-            co_pay_note = None
-            
-            for note in notes:
-                label = note.get('label', '')
-                description = note.get('description', '').lower()
-                icon = note.get('icon', '')
-                
-                # 查找Co Pay金额
-                match = re.search(r'\$([0-9]+\.?[0-9]*)', label)
-                if match:
-                    if icon == 'private' or 'collect' in description or 'cash' in description:
-                        co_pay = float(match.group(1))
-                        co_pay_note = {
-                            'label': label,
-                            'description': description,
-                            'icon': icon
-                        }
-                        break
-            
-            # 计算账单金额
-            if status in ['no_show', 'driver_canceled']:
-                order_price = 5.0
-                co_pay = 0
-                toll_fee = 0
-                original_price = 5.0
-            else:
-                # finished订单的正常计算
-                if original_price == 0:
-                    # 没有events说明vendor_amount就是最终价格，无TOLL信息
-                    order_price = round(vendor_amount - co_pay, 2)
-                    toll_fee = 0
-                    original_price = vendor_amount
-                else:
-                    # 有events说明有原始价格，可以计算TOLL
-                    # 订单价格 = 原始价格 - co_pay
-                    # TOLL = vendor_amount - 订单价格
-                    order_price = round(original_price - co_pay, 2)
-                    toll_fee = round(vendor_amount - order_price, 2)
             
             # 显示订单信息
             print(f"\n订单ID: {order_id}")
@@ -141,7 +124,7 @@ def fetch_order_details(order_ids):
                 'notes': notes,
                 'events': events
             })
-            
+        
         except Exception as e:
             print(f"\n✗ 爬取订单 {order_id} 失败: {e}")
             import traceback
@@ -150,7 +133,255 @@ def fetch_order_details(order_ids):
     return results
 
 
+def order_records(order_ids, details):
+    """
+    将一批订单详情转换为批量模式的记录（价格批量提取）
+    
+    Args:
+        order_ids: 订单ID列表
+        details: {订单ID: /fleet/rides/{id} 的完整响应或异常对象}
+    
+    Returns:
+        与order_ids顺序一致的记录列表，只含 BULK_FIELDS；获取失败的订单只有 order_id 和 error
+    """
+    rides = {}
+    for order_id in order_ids:
+        detail = details.get(order_id)
+        if isinstance(detail, dict):
+            rides[order_id] = detail.get('ride', {})
+    prices = dict(zip(rides, extract_prices(list(rides.values()), RULES_DAILY)))
+    
+    records = []
+    for order_id in order_ids:
+        if order_id not in rides:
+            detail = details.get(order_id)
+            error = detail if isinstance(detail, Exception) else ValueError("未获取到订单详情")
+            records.append({'order_id': order_id, 'error': str(error) or type(error).__name__})
+            continue
+        
+        ride = rides[order_id]
+        price = prices[order_id]
+        records.append({
+            'order_id': order_id,
+            'status': ride.get('status', ''),
+            'passenger': f"{ride.get('first_name', '')} {ride.get('last_name', '')}".strip(),
+            'driver': f"{ride.get('driver_first_name', '')} {ride.get('driver_last_name', '')}".strip(),
+            'driver_id': ride.get('driver_id'),
+            'pickup_at': ride.get('pickup_at', ride.get('schedule_time', '')),
+            'start_address': ride.get('start_address', ''),
+            'destination_address': ride.get('destination_address', ''),
+            'vendor_amount': price.vendor_amount,
+            'driver_net': price.driver_net,
+            'original_price': price.original_price,
+            'co_pay': price.co_pay,
+            'order_price': price.order_price,
+            'toll_fee': price.toll_fee,
+            'error': ''
+        })
+    return records
+
+
+def read_order_ids(stream):
+    """
+    从文本中读取订单ID（逗号、分号或空白分隔，# 开头的行为注释），按出现顺序去重
+    
+    Returns:
+        订单ID列表
+    """
+    order_ids = []
+    seen = set()
+    for line_no, line in enumerate(stream, 1):
+        line = line.split('#', 1)[0]
+        for token in re.split(r'[,，;；\s]+', line.strip()):
+            if not token:
+                continue
+            try:
+                order_id = int(token)
+            except ValueError:
+                print(f"⚠️ 第{line_no}行: 忽略无效的订单ID {token!r}", file=sys.stderr)
+                continue
+            if order_id not in seen:
+                seen.add(order_id)
+                order_ids.append(order_id)
+    return order_ids
+
+
+def load_checkpoint(path):
+    """读取断点文件中已完成的订单ID"""
+    done = set()
+    if path and os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line.isdigit():
+                    done.add(int(line))
+    return done
+
+
+class BulkOutput:
+    """逐条写入NDJSON/CSV，并在写入后记录断点；失败的记录写入单独的错误文件"""
+    
+    def __init__(self, path, fmt='ndjson', checkpoint=None, errors=None):
+        """
+        Args:
+            path: 输出文件（'-' 表示标准输出）
+            fmt: 'ndjson' 或 'csv'
+            checkpoint: 断点文件路径（None表示不记录）
+            errors: 错误文件路径（None表示失败的记录也写入输出文件）
+        """
+        self.fmt = fmt
+        self._lock = threading.Lock()
+        if path == '-':
+            self._file = sys.stdout
+            self._owns_file = False
+            is_new = True
+        else:
+            is_new = not os.path.exists(path) or os.path.getsize(path) == 0
+            # 续跑时追加到已有文件
+            self._file = open(path, 'a', encoding='utf-8-sig' if fmt == 'csv' and is_new else 'utf-8', newline='')
+            self._owns_file = True
+        self._csv = self._csv_writer(self._file, BULK_FIELDS, is_new)
+        
+        # 失败的订单下次运行时重试，错误文件只保留本次运行的失败记录
+        self._errors = None
+        self._errors_csv = None
+        if errors:
+            self._errors = open(errors, 'w', encoding='utf-8-sig' if fmt == 'csv' else 'utf-8', newline='')
+            self._errors_csv = self._csv_writer(self._errors, ERROR_FIELDS, True)
+        
+        self._checkpoint = open(checkpoint, 'a', encoding='utf-8') if checkpoint else None
+    
+    def _csv_writer(self, file, fieldnames, write_header):
+        if self.fmt != 'csv':
+            return None
+        writer = csv.DictWriter(file, fieldnames=fieldnames, extrasaction='ignore')
+        if write_header:
+            writer.writeheader()
+        return writer
+    
+    @staticmethod
+    def _append(file, writer, record):
+        if writer is not None:
+            writer.writerow(record)
+        else:
+            file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        file.flush()
+    
+    def write(self, record):
+        """写入一条记录；成功的记录同时写入断点，失败的记录写入错误文件"""
+        with self._lock:
+            if record.get('error') and self._errors is not None:
+                self._append(self._errors, self._errors_csv, record)
+                return
+            
+            self._append(self._file, self._csv, record)
+            if self._checkpoint is not None and not record.get('error'):
+                self._checkpoint.write(f"{record['order_id']}\n")
+                self._checkpoint.flush()
+    
+    def close(self):
+        if self._owns_file:
+            self._file.close()
+        if self._errors is not None:
+            self._errors.close()
+        if self._checkpoint is not None:
+            self._checkpoint.close()
+
+
+def bulk_fetch(order_ids, output, workers=8, cache=None, api_client=None, progress_every=100, batch_size=500):
+    """
+    分批获取订单详情并写入输出，每批缓存未命中的订单在一个事件循环中并发请求
+    
+    Args:
+        order_ids: 订单ID列表
+        output: BulkOutput
+        workers: 同时进行的请求数
+        cache: 订单详情缓存（默认共享的本地缓存，已结束的订单不会重复请求）
+        api_client: API客户端
+        batch_size: 每批订单数（中断时最多重新获取一批）
+    
+    Returns:
+        (成功数, 失败数)
+    """
+    api_client = api_client or APIClient(config.BEARER_TOKEN)
+    cache = cache or RideDetailCache()
+    
+    succeeded = failed = done = 0
+    total = len(order_ids)
+    for start in range(0, total, batch_size):
+        batch = order_ids[start:start + batch_size]
+        details = cache.fetch_many(api_client, [{'id': order_id} for order_id in batch], max_concurrency=workers)
+        for record in order_records(batch, details):
+            if record['error']:
+                failed += 1
+            else:
+                succeeded += 1
+            output.write(record)
+            
+            done += 1
+            if done % progress_every == 0 or done == total:
+                print(f"进度: {done}/{total} (失败 {failed}) | 详情缓存: {cache.summary()}", file=sys.stderr)
+    
+    return succeeded, failed
+
+
+def run_bulk(argv=None):
+    """批量模式入口"""
+    parser = argparse.ArgumentParser(description='批量获取订单详情并输出为NDJSON或CSV')
+    parser.add_argument('ids_file', help="订单ID文件（'-' 表示从标准输入读取）")
+    parser.add_argument('-o', '--output', default='-', help="输出文件（默认标准输出）")
+    parser.add_argument('--format', choices=['ndjson', 'csv'], default=None,
+                        help='输出格式（默认按输出文件扩展名判断，否则为ndjson）')
+    parser.add_argument('--workers', type=int, default=8, help='同时进行的请求数（默认8）')
+    parser.add_argument('--checkpoint', default=None, help='断点文件（默认 输出文件.done）')
+    parser.add_argument('--errors', default=None, help='失败订单的错误文件（默认 输出文件.errors）')
+    parser.add_argument('--restart', action='store_true', help='忽略已有断点，重新获取全部订单')
+    args = parser.parse_args(argv)
+    
+    # 数千个订单时不逐条输出请求日志，只保留警告和错误
+    logging.getLogger('api_client').setLevel(logging.WARNING)
+    logging.getLogger('async_api_client').setLevel(logging.WARNING)
+    logging.getLogger('ride_cache').setLevel(logging.WARNING)
+    
+    fmt = args.format or ('csv' if args.output.lower().endswith('.csv') else 'ndjson')
+    checkpoint = args.checkpoint or (args.output + '.done' if args.output != '-' else None)
+    errors = args.errors or (args.output + '.errors' if args.output != '-' else None)
+    
+    if args.ids_file == '-':
+        order_ids = read_order_ids(sys.stdin)
+    else:
+        with open(args.ids_file, 'r', encoding='utf-8-sig') as f:
+            order_ids = read_order_ids(f)
+    
+    if args.restart and checkpoint and os.path.exists(checkpoint):
+        os.remove(checkpoint)
+        if args.output != '-' and os.path.exists(args.output):
+            os.remove(args.output)
+    
+    done = load_checkpoint(checkpoint)
+    pending = [order_id for order_id in order_ids if order_id not in done]
+    print(f"共 {len(order_ids)} 个订单，已完成 {len(order_ids) - len(pending)} 个，待获取 {len(pending)} 个",
+          file=sys.stderr)
+    
+    output = BulkOutput(args.output, fmt, checkpoint, errors)
+    try:
+        succeeded, failed = bulk_fetch(pending, output, workers=args.workers)
+    except KeyboardInterrupt:
+        print("\n已中断，重新运行相同命令即可从断点继续", file=sys.stderr)
+        return 130
+    finally:
+        output.close()
+    
+    print(f"完成: 成功 {succeeded} 个，失败 {failed} 个", file=sys.stderr)
+    if failed and errors:
+        print(f"失败的订单见 {errors}，重新运行相同命令即可重试", file=sys.stderr)
+    return 1 if failed else 0
+
+
 if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        sys.exit(run_bulk())
+    
     # 要爬取的订单ID列表
     order_ids = [11987090, 11976453, 12010117, 12001579, 12017243]
     
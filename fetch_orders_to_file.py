@@ -4,7 +4,6 @@
 
 import sys
 import os
-import re
 from datetime import datetime
 
 # 添加当前目录到路径  
@@ -12,6 +11,7 @@ current_dir = os.path.dirname(os.path.abspath(__file__))
 sys.path.insert(0, current_dir)
 
 from api_client import APIClient
+from price_extractor import extract_price, RULES_DAILY
 import config
 
 
@@ -49,61 +49,17 @@ def fetch_and_save_orders():
                 passenger = f"{ride.get('first_name', '')} {ride.get('last_name', '')}".strip()
                 driver = f"{ride.get('driver_first_name', '')} {ride.get('driver_last_name', '')}".strip()
                 
-                # 价格信息
-                vendor_amount = float(ride.get('vendor_amount', 0) or 0)
-                driver_net = float(ride.get('driver_net', 0) or 0)
-                
-                # 从events中提取原始订单价格
+                # 价格信息：从events中提取原始订单价格，从notes中提取Co Pay，按单日账单规则计算
+                price = extract_price(ride, RULES_DAILY)
+                vendor_amount = price.vendor_amount
+                driver_net = price.driver_net
+                original_price = price.original_price
+                co_pay = price.co_pay
+                co_pay_note = price.co_pay_note
+                order_price = price.order_price
+                toll_fee = price.toll_fee
                 events = ride.get('events', [])
-                original_price = 0
-                for event in events:
-                    body = event.get('body', '')
-                    match = re.search(r'reserved.*for\s+\$([0-9]+\.?[0-9]*)', body, re.IGNORECASE)
-                    if match:
-                        original_price = float(match.group(1))
-                        break
-                
-                # 提取Co Pay信息
                 notes = ride.get('notes', [])
-                co_pay = 0
-                co_pay_note = None
-                
-                for note in notes:
-                    label = note.get('label', '')
-                    description = note.get('description', '').lower()
-                    icon = note.get('icon', '')
-                    
-                    # 查找Co Pay金额
-                    match = re.search(r'\$([0-9]+\.?[0-9]*)', label)
-                    if match:
-                        if icon == 'private' or 'collect' in description or 'cash' in description:
-                            co_pay = float(match.group(1))
-                            co_pay_note = {
-                                'label': label,
-                                'description': description,
-                                'icon': icon
-                            }
-                            break
-                
-                # 计算账单金额 - 按照gui.py中的逻辑
-                if status in ['no_show', 'driver_canceled']:
-                    order_price = 5.0
-                    co_pay = 0
-                    toll_fee = 0
-                    original_price = 5.0
-                else:
-                    # finished订单的正常计算
-                    if original_price == 0:
-                        # 没有events说明vendor_amount就是最终价格，无TOLL信息
-                        order_price = round(vendor_amount - co_pay, 2)
-                        toll_fee = 0
-                        original_price = vendor_amount
-                    else:
-                        # 有events说明有原始价格，可以计算TOLL
-                        # 订单价格 = 原始价格 - co_pay
-                        # TOLL = vendor_amount - 订单价格
-                        order_price = round(original_price - co_pay, 2)
-                        toll_fee = round(vendor_amount - order_price, 2)
                 
                 # 显示订单信息
                 log(f"\n订单ID: {order_id}")
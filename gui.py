@@ -12,16 +12,21 @@ from datetime import datetime, timedelta
 from api_client import APIClient
 from scraper import DataScraper
 from dispatcher import Dispatcher
+from driver_directory import get_driver_directory
+from billing_engine import build_driver_billing
+from schedule_engine import build_driver_schedules
+from price_extractor import extract_prices, RULES_DAILY
+from log_sink import TextLogSink
+from log_files import log_file_handler, tail_lines
 import config
 import logging
-import re
 
 # 配置日志
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(levelname)s - %(message)s',
     handlers=[
-        logging.FileHandler(config.LOG_FILE, encoding='utf-8'),
+        log_file_handler(),  # 按大小轮转并压缩旧日志
     ]
 )
 logger = logging.getLogger(__name__)
@@ -158,6 +163,9 @@ class RPAAutomationGUI:
         self.output_text.tag_config("info", foreground="blue")
         self.output_text.tag_config("warning", foreground="orange")
         
+        # 日志先放入队列，由主线程批量写入（后台线程调用log不会阻塞在界面刷新上）
+        self.log_sink = TextLogSink(self.root, self.output_text)
+        
         self.log("=" * 60)
         self.log("欢迎使用 RPA调度系统自动化助手", "info")
         self.log("=" * 60)
@@ -182,15 +190,12 @@ class RPAAutomationGUI:
         self.root.after(1000, self.update_time)
     
     def log(self, message, tag=""):
-        """输出日志"""
-        self.output_text.insert(tk.END, f"{message}\n", tag)
-        self.output_text.see(tk.END)
-        self.root.update_idletasks()
+        """输出日志（任意线程可调用）"""
+        self.log_sink.write(message, tag)
     
     def set_status(self, status):
-        """设置状态"""
-        self.status_var.set(status)
-        self.root.update_idletasks()
+        """设置状态（任意线程可调用）"""
+        self.log_sink.post(self.status_var.set, status)
     
     def initialize_client(self):
         """初始化API客户端"""
@@ -518,7 +523,9 @@ class RPAAutomationGUI:
                 
                 # 1. 获取路线数据
                 self.log("\n1️⃣ 获取路线数据...", "info")
-                routes = self.real_scraper.get_all_routes(date=date, per_page=100)
+                routes = self.real_scraper.load_snapshot('routes', date)
+                if routes is None:
+                    routes = self.real_scraper.get_all_routes(date=date, per_page=100)
                 self.log(f"✓ 获取到 {len(routes)} 条路线", "success")
                 
                 if len(routes) == 0:
@@ -530,68 +537,20 @@ class RPAAutomationGUI:
                 # 2. 获取所有司机信息
                 self.log("\n2️⃣ 获取司机信息...", "info")
                 driver_ids = set(r.get('driver_id') for r in routes if r.get('driver_id'))
-                drivers_info = {}
-                for driver_id in driver_ids:
-                    try:
-                        driver_data = self.api_client.get(f'/fleet/drivers/{driver_id}')
-                        driver = driver_data.get('driver', {})
-                        first_name = driver.get('first_name', '')
-                        last_name = driver.get('last_name', '')
-                        drivers_info[driver_id] = f"{first_name} {last_name}".strip()
-                    except Exception as e:
-                        self.log(f"  ⚠️ 获取司机 {driver_id} 信息失败: {e}", "warning")
-                        drivers_info[driver_id] = f"司机{driver_id}"
+                directory = get_driver_directory(self.real_scraper)
+                drivers_info = {driver_id: directory.name(driver_id) for driver_id in driver_ids}
                 
                 self.log(f"✓ 获取了 {len(drivers_info)} 位司机信息", "success")
                 
-                # 3. 提取司机排班
+                # 3. 提取司机排班（时间只解析一次，按司机排序后一次扫描）
                 self.log("\n3️⃣ 分析司机排班...", "info")
-                from collections import defaultdict
-                schedules = defaultdict(lambda: {
-                    'driver_id': None,
-                    'driver_name': None,
-                    'date': date,
-                    'routes': [],
-                    'total_hours': 0,
-                    'start_time': None,
-                    'end_time': None
-                })
-                
-                for route in routes:
-                    driver_id = route.get('driver_id')
-                    if not driver_id:
-                        continue
-                    
-                    driver_name = drivers_info.get(driver_id, f"司机{driver_id}")
-                    from_dt = route.get('from_datetime', '')
-                    to_dt = route.get('to_datetime', '')
-                    
-                    schedules[driver_id]['driver_id'] = driver_id
-                    schedules[driver_id]['driver_name'] = driver_name.strip()
-                    schedules[driver_id]['routes'].append({
-                        'route_id': route.get('id'),
-                        'from_time': from_dt,
-                        'to_time': to_dt,
-                        'status': route.get('status')
-                    })
-                    
-                    # 计算工时
-                    if from_dt and to_dt:
-                        try:
-                            from dateutil import parser
-                            start = parser.parse(from_dt)
-                            end = parser.parse(to_dt)
-                            hours = (end - start).total_seconds() / 3600
-                            schedules[driver_id]['total_hours'] += hours
-                            
-                            if not schedules[driver_id]['start_time'] or start < parser.parse(schedules[driver_id]['start_time']):
-                                schedules[driver_id]['start_time'] = from_dt
-                            if not schedules[driver_id]['end_time'] or end > parser.parse(schedules[driver_id]['end_time']):
-                                schedules[driver_id]['end_time'] = to_dt
-                        except:
-                            pass
+                schedules = build_driver_schedules(
+                    routes, date, name_for=lambda driver_id: drivers_info.get(driver_id, f"司机{driver_id}"))
                 
+                overlapping = sum(1 for sched in schedules if sched['overlap_count'])
                 self.log(f"✓ 分析了 {len(schedules)} 位司机的排班", "success")
+                if overlapping:
+                    self.log(f"  ⚠️ {overlapping} 位司机有时间重叠的路线", "warning")
                 
                 # 4. 导出Excel
                 self.log("\n4️⃣ 导出Excel...", "info")
@@ -601,23 +560,26 @@ class RPAAutomationGUI:
                 
                 # 准备排班摘要数据
                 summary_data = []
-                for driver_id, sched in schedules.items():
+                for sched in schedules:
                     summary_data.append({
-                        '司机ID': driver_id,
+                        '司机ID': sched['driver_id'],
                         '司机姓名': sched['driver_name'],
                         '日期': date,
                         '路线数': len(sched['routes']),
                         '总工时': round(sched['total_hours'], 1),
                         '开始时间': sched['start_time'],
-                        '结束时间': sched['end_time']
+                        '结束时间': sched['end_time'],
+                        '重叠路线数': sched['overlap_count'],
+                        '重叠工时': round(sched['overlap_hours'], 1),
+                        '空档时长': round(sched['gap_hours'], 1)
                     })
                 
                 # 准备详细路线数据
                 detail_data = []
-                for driver_id, sched in schedules.items():
+                for sched in schedules:
                     for route in sched['routes']:
                         detail_data.append({
-                            '司机ID': driver_id,
+                            '司机ID': sched['driver_id'],
                             '司机姓名': sched['driver_name'],
                             '路线ID': route['route_id'],
                             '开始时间': route['from_time'],
@@ -635,7 +597,7 @@ class RPAAutomationGUI:
                 
                 # 保存到last_data
                 self.last_data = {
-                    'schedules': list(schedules.values()),
+                    'schedules': schedules,
                     'routes': routes,
                     'date': date
                 }
@@ -716,11 +678,15 @@ class RPAAutomationGUI:
                 
                 # 获取finished、no_show和driver_canceled状态的订单
                 self.log("\n1️⃣ 获取已完成、未到达和司机取消订单...", "info")
-                rides = self.real_scraper.get_all_rides(
-                    date=date, 
-                    per_page=500, 
-                    statuses='finished,no_show,driver_canceled'
-                )
+                # 已结束且有快照的日期直接读取本地数据
+                rides = self.real_scraper.load_snapshot('rides', date, statuses='finished,no_show,driver_canceled')
+                if rides is None:
+                    rides = self.real_scraper.get_all_rides(
+                        date=date, 
+                        per_page=500, 
+                        statuses='finished,no_show,driver_canceled',
+                        snapshot=True
+                    )
                 self.log(f"✓ 获取到 {len(rides)} 条订单", "success")
                 
                 if len(rides) == 0:
@@ -732,77 +698,19 @@ class RPAAutomationGUI:
                 # 获取订单详细信息（包含价格和Cash信息）
                 self.log("\n2️⃣ 获取订单详细信息（价格、Cash、Toll）...", "info")
                 detailed_rides = []
+                self.real_scraper.ride_cache.reset_stats()
+                # 缓存未命中的订单在一个事件循环中并发获取
+                details = self.real_scraper.get_ride_details(rides)
+                fetched = []  # [(订单, 订单详情)]
                 for idx, ride in enumerate(rides, 1):
                     try:
                         ride_id = ride.get('id')
-                        detail = self.api_client.get(f'/fleet/rides/{ride_id}')
-                        ride_detail = detail.get('ride', {})
-                        
-                        # 提取价格信息
-                        vendor_amount = float(ride_detail.get('vendor_amount', 0) or 0)
-                        driver_net = float(ride_detail.get('driver_net', 0) or 0)
-                        
-                        # 从events中提取原始订单价格
-                        events = ride_detail.get('events', [])
-                        original_price = 0
-                        for event in events:
-                            body = event.get('body', '')
-                            match = re.search(r'reserved.*for\s+\$([0-9]+\.?[0-9]*)', body, re.IGNORECASE)
-                            if match:
-                                original_price = float(match.group(1))
-                                break
-                        
-                        # 提取Co Pay信息
-                        notes = ride_detail.get('notes', [])
-                        co_pay = 0
-                        
-                        for note in notes:
-                            label = note.get('label', '')
-                            description = note.get('description', '').lower()
-                            icon = note.get('icon', '')
-                            
-                            # 查找Co Pay金额
-                            # 优先：检查icon='private'的notes（如截图红色圈所示）
-                            # 其次：检查description中含'collect'或'cash'的notes
-                            match = re.search(r'\$([0-9]+\.?[0-9]*)', label)
-                            if match:
-                                if icon == 'private' or 'collect' in description or 'cash' in description:
-                                    co_pay = float(match.group(1))
-                                    break
-                        
-                        # 检查订单状态
-                        order_status = ride_detail.get('status', '')
-                        
-                        # no_show和driver_canceled订单特殊处理：固定$5
-                        if order_status in ['no_show', 'driver_canceled']:
-                            order_price = 5.0
-                            co_pay = 0
-                            toll_fee = 0
-                            original_price = 5.0
-                        else:
-                            # finished订单的正常计算
-                            if original_price == 0:
-                                # 没有events说明vendor_amount就是最终价格，无TOLL信息
-                                order_price = round(vendor_amount - co_pay, 2)
-                                toll_fee = 0
-                                original_price = vendor_amount
-                            else:
-                                # 有events说明有原始价格，可以计算TOLL
-                                # 订单价格 = 原始价格 - co_pay
-                                # TOLL = vendor_amount - 订单价格
-                                order_price = round(original_price - co_pay, 2)
-                                toll_fee = round(vendor_amount - order_price, 2)
-                        
-                        # 合并所有信息
-                        ride['driver_net'] = driver_net
-                        ride['vendor_amount'] = vendor_amount
-                        ride['original_price'] = original_price
-                        ride['co_pay'] = co_pay
-                        ride['order_price'] = order_price
-                        ride['toll_fee'] = toll_fee
-                        ride['distance'] = ride_detail.get('distance', 0)
-                        ride['duration'] = ride_detail.get('duration', 0)
-                        detailed_rides.append(ride)
+                        detail = details.get(ride_id)
+                        if isinstance(detail, Exception):
+                            raise detail
+                        if detail is None:
+                            detail = self.real_scraper.get_ride_detail(ride_id, ride.get('updated_at'))
+                        fetched.append((ride, detail.get('ride', {})))
                         
                         if idx % 50 == 0:
                             self.log(f"  已处理 {idx}/{len(rides)} 条订单...", "info")
@@ -815,21 +723,36 @@ class RPAAutomationGUI:
                         ride['co_pay'] = 0
                         ride['order_price'] = 0
                         ride['toll_fee'] = 0
-                        detailed_rides.append(ride)
+                    detailed_rides.append(ride)
+                
+                # 从events中提取原始订单价格，从notes中提取Co Pay
+                # no_show和driver_canceled订单固定$5
+                prices = extract_prices([ride_detail for _, ride_detail in fetched], RULES_DAILY)
+                for (ride, ride_detail), price in zip(fetched, prices):
+                    # 合并所有信息
+                    ride['driver_net'] = price.driver_net
+                    ride['vendor_amount'] = price.vendor_amount
+                    ride['original_price'] = price.original_price
+                    ride['co_pay'] = price.co_pay
+                    ride['order_price'] = price.order_price
+                    ride['toll_fee'] = price.toll_fee
+                    ride['distance'] = ride_detail.get('distance', 0)
+                    ride['duration'] = ride_detail.get('duration', 0)
                 
                 self.log(f"✓ 已获取 {len(detailed_rides)} 条订单详情", "success")
+                self.log(f"  详情缓存: {self.real_scraper.ride_cache.summary()}", "info")
                 
                 # 按司机分组
                 self.log("\n3️⃣ 按司机分组订单...", "info")
-                from collections import defaultdict
-                driver_orders = defaultdict(list)
-                
-                for ride in detailed_rides:
-                    driver_id = ride.get('driver_id')
-                    if driver_id:
-                        driver_orders[driver_id].append(ride)
+                directory = get_driver_directory(self.real_scraper)
+                driver_billing = build_driver_billing(
+                    detailed_rides,
+                    name_for=lambda driver_id, ride: (
+                        f"{ride.get('driver_first_name', '')} {ride.get('driver_last_name', '')}".strip()
+                        or directory.name(driver_id))
+                )
                 
-                self.log(f"✓ 共有 {len(driver_orders)} 位司机", "success")
+                self.log(f"✓ 共有 {len(driver_billing)} 位司机", "success")
                 
                 # 导出Excel
                 self.log("\n4️⃣ 导出账单Excel...", "info")
@@ -844,19 +767,12 @@ class RPAAutomationGUI:
                 all_rows = []
                 
                 # 按司机名字排序
-                driver_list = []
-                for driver_id, orders in driver_orders.items():
-                    first_ride = orders[0]
-                    driver_first = first_ride.get('driver_first_name', '')
-                    driver_last = first_ride.get('driver_last_name', '')
-                    driver_name = f"{driver_first} {driver_last}".strip()
-                    driver_list.append((driver_name, driver_id, orders))
-                
-                driver_list.sort(key=lambda x: x[0])  # 按名字排序
+                driver_billing.sort(key=lambda billing: billing['driver_name'])
                 
-                for driver_name, driver_id, orders in driver_list:
+                for billing in driver_billing:
+                    driver_name = billing['driver_name']
                     # 该司机的所有订单（先添加订单）
-                    for ride in orders:
+                    for ride in billing['rides']:
                         co_pay = float(ride.get('co_pay', 0) or 0)
                         order_price = float(ride.get('order_price', 0) or 0)
                         toll_fee = float(ride.get('toll_fee', 0) or 0)
@@ -880,11 +796,9 @@ class RPAAutomationGUI:
                     
                     # 司机汇总行（在该司机所有订单下方，使用Excel公式）
                     # 只统计finished状态的订单数
-                    finished_count = sum(1 for order in orders if order.get('status') == 'finished')
-                    
                     all_rows.append({
                         '司机姓名': driver_name,
-                        '订单数': finished_count,
+                        '订单数': billing['finished_count'],
                         '总收入': 'FORMULA',  # 占位符，后续填充Excel公式
                         '订单ID': '',
                         '接客时间': '',
@@ -1057,7 +971,7 @@ class RPAAutomationGUI:
                 self.log("✓ 完成！", "success")
                 self.log(f"日期: {date}", "info")
                 self.log(f"订单总数: {len(rides)} 条", "info")
-                self.log(f"司机数: {len(driver_orders)} 位", "info")
+                self.log(f"司机数: {len(driver_billing)} 位", "info")
                 for status in ['finished', 'no_show']:
                     count = sum(1 for r in rides if r.get('status') == status)
                     if count > 0:
@@ -1068,7 +982,7 @@ class RPAAutomationGUI:
                 messagebox.showinfo("完成", f"账单生成完成！\n\n"
                                    f"日期: {date}\n"
                                    f"订单: {len(rides)} 条\n"
-                                   f"司机: {len(driver_orders)} 位\n\n"
+                                   f"司机: {len(driver_billing)} 位\n\n"
                                    f"文件: {excel_file}")
                 
             except Exception as e:
@@ -1133,7 +1047,7 @@ class RPAAutomationGUI:
                 
                 # 获取订单数据（使用rides API）
                 self.log("\n1️⃣ 获取订单数据...", "info")
-                rides = self.real_scraper.get_all_rides(date=date, per_page=500, statuses='')
+                rides = self.real_scraper.get_all_rides(date=date, per_page=500, statuses='', snapshot=True)
                 self.log(f"✓ 获取到 {len(rides)} 条订单", "success")
                 
                 if len(rides) == 0:
@@ -1148,7 +1062,7 @@ class RPAAutomationGUI:
                 for idx, ride in enumerate(rides, 1):
                     try:
                         ride_id = ride.get('id')
-                        detail = self.api_client.get(f'/fleet/rides/{ride_id}')
+                        detail = self.real_scraper.get_ride_detail(ride_id, ride.get('updated_at'))
                         ride_detail = detail.get('ride', {})
                         
                         # 合并基本信息和详细信息
@@ -1359,6 +1273,18 @@ class RPAAutomationGUI:
                     for status, count in statuses.most_common():
                         self.log(f"  {status}: {count} 条")
                 
+                # 近7天订单状态（读取本地快照，只读取status列）
+                snapshots = self.real_scraper.snapshots if self.real_scraper else None
+                if snapshots is not None:
+                    end = datetime.now()
+                    start = end - timedelta(days=6)
+                    df = snapshots.read('rides', start.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d'),
+                                        columns=['status'])
+                    if len(df) > 0:
+                        self.log(f"\n近7天订单状态 (本地快照 {len(df)} 条):")
+                        for status, count in df['status'].value_counts().items():
+                            self.log(f"  {status}: {count} 条")
+                
                 self.log("\n" + "=" * 60)
                 
             except Exception as e:
@@ -2074,14 +2000,13 @@ class RPAAutomationGUI:
         """查看日志"""
         try:
             if os.path.exists(config.LOG_FILE):
-                with open(config.LOG_FILE, 'r', encoding='utf-8') as f:
-                    logs = f.readlines()
+                # 从文件末尾读取最后100行，不读取整个日志文件
+                logs = tail_lines(config.LOG_FILE, 100)
                 
-                # 显示最后100行
                 self.log("\n" + "=" * 60)
                 self.log("最近的日志记录:", "info")
                 self.log("=" * 60)
-                for line in logs[-100:]:
+                for line in logs:
                     self.log(line.strip())
             else:
                 self.log("日志文件不存在", "warning")
@@ -2090,7 +2015,7 @@ class RPAAutomationGUI:
     
     def clear_output(self):
         """清空输出"""
-        self.output_text.delete("1.0", tk.END)
+        self.log_sink.clear()
         self.log("输出已清空", "info")
     
     def show_about(self):
@@ -6,26 +6,38 @@ RPA调度系统 - 调度管理工具
 import tkinter as tk
 from tkinter import ttk, messagebox, scrolledtext
 import threading
+import time
 import os
 import re
 from datetime import datetime, timedelta
-import pytz
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor
 from api_client import APIClient
 from dispatcher import Dispatcher
+from pipeline import stream_map
+from driver_directory import get_driver_directory
+from ride_sync import RideSync
+from withdraw_scheduler import WithdrawScheduler
+from log_sink import TextLogSink
+from job_runner import JobRunner
+from time_utils import day_window, parse_local, pickup_minutes
+from log_files import log_file_handler
 import config
 import logging
+from collections import defaultdict
 
 # 配置日志
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(levelname)s - %(message)s',
     handlers=[
-        logging.FileHandler(config.LOG_FILE, encoding='utf-8'),
+        log_file_handler(),  # 按大小轮转并压缩旧日志
     ]
 )
 logger = logging.getLogger(__name__)
 
+# 实时退工监控的最小检查间隔（秒）
+MIN_CHECK_INTERVAL = 3
+
 
 class DispatchManagerGUI:
     """调度管理工具GUI"""
@@ -40,6 +52,7 @@ class DispatchManagerGUI:
         self.api_client = None
         self.dispatcher = None
         self.real_scraper = None
+        self.ride_sync = None
         self.token_var = tk.StringVar(value=config.BEARER_TOKEN)
         self.status_var = tk.StringVar(value="就绪")
         
@@ -47,9 +60,16 @@ class DispatchManagerGUI:
         self.auto_withdraw_running = False
         self.auto_withdraw_thread = None
         
+        # 派工/退工/转派/查询在后台任务中执行，界面不等待网络请求
+        self.jobs = JobRunner(on_update=self._on_job_update)
+        self._job_refresh_pending = False
+        self.job_listbox = None
+        self.job_listbox_ids = []
+        
         # 保存上次的司机ID和退工时间
         self.last_driver_ids = ""
         self.last_withdraw_minutes = "90"
+        self.last_check_interval = "30"
         self.settings_file = os.path.join(config.DATA_DIR, "dispatcher_settings.json")
         self._load_settings()
         
@@ -58,6 +78,8 @@ class DispatchManagerGUI:
         
         # 初始化API客户端
         self.initialize_client()
+        
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
     
     def _load_settings(self):
         """从文件加载上次的设置"""
@@ -68,6 +90,7 @@ class DispatchManagerGUI:
                     settings = json.load(f)
                     self.last_driver_ids = settings.get('driver_ids', '')
                     self.last_withdraw_minutes = settings.get('withdraw_minutes', '90')
+                    self.last_check_interval = settings.get('check_interval', '30')
                     logger.info(f"已加载上次的设置: 司机ID={self.last_driver_ids}, 退工时间={self.last_withdraw_minutes}")
         except Exception as e:
             logger.warning(f"加载设置失败: {e}")
@@ -78,7 +101,8 @@ class DispatchManagerGUI:
             import json
             settings = {
                 'driver_ids': self.last_driver_ids,
-                'withdraw_minutes': self.last_withdraw_minutes
+                'withdraw_minutes': self.last_withdraw_minutes,
+                'check_interval': self.last_check_interval
             }
             # 确保目录存在
             os.makedirs(os.path.dirname(self.settings_file), exist_ok=True)
@@ -160,6 +184,7 @@ class DispatchManagerGUI:
         system_frame = ttk.LabelFrame(btn_frame, text="⚙️ 系统", padding="10")
         system_frame.pack(fill=tk.X)
         
+        ttk.Button(system_frame, text="📋 后台任务", command=self.show_jobs_window, width=25).pack(fill=tk.X, pady=2)
         ttk.Button(system_frame, text="📜 查看日志文件", command=self.view_logs, width=25).pack(fill=tk.X, pady=2)
         ttk.Button(system_frame, text="🗑️ 清空输出", command=self.clear_output, width=25).pack(fill=tk.X, pady=2)
         ttk.Button(system_frame, text="ℹ️ 关于", command=self.show_about, width=25).pack(fill=tk.X, pady=2)
@@ -185,6 +210,9 @@ class DispatchManagerGUI:
         self.output_text.tag_config("info", foreground="blue")
         self.output_text.tag_config("warning", foreground="orange")
         
+        # 日志先放入队列，由主线程批量写入（后台线程调用log不会阻塞在界面刷新上）
+        self.log_sink = TextLogSink(self.root, self.output_text)
+        
         self.log("=" * 60)
         self.log("欢迎使用 RPA调度管理工具", "info")
         self.log("=" * 60)
@@ -209,15 +237,12 @@ class DispatchManagerGUI:
         self.root.after(1000, self.update_time)
     
     def log(self, message, tag=""):
-        """输出日志"""
-        self.output_text.insert(tk.END, f"{message}\n", tag)
-        self.output_text.see(tk.END)
-        self.root.update_idletasks()
+        """输出日志（任意线程可调用）"""
+        self.log_sink.write(message, tag)
     
     def set_status(self, status):
-        """设置状态"""
-        self.status_var.set(status)
-        self.root.update_idletasks()
+        """设置状态（任意线程可调用）"""
+        self.log_sink.post(self.status_var.set, status)
     
     def initialize_client(self):
         """初始化API客户端"""
@@ -226,6 +251,7 @@ class DispatchManagerGUI:
             self.api_client = APIClient(self.token_var.get())
             self.dispatcher = Dispatcher(self.api_client)
             self.real_scraper = RealAPIScraper(self.api_client)
+            self.ride_sync = RideSync(self.real_scraper)
             self.log("✓ API客户端初始化成功", "success")
         except Exception as e:
             self.log(f"✗ 初始化失败: {str(e)}", "error")
@@ -325,30 +351,37 @@ class DispatchManagerGUI:
             try:
                 ride_id = int(ride_id_entry.get().strip())
                 driver_id = int(driver_id_entry.get().strip())
-                
-                self.log("=" * 60)
-                self.log(f"开始派工: 订单 {ride_id} -> 司机 {driver_id}", "info")
-                
-                result = self.dispatcher.assign_driver(ride_id, driver_id)
-                
-                self.log(f"✓ 派工成功", "success")
-                self.log(f"响应: {result}")
-                self.log("=" * 60)
-                
-                messagebox.showinfo("成功", f"派工成功！\n\n订单ID: {ride_id}\n司机ID: {driver_id}")
-                dialog.destroy()
-                
             except ValueError:
                 messagebox.showerror("错误", "请输入有效的数字ID")
-            except Exception as e:
-                self.log(f"✗ 派工失败: {e}", "error")
-                messagebox.showerror("错误", f"派工失败:\n{e}")
+                return
+            
+            self.jobs.submit(f"派工 订单{ride_id}→司机{driver_id}", self._dispatch_job, ride_id, driver_id)
+            dialog.destroy()
         
         btn_frame = ttk.Frame(frame)
         btn_frame.grid(row=2, column=0, columnspan=2, pady=20)
         ttk.Button(btn_frame, text="取消", command=dialog.destroy).pack(side=tk.LEFT, padx=5)
         ttk.Button(btn_frame, text="确认派工", command=submit).pack(side=tk.LEFT, padx=5)
     
+    def _dispatch_job(self, job, ride_id, driver_id):
+        """后台任务：派工"""
+        self.log("=" * 60)
+        self.log(f"[#{job.id}] 开始派工: 订单 {ride_id} -> 司机 {driver_id}", "info")
+        
+        try:
+            result = self.dispatcher.assign_driver(ride_id, driver_id)
+        except Exception as e:
+            self.log(f"[#{job.id}] ✗ 派工失败: {e}", "error")
+            self.log_sink.post_dialog(messagebox.showerror, "错误", f"派工失败:\n{e}")
+            raise
+        
+        self.log(f"[#{job.id}] ✓ 派工成功", "success")
+        self.log(f"响应: {result}")
+        self.log("=" * 60)
+        
+        self.log_sink.post_dialog(messagebox.showinfo, "成功", f"派工成功！\n\n订单ID: {ride_id}\n司机ID: {driver_id}")
+        return result
+    
     def show_withdraw_dialog(self):
         """显示退工对话框 (Revive - Cancel Ride) - 按司机ID和时间段"""
         dialog = tk.Toplevel(self.root)
@@ -388,95 +421,78 @@ class DispatchManagerGUI:
             try:
                 driver_id = int(driver_id_entry.get().strip())
                 date = date_entry.get().strip()
-                time_range = time_entry.get().strip()
-                reason = "Driver Cancel"
-                
-                self.log("=" * 60)
-                self.log(f"开始批量退工", "info")
-                self.log(f"司机ID: {driver_id}", "info")
-                self.log(f"日期: {date}", "info")
-                self.log(f"时间段: {time_range}", "info")
-                self.log(f"原因: {reason}", "info")
-                
-                # 获取该司机在指定时间段的所有订单
-                from_time, to_time = time_range.split('-')
-                from_datetime = f"{date} {from_time.strip()}:00"
-                to_datetime = f"{date} {to_time.strip()}:00"
-                
-                self.log(f"获取时间段: {from_datetime} ~ {to_datetime}", "info")
-                
-                rides = self.real_scraper.get_all_rides(
-                    date=date,
-                    per_page=500,
-                    statuses=''
-                )
-                
-                # 筛选该司机在指定时间段的订单
-                driver_rides = []
-                for r in rides:
-                    if r.get('driver_id') == driver_id:
-                        pickup_time = r.get('pickup_at', '')
-                        if pickup_time:
-                            if from_datetime[:16] <= pickup_time[:16] <= to_datetime[:16]:
-                                driver_rides.append(r)
-                        else:
-                            driver_rides.append(r)
-                
-                self.log(f"找到 {len(driver_rides)} 条该司机在指定时间段的订单", "info")
-                
-                if len(driver_rides) == 0:
-                    messagebox.showwarning("提示", f"未找到司机 {driver_id} 在该时间段的订单")
-                    return
-                
-                # 逐个退工
-                success_count = 0
-                fail_count = 0
-                
-                for ride in driver_rides:
-                    ride_id = ride.get('id')
-                    status = ride.get('status', '')
-                    pickup_at = ride.get('pickup_at', '')
-                    
-                    self.log(f"  订单 {ride_id} ({pickup_at}, 状态: {status})", "info")
-                    
-                    try:
-                        self.dispatcher.cancel_ride(ride_id, reason)
-                        success_count += 1
-                        self.log(f"    ✓ 退工成功", "success")
-                    except Exception as e:
-                        fail_count += 1
-                        error_msg = str(e)
-                        if "404" in error_msg:
-                            self.log(f"    ✗ 失败: 订单不允许退工 (404)", "error")
-                        elif "403" in error_msg:
-                            self.log(f"    ✗ 失败: 无权限 (403)", "error")
-                        else:
-                            self.log(f"    ✗ 失败: {e}", "error")
-                
-                self.log("=" * 60)
-                self.log(f"✓ 批量退工完成", "success")
-                self.log(f"成功: {success_count} 条, 失败: {fail_count} 条", "info")
-                self.log("=" * 60)
-                
-                msg = f"批量退工完成！\n\n成功: {success_count} 条\n失败: {fail_count} 条"
-                
-                if success_count == 0 and fail_count > 0:
-                    messagebox.showwarning("完成", msg + "\n\n⚠️ 所有订单退工失败\n可能原因：订单状态不允许退工")
-                else:
-                    messagebox.showinfo("完成", msg)
-                dialog.destroy()
-                
+                start_time, end_time = self._parse_time_range(date, time_entry.get().strip())
             except ValueError:
-                messagebox.showerror("错误", "请输入有效的司机ID")
-            except Exception as e:
-                self.log(f"✗ 批量退工失败: {e}", "error")
-                messagebox.showerror("错误", f"批量退工失败:\n{e}")
+                messagebox.showerror("错误", "请输入有效的司机ID和时间段（如 08:00-12:00）")
+                return
+            
+            self.jobs.submit(f"批量退工 司机{driver_id}", self._withdraw_job,
+                             driver_id, date, start_time, end_time, "Driver Cancel")
+            dialog.destroy()
         
         btn_frame = ttk.Frame(frame)
         btn_frame.grid(row=4, column=0, columnspan=2, pady=15)
         ttk.Button(btn_frame, text="取消", command=dialog.destroy).pack(side=tk.LEFT, padx=5)
         ttk.Button(btn_frame, text="确认批量退工", command=submit).pack(side=tk.LEFT, padx=5)
     
+    def _withdraw_job(self, job, driver_id, date, start_time, end_time, reason):
+        """后台任务：批量退工（每个订单之间检查是否已取消）"""
+        self.log("=" * 60)
+        self.log(f"[#{job.id}] 开始批量退工", "info")
+        self.log(f"司机ID: {driver_id}", "info")
+        self.log(f"日期: {date}", "info")
+        self.log(f"时间段: {start_time}-{end_time}", "info")
+        self.log(f"原因: {reason}", "info")
+        
+        driver_rides = self._driver_rides_between(job, driver_id, date, start_time, end_time)
+        if not driver_rides:
+            self.log_sink.post_dialog(messagebox.showwarning, "提示", f"未找到司机 {driver_id} 在该时间段的订单")
+            return {'success': 0, 'failed': 0}
+        
+        # 逐个退工
+        success_count = 0
+        fail_count = 0
+        job.report(0, len(driver_rides), "退工中")
+        
+        for i, ride in enumerate(driver_rides):
+            if job.cancelled:
+                self.log(f"[#{job.id}] ⚠️ 任务已取消，剩余 {len(driver_rides) - i} 条未处理", "warning")
+                break
+            
+            ride_id = ride.get('id')
+            status = ride.get('status', '')
+            pickup_at = ride.get('pickup_at', '')
+            
+            self.log(f"  [#{job.id}] 订单 {ride_id} ({pickup_at}, 状态: {status})", "info")
+            
+            try:
+                self.dispatcher.cancel_ride(ride_id, reason)
+                success_count += 1
+                self.log(f"    ✓ 退工成功", "success")
+            except Exception as e:
+                fail_count += 1
+                error_msg = str(e)
+                if "404" in error_msg:
+                    self.log(f"    ✗ 失败: 订单不允许退工 (404)", "error")
+                elif "403" in error_msg:
+                    self.log(f"    ✗ 失败: 无权限 (403)", "error")
+                else:
+                    self.log(f"    ✗ 失败: {e}", "error")
+            job.report(done=i + 1)
+        
+        self.log("=" * 60)
+        self.log(f"[#{job.id}] ✓ 批量退工{'已取消' if job.cancelled else '完成'}", "success")
+        self.log(f"成功: {success_count} 条, 失败: {fail_count} 条", "info")
+        self.log("=" * 60)
+        
+        msg = f"批量退工{'已取消' if job.cancelled else '完成'}！\n\n司机ID: {driver_id}\n成功: {success_count} 条\n失败: {fail_count} 条"
+        
+        if success_count == 0 and fail_count > 0:
+            self.log_sink.post_dialog(messagebox.showwarning, "完成", msg + "\n\n⚠️ 所有订单退工失败\n可能原因：订单状态不允许退工")
+        else:
+            self.log_sink.post_dialog(messagebox.showinfo, "完成", msg)
+        return {'success': success_count, 'failed': fail_count}
+    
     def show_transfer_dialog(self):
         """显示转派对话框 (Switch Driver) - 按司机ID和时间段"""
         dialog = tk.Toplevel(self.root)
@@ -517,77 +533,101 @@ class DispatchManagerGUI:
                 from_driver_id = int(from_driver_entry.get().strip())
                 to_driver_id = int(to_driver_entry.get().strip())
                 date = date_entry.get().strip()
-                time_range = time_entry.get().strip()
-                
-                self.log("=" * 60)
-                self.log(f"开始批量转派", "info")
-                self.log(f"原司机ID: {from_driver_id}", "info")
-                self.log(f"新司机ID: {to_driver_id}", "info")
-                self.log(f"日期: {date}", "info")
-                self.log(f"时间段: {time_range}", "info")
-                
-                # 获取该司机在指定时间段的所有订单
-                from_time, to_time = time_range.split('-')
-                from_datetime = f"{date} {from_time.strip()}:00"
-                to_datetime = f"{date} {to_time.strip()}:00"
-                
-                self.log(f"获取时间段: {from_datetime} ~ {to_datetime}", "info")
-                
-                rides = self.real_scraper.get_all_rides(
-                    date=date,
-                    per_page=500,
-                    statuses=''
-                )
-                
-                # 筛选该司机在指定时间段的订单
-                driver_rides = []
-                for r in rides:
-                    if r.get('driver_id') == from_driver_id:
-                        pickup_time = r.get('pickup_at', '')
-                        if pickup_time:
-                            if from_datetime[:16] <= pickup_time[:16] <= to_datetime[:16]:
-                                driver_rides.append(r)
-                        else:
-                            driver_rides.append(r)
-                
-                self.log(f"找到 {len(driver_rides)} 条该司机在指定时间段的订单", "info")
-                
-                if len(driver_rides) == 0:
-                    messagebox.showwarning("提示", f"未找到司机 {from_driver_id} 在该时间段的订单")
-                    return
-                
-                # 逐个转派
-                success_count = 0
-                fail_count = 0
-                for ride in driver_rides:
-                    try:
-                        ride_id = ride.get('id')
-                        self.dispatcher.transfer_driver(ride_id, to_driver_id)
-                        success_count += 1
-                        self.log(f"  ✓ 订单 {ride_id} 转派成功", "success")
-                    except Exception as e:
-                        fail_count += 1
-                        self.log(f"  ✗ 订单 {ride.get('id')} 转派失败: {e}", "error")
-                
-                self.log("=" * 60)
-                self.log(f"✓ 批量转派完成", "success")
-                self.log(f"成功: {success_count} 条, 失败: {fail_count} 条", "info")
-                self.log("=" * 60)
-                
-                messagebox.showinfo("完成", f"批量转派完成！\n\n成功: {success_count} 条\n失败: {fail_count} 条")
-                dialog.destroy()
-                
+                start_time, end_time = self._parse_time_range(date, time_entry.get().strip())
             except ValueError:
-                messagebox.showerror("错误", "请输入有效的数字ID")
-            except Exception as e:
-                self.log(f"✗ 批量转派失败: {e}", "error")
-                messagebox.showerror("错误", f"批量转派失败:\n{e}")
+                messagebox.showerror("错误", "请输入有效的数字ID和时间段（如 08:00-12:00）")
+                return
+            
+            self.jobs.submit(f"批量转派 司机{from_driver_id}→{to_driver_id}", self._transfer_job,
+                             from_driver_id, to_driver_id, date, start_time, end_time)
+            dialog.destroy()
         
         btn_frame = ttk.Frame(frame)
         btn_frame.grid(row=4, column=0, columnspan=2, pady=15)
         ttk.Button(btn_frame, text="取消", command=dialog.destroy).pack(side=tk.LEFT, padx=5)
         ttk.Button(btn_frame, text="确认批量转派", command=submit).pack(side=tk.LEFT, padx=5)
     
+    def _transfer_job(self, job, from_driver_id, to_driver_id, date, start_time, end_time):
+        """后台任务：批量转派（每个订单之间检查是否已取消）"""
+        self.log("=" * 60)
+        self.log(f"[#{job.id}] 开始批量转派", "info")
+        self.log(f"原司机ID: {from_driver_id}", "info")
+        self.log(f"新司机ID: {to_driver_id}", "info")
+        self.log(f"日期: {date}", "info")
+        self.log(f"时间段: {start_time}-{end_time}", "info")
+        
+        driver_rides = self._driver_rides_between(job, from_driver_id, date, start_time, end_time)
+        if not driver_rides:
+            self.log_sink.post_dialog(messagebox.showwarning, "提示", f"未找到司机 {from_driver_id} 在该时间段的订单")
+            return {'success': 0, 'failed': 0}
+        
+        # 逐个转派
+        success_count = 0
+        fail_count = 0
+        job.report(0, len(driver_rides), "转派中")
+        
+        for i, ride in enumerate(driver_rides):
+            if job.cancelled:
+                self.log(f"[#{job.id}] ⚠️ 任务已取消，剩余 {len(driver_rides) - i} 条未处理", "warning")
+                break
+            
+            ride_id = ride.get('id')
+            try:
+                self.dispatcher.transfer_driver(ride_id, to_driver_id)
+                success_count += 1
+                self.log(f"  [#{job.id}] ✓ 订单 {ride_id} 转派成功", "success")
+            except Exception as e:
+                fail_count += 1
+                self.log(f"  [#{job.id}] ✗ 订单 {ride_id} 转派失败: {e}", "error")
+            job.report(done=i + 1)
+        
+        self.log("=" * 60)
+        self.log(f"[#{job.id}] ✓ 批量转派{'已取消' if job.cancelled else '完成'}", "success")
+        self.log(f"成功: {success_count} 条, 失败: {fail_count} 条", "info")
+        self.log("=" * 60)
+        
+        self.log_sink.post_dialog(messagebox.showinfo, "完成",
+                                  f"批量转派{'已取消' if job.cancelled else '完成'}！\n\n"
+                                  f"{from_driver_id} → {to_driver_id}\n成功: {success_count} 条\n失败: {fail_count} 条")
+        return {'success': success_count, 'failed': fail_count}
+    
+    @staticmethod
+    def _parse_time_range(date, time_range):
+        """
+        检查日期并解析时间段 "HH:MM-HH:MM"
+        
+        Returns:
+            (开始时间, 结束时间)，格式 "HH:MM"；格式错误时抛出 ValueError
+        """
+        datetime.strptime(date, '%Y-%m-%d')
+        from_time, to_time = time_range.split('-')
+        start_time = datetime.strptime(from_time.strip(), '%H:%M').strftime('%H:%M')
+        end_time = datetime.strptime(to_time.strip(), '%H:%M').strftime('%H:%M')
+        return start_time, end_time
+    
+    def _driver_rides_between(self, job, driver_id, date, start_time, end_time):
+        """获取司机在指定时间段的订单（没有上车时间的订单也包含在内）"""
+        self.log(f"[#{job.id}] 获取时间段: {date} {start_time} ~ {end_time}", "info")
+        job.report(message="获取订单")
+        
+        ride_sync = self._shared_ride_sync()
+        if ride_sync.has_date(date):
+            # 已有当天订单副本（如实时退工监控正在运行）：增量同步后直接查索引
+            start, end = day_window(date, start_time, end_time)
+            driver_rides = ride_sync.index().between(start, end, driver_id=driver_id, include_untimed=True)
+        else:
+            # 司机和时间段由服务器过滤，不再下载当天全部订单
+            driver_rides = self.real_scraper.find_rides(
+                date=date,
+                driver_id=driver_id,
+                start_time=start_time,
+                end_time=end_time
+            )
+        job.check_cancelled()
+        
+        self.log(f"[#{job.id}] 找到 {len(driver_rides)} 条该司机在指定时间段的订单", "info")
+        return driver_rides
+    
     def show_driver_orders_dialog(self):
         """查看司机订单对话框"""
         dialog = tk.Toplevel(self.root)
@@ -618,36 +658,152 @@ class DispatchManagerGUI:
             try:
                 driver_id = int(driver_id_entry.get().strip())
                 date = date_entry.get().strip()
-                
-                self.log("=" * 60)
-                self.log(f"查询司机 {driver_id} 在 {date} 的订单", "info")
-                
-                rides = self.real_scraper.get_all_rides(
-                    date=date,
-                    per_page=500,
-                    statuses=''
-                )
-                
-                driver_rides = [r for r in rides if r.get('driver_id') == driver_id]
-                
-                self.log(f"\n找到 {len(driver_rides)} 条订单:", "success")
-                for ride in driver_rides:
-                    self.log(f"  订单ID: {ride.get('id')} | 时间: {ride.get('pickup_at')} | 状态: {ride.get('status')}", "info")
-                
-                self.log("=" * 60)
-                
-                dialog.destroy()
             except ValueError:
                 messagebox.showerror("错误", "请输入有效的司机ID")
-            except Exception as e:
-                self.log(f"✗ 查询失败: {e}", "error")
-                messagebox.showerror("错误", f"查询失败: {e}")
+                return
+            
+            self.jobs.submit(f"查询司机{driver_id}订单", self._driver_orders_job, driver_id, date)
+            dialog.destroy()
         
         btn_frame = ttk.Frame(frame)
         btn_frame.grid(row=2, column=0, columnspan=2, pady=20)
         ttk.Button(btn_frame, text="取消", command=dialog.destroy).pack(side=tk.LEFT, padx=5)
         ttk.Button(btn_frame, text="查询", command=submit).pack(side=tk.LEFT, padx=5)
     
+    def _driver_orders_job(self, job, driver_id, date):
+        """后台任务：查询司机订单"""
+        try:
+            self.log("=" * 60)
+            self.log(f"[#{job.id}] 查询司机 {driver_id} ({get_driver_directory(self.real_scraper).name(driver_id)}) 在 {date} 的订单", "info")
+            
+            ride_sync = self._shared_ride_sync()
+            if ride_sync.has_date(date):
+                driver_rides = ride_sync.index().for_driver(driver_id)
+            else:
+                driver_rides = self.real_scraper.find_rides(date=date, driver_id=driver_id)
+        except Exception as e:
+            self.log(f"[#{job.id}] ✗ 查询失败: {e}", "error")
+            self.log_sink.post_dialog(messagebox.showerror, "错误", f"查询失败: {e}")
+            raise
+        
+        self.log(f"\n[#{job.id}] 司机 {driver_id} 找到 {len(driver_rides)} 条订单:", "success")
+        for ride in driver_rides:
+            self.log(f"  订单ID: {ride.get('id')} | 时间: {ride.get('pickup_at')} | 状态: {ride.get('status')}", "info")
+        
+        self.log("=" * 60)
+        return driver_rides
+    
+    def _shared_ride_sync(self):
+        """
+        各功能共用的当天订单副本
+        
+        实时退工监控持续增量同步该副本；退工、转派、查询和高价订单筛选在副本已同步过
+        同一天时直接查询它的索引，不再重新下载订单。
+        """
+        from real_api_scraper import RealAPIScraper
+        if not self.real_scraper:
+            self.real_scraper = RealAPIScraper(self.api_client)
+        if self.ride_sync is None or self.ride_sync.scraper is not self.real_scraper:
+            self.ride_sync = RideSync(self.real_scraper)
+        return self.ride_sync
+    
+    # ==================== 后台任务 ====================
+    
+    def _on_job_update(self, job):
+        """任务状态变化（后台线程调用）：合并到下一次界面刷新时更新状态栏和任务窗口"""
+        if job.finished:
+            if job.status == job.FAILED:
+                self.log(f"✗ 任务 #{job.id} {job.name} 失败: {job.error}", "error")
+            elif job.status == job.CANCELLED:
+                self.log(f"任务 #{job.id} {job.name} 已取消", "warning")
+        
+        if not self._job_refresh_pending:
+            self._job_refresh_pending = True
+            self.log_sink.post(self._refresh_jobs)
+    
+    def _refresh_jobs(self):
+        """更新状态栏和任务窗口（主线程）"""
+        self._job_refresh_pending = False
+        
+        active = self.jobs.jobs(include_finished=False)
+        if active:
+            progress = ", ".join(f"#{job.id} {job.done}/{job.total}" if job.total else f"#{job.id}" for job in active)
+            self.status_var.set(f"后台任务 {len(active)} 个未完成: {progress}")
+        else:
+            self.status_var.set("就绪")
+        
+        if self.job_listbox is not None:
+            try:
+                jobs = self.jobs.jobs()
+                selected = self.job_listbox.curselection()
+                self.job_listbox.delete(0, tk.END)
+                for job in jobs:
+                    self.job_listbox.insert(tk.END, job.describe())
+                    if job.finished:
+                        self.job_listbox.itemconfig(tk.END, foreground="gray")
+                for index in selected:
+                    if index < len(jobs):
+                        self.job_listbox.selection_set(index)
+                self.job_listbox_ids = [job.id for job in jobs]
+            except tk.TclError:
+                # 任务窗口已关闭
+                self.job_listbox = None
+    
+    def show_jobs_window(self):
+        """显示后台任务列表（可取消任务）"""
+        if self.job_listbox is not None:
+            self.job_listbox.winfo_toplevel().lift()
+            return
+        
+        window = tk.Toplevel(self.root)
+        window.title("后台任务")
+        window.geometry("600x300")
+        
+        frame = ttk.Frame(window, padding="10")
+        frame.pack(fill=tk.BOTH, expand=True)
+        
+        self.job_listbox = tk.Listbox(frame, font=("Consolas", 10), selectmode=tk.EXTENDED)
+        self.job_listbox.pack(fill=tk.BOTH, expand=True)
+        self.job_listbox_ids = []
+        
+        def cancel_selected():
+            for index in self.job_listbox.curselection():
+                job_id = self.job_listbox_ids[index]
+                if self.jobs.cancel(job_id):
+                    self.log(f"正在取消任务 #{job_id}（当前订单处理完后停止）...", "warning")
+        
+        def cancel_all():
+            if self.jobs.jobs(include_finished=False):
+                self.jobs.cancel_all()
+                self.log("正在取消所有后台任务...", "warning")
+        
+        def clear_finished():
+            self.jobs.clear_finished()
+            self._refresh_jobs()
+        
+        def close():
+            self.job_listbox = None
+            window.destroy()
+        
+        btn_frame = ttk.Frame(frame)
+        btn_frame.pack(fill=tk.X, pady=(10, 0))
+        ttk.Button(btn_frame, text="取消选中任务", command=cancel_selected).pack(side=tk.LEFT, padx=5)
+        ttk.Button(btn_frame, text="全部取消", command=cancel_all).pack(side=tk.LEFT, padx=5)
+        ttk.Button(btn_frame, text="清除已结束", command=clear_finished).pack(side=tk.LEFT, padx=5)
+        ttk.Button(btn_frame, text="关闭", command=close).pack(side=tk.RIGHT, padx=5)
+        
+        window.protocol("WM_DELETE_WINDOW", close)
+        self._refresh_jobs()
+    
+    def on_close(self):
+        """关闭主窗口：有后台任务运行时确认后取消"""
+        active = self.jobs.jobs(include_finished=False)
+        if active and not messagebox.askyesno("确认退出", f"还有 {len(active)} 个后台任务未完成，退出将取消这些任务。\n\n确定退出吗？"):
+            return
+        self.jobs.shutdown()
+        self.log_sink.stop()
+        self.root.destroy()
+    
     # ==================== 系统功能 ====================
     
     def view_logs(self):
@@ -662,7 +818,7 @@ class DispatchManagerGUI:
     
     def clear_output(self):
         """清空输出"""
-        self.output_text.delete(1.0, tk.END)
+        self.log_sink.clear()
         self.log("=" * 60)
         self.log("输出已清空", "info")
         self.log("=" * 60)
@@ -679,6 +835,7 @@ RPA调度管理工具 v1.0
 • 转派 (Switch) - 将订单转给其他司机
 • 退工 (Revive) - 取消订单
 • 查询司机订单
+• 后台任务 - 批量操作在后台运行，可同时进行多批并随时取消
 • 高价订单筛选 - 自动筛选并分配高价订单
 • 实时退工监控 - 自动监控并退工订单
 
@@ -819,182 +976,154 @@ RPA调度管理工具 v1.0
                 self.log(f"价格限定: ${min_price:.2f}")
                 self.log(f"目标司机ID: {target_driver_id}")
                 
-                # 获取pending订单
-                self.log("\n获取pending订单...", "info")
-                
                 from real_api_scraper import RealAPIScraper
                 if not self.real_scraper:
                     self.real_scraper = RealAPIScraper(self.api_client)
                 
-                # 获取指定日期的订单
-                all_rides = self.real_scraper.get_all_rides(date=date, per_page=500, statuses='pending')
-                
-                self.log(f"✓ 获取到 {len(all_rides)} 个pending订单", "success")
-                
-                if len(all_rides) == 0:
-                    self.log("\n没有找到订单", "warning")
-                    self.set_status("就绪")
-                    return
-                
                 # 解析时间范围
                 start_hour, start_minute = map(int, start_time.split(':'))
                 end_hour, end_minute = map(int, end_time.split(':'))
                 start_minutes = start_hour * 60 + start_minute
                 end_minutes = end_hour * 60 + end_minute
                 
-                # 第一步：筛选时间段内的订单
-                self.log(f"\n第一步：筛选时间段 {start_time}-{end_time} 内的订单...", "info")
-                time_matched_rides = []
-                
-                for ride in all_rides:
-                    try:
-                        ride_id = ride.get('id')
-                        pickup_at = ride.get('pickup_at', '')
-                        
-                        if not pickup_at:
-                            continue
-                        
-                        # 解析pickup时间
-                        try:
-                            if 'T' in pickup_at:
-                                pickup_time = datetime.fromisoformat(pickup_at.replace('Z', '+00:00'))
-                                # 转换为纽约时间（美东时间）
-                                ny_tz = pytz.timezone('America/New_York')
-                                pickup_time = pickup_time.astimezone(ny_tz)
-                            else:
-                                pickup_time = datetime.strptime(pickup_at, '%Y-%m-%d %H:%M:%S')
-                            
-                            # 提取小时和分钟
-                            pickup_minutes = pickup_time.hour * 60 + pickup_time.minute
-                            pickup_time_str = f"{pickup_time.hour:02d}:{pickup_time.minute:02d}"
-                            
-                            # 检查是否在时间范围内
-                            if start_minutes <= pickup_minutes <= end_minutes:
-                                time_matched_rides.append({
-                                    'id': ride_id,
-                                    'pickup_time': pickup_time_str,
-                                    'pickup_at': pickup_at
-                                })
-                        except Exception as e:
-                            continue
-                    except Exception as e:
-                        continue
+                # 流水线各阶段的统计
+                stats = defaultdict(int)
+                started_at = time.time()
+                first_assigned_at = None
                 
-                self.log(f"✓ 找到 {len(time_matched_rides)} 个时间段内的订单", "success")
+                def match_time(ride):
+                    """检查订单是否在时间段内，返回流水线需要的订单信息"""
+                    pickup_at = ride.get('pickup_at', '')
+                    # 转换为纽约时间（美东时间），相同的时间字符串只解析一次
+                    minutes = pickup_minutes(pickup_at)
+                    if minutes is None or not start_minutes <= minutes <= end_minutes:
+                        return None
+                    
+                    return {
+                        'id': ride.get('id'),
+                        'pickup_time': f"{minutes // 60:02d}:{minutes % 60:02d}",
+                        'pickup_at': pickup_at,
+                        'updated_at': ride.get('updated_at')
+                    }
                 
-                if len(time_matched_rides) == 0:
-                    self.log("\n没有符合时间段的订单", "warning")
-                    self.set_status("就绪")
-                    return
+                def match_batch(rides):
+                    """按时间段筛选一批订单"""
+                    batch = []
+                    for ride in rides:
+                        info = match_time(ride)
+                        if info:
+                            stats['time_matched'] += 1
+                            batch.append(info)
+                    return batch
                 
-                # 第二步：获取详细信息并筛选高价订单（多线程并发）
-                self.log(f"\n第二步：获取订单详细信息并筛选价格 ≥ ${min_price:.2f} 的订单...", "info")
-                self.log(f"  使用多线程加速（10个并发线程）...", "info")
+                def time_matched_batches():
+                    """第一阶段：每页订单到达后立即按时间段筛选，按页返回"""
+                    ride_sync = self._shared_ride_sync()
+                    if ride_sync.has_date(date):
+                        # 已有当天订单副本：增量同步后按索引取出时间段内的pending订单
+                        index = ride_sync.index()
+                        stats['pending'] += len(index.with_status('pending'))
+                        window_start, window_end = day_window(date, start_time, end_time)
+                        self.log(f"  使用当天订单副本: {stats['pending']} 个pending订单", "info")
+                        yield match_batch(index.between(window_start, window_end, statuses=['pending']))
+                        return
+                    
+                    seen = set()
+                    failed_pages = []
+                    for page, rides, total in self.real_scraper.iter_rides_pages(
+                            date=date, per_page=500, statuses='pending', failed=failed_pages):
+                        stats['pending'] += len(rides)
+                        self.log(f"  第 {page} 页: {len(rides)} 个pending订单 (共 {total} 个)", "info")
+                        new_rides = [ride for ride in rides if ride.get('id') not in seen]
+                        seen.update(ride.get('id') for ride in new_rides)
+                        yield match_batch(new_rides)
+                    
+                    if failed_pages:
+                        pages = ', '.join(str(page) for page in sorted(failed_pages))
+                        self.log(f"  ⚠️ 第 {pages} 页pending订单获取失败，这些订单未参与筛选", "warning")
                 
-                high_price_orders = []
-                price_filtered_count = 0
-                failed_count = 0
-                processed_count = 0
+                def ride_details():
+                    """第二阶段：每页时间段内的订单，缓存未命中的详情在一个事件循环中并发获取，取出价格"""
+                    for batch in time_matched_batches():
+                        if not batch:
+                            continue
+                        details = self.real_scraper.get_ride_details(batch)
+                        for ride_info in batch:
+                            detail = details.get(ride_info['id'])
+                            if isinstance(detail, Exception):
+                                yield ride_info, None, detail
+                                continue
+                            if detail is None:
+                                yield ride_info, None, ValueError("未获取到订单详情")
+                                continue
+                            ride_detail = detail.get('ride', {})
+                            yield ride_info, {
+                                'id': ride_info['id'],
+                                'price': float(ride_detail.get('vendor_amount', 0) or 0),
+                                'pickup_time': ride_info['pickup_time'],
+                                'passenger': ride_detail.get('passenger', {}).get('name', '未知')
+                            }, None
                 
-                # 定义获取单个订单详情的函数
-                def fetch_ride_detail(ride_info):
-                    try:
-                        ride_id = ride_info['id']
-                        detail = self.api_client.get(f'/fleet/rides/{ride_id}')
-                        ride_detail = detail.get('ride', {})
-                        vendor_amount = float(ride_detail.get('vendor_amount', 0) or 0)
-                        passenger_name = ride_detail.get('passenger', {}).get('name', '未知')
+                def high_price_orders(details):
+                    """第三阶段：价格达到阈值的订单立即交给分配"""
+                    for ride_info, order, error in details:
+                        stats['processed'] += 1
+                        if error is not None:
+                            stats['failed'] += 1
+                            if stats['failed'] <= 3:
+                                self.log(f"  ✗ 订单#{ride_info['id']}获取失败: {error}", "warning")
+                            continue
                         
-                        return {
-                            'success': True,
-                            'ride_id': ride_id,
-                            'price': vendor_amount,
-                            'pickup_time': ride_info['pickup_time'],
-                            'passenger': passenger_name
-                        }
-                    except Exception as e:
-                        return {
-                            'success': False,
-                            'ride_id': ride_info['id'],
-                            'error': str(e)
-                        }
-                
-                # 使用线程池并发请求
-                with ThreadPoolExecutor(max_workers=10) as executor:
-                    # 提交所有任务
-                    future_to_ride = {executor.submit(fetch_ride_detail, ride): ride for ride in time_matched_rides}
-                    
-                    # 处理完成的任务
-                    for future in as_completed(future_to_ride):
-                        result = future.result()
-                        processed_count += 1
+                        if stats['processed'] <= 5:
+                            self.log(f"  订单#{order['id']}: 价格=${order['price']:.2f}, 时间={order['pickup_time']}", "info")
                         
-                        if result['success']:
-                            # 显示前5个订单的详细信息
-                            if processed_count <= 5:
-                                self.log(f"  订单#{result['ride_id']}: 价格=${result['price']:.2f}, 时间={result['pickup_time']}", "info")
-                            
-                            # 检查价格
-                            if result['price'] >= min_price:
-                                high_price_orders.append({
-                                    'id': result['ride_id'],
-                                    'price': result['price'],
-                                    'pickup_time': result['pickup_time'],
-                                    'passenger': result['passenger']
-                                })
-                            else:
-                                price_filtered_count += 1
+                        if order['price'] >= min_price:
+                            stats['high_price'] += 1
+                            yield order
                         else:
-                            failed_count += 1
-                            if failed_count <= 3:
-                                self.log(f"  ✗ 订单#{result['ride_id']}获取失败: {result['error']}", "warning")
-                        
-                        # 进度显示
-                        if processed_count % 50 == 0:
-                            self.log(f"  进度: {processed_count}/{len(time_matched_rides)}", "info")
+                            stats['price_filtered'] += 1
                 
-                if failed_count > 0:
-                    self.log(f"  ⚠️ {failed_count} 个订单获取失败", "warning")
-                if price_filtered_count > 0:
-                    self.log(f"  💰 {price_filtered_count} 个订单价格低于阈值", "info")
+                def assign(order):
+                    """第四阶段：分配给目标司机"""
+                    return self.dispatcher.assign_driver(order['id'], int(target_driver_id))
                 
-                self.log(f"\n✓ 找到 {len(high_price_orders)} 个符合条件的高价订单", "success")
+                self.log("\n获取pending订单并流水线处理（按时间筛选 → 获取详情 → 价格筛选 → 分配）...", "info")
+                self.log(f"  每页到达后立即筛选，高价订单获取详情后立即分配到司机 {target_driver_id}", "info")
                 
-                if len(high_price_orders) == 0:
-                    self.log("\n没有符合条件的订单", "warning")
-                    self.set_status("就绪")
-                    return
-                
-                # 显示前10个订单预览
-                self.log(f"\n订单预览（前10个）:", "info")
-                for i, order in enumerate(high_price_orders[:10], 1):
-                    self.log(f"  {i}. 订单 {order['id']} - ${order['price']:.2f} - {order['pickup_time']} - {order['passenger']}")
-                
-                if len(high_price_orders) > 10:
-                    self.log(f"  ...还有 {len(high_price_orders) - 10} 个订单")
-                
-                # 分配订单
-                self.log(f"\n开始将订单分配到司机 {target_driver_id}...", "info")
                 success_count = 0
                 fail_count = 0
+                self.real_scraper.ride_cache.reset_stats()
                 
-                for order in high_price_orders:
-                    try:
-                        # 使用dispatcher的assign_driver方法
-                        result = self.dispatcher.assign_driver(order['id'], int(target_driver_id))
-                        
-                        if result.get('success'):
-                            self.log(f"  ✓ 订单 {order['id']} (${order['price']:.2f})", "success")
+                with ThreadPoolExecutor(max_workers=self.dispatcher.BULK_WORKERS) as assign_pool:
+                    assignments = stream_map(assign_pool, assign, high_price_orders(ride_details()))
+                    
+                    for order, result, error in assignments:
+                        if error is None and result.get('success'):
+                            if first_assigned_at is None:
+                                first_assigned_at = time.time()
+                                self.log(f"  ⚡ 首个订单分配用时 {first_assigned_at - started_at:.2f} 秒", "info")
+                            self.log(f"  ✓ 订单 {order['id']} (${order['price']:.2f}) - {order['pickup_time']} - {order['passenger']}", "success")
                             success_count += 1
                         else:
-                            self.log(f"  ✗ 订单 {order['id']} 分配失败: {result.get('error', '未知错误')}", "error")
+                            reason = error if error is not None else result.get('error', '未知错误')
+                            self.log(f"  ✗ 订单 {order['id']} 分配失败: {reason}", "error")
                             fail_count += 1
-                    except Exception as e:
-                        self.log(f"  ✗ 订单 {order['id']} 分配失败: {e}", "error")
-                        fail_count += 1
+                
+                self.log(f"\n✓ 共 {stats['pending']} 个pending订单，{stats['time_matched']} 个在时间段内", "success")
+                self.log(f"  详情缓存: {self.real_scraper.ride_cache.summary()}", "info")
+                if stats['failed'] > 0:
+                    self.log(f"  ⚠️ {stats['failed']} 个订单获取失败", "warning")
+                if stats['price_filtered'] > 0:
+                    self.log(f"  💰 {stats['price_filtered']} 个订单价格低于阈值", "info")
+                
+                if stats['high_price'] == 0:
+                    self.log("\n没有符合条件的订单", "warning")
+                    self.set_status("就绪")
+                    return
                 
                 self.log(f"\n{'='*60}")
-                self.log(f"✓ 完成！成功: {success_count}, 失败: {fail_count}, 总计: {len(high_price_orders)}", "success")
+                self.log(f"✓ 完成！成功: {success_count}, 失败: {fail_count}, 总计: {stats['high_price']} "
+                         f"(用时 {time.time() - started_at:.1f} 秒)", "success")
                 self.set_status("就绪")
                 
             except Exception as e:
@@ -1008,15 +1137,15 @@ RPA调度管理工具 v1.0
         """显示实时退工监控对话框"""
         dialog = tk.Toplevel(self.root)
         dialog.title("⏰ 实时退工监控")
-        dialog.geometry("520x380")
+        dialog.geometry("520x440")
         dialog.transient(self.root)
         dialog.grab_set()
         
         # 居中显示
         dialog.update_idletasks()
         x = (dialog.winfo_screenwidth() // 2) - (520 // 2)
-        y = (dialog.winfo_screenheight() // 2) - (380 // 2)
-        dialog.geometry(f"520x380+{x}+{y}")
+        y = (dialog.winfo_screenheight() // 2) - (440 // 2)
+        dialog.geometry(f"520x440+{x}+{y}")
         
         # 说明
         ttk.Label(dialog, text="监控指定司机的订单，在pick up时间前自动退工\n提前10分钟开始红色倒计时提醒", 
@@ -1044,6 +1173,13 @@ RPA调度管理工具 v1.0
         minutes_entry.grid(row=2, column=1, sticky=(tk.W, tk.E), pady=5, padx=(10, 0))
         ttk.Label(input_frame, text="(在pick up时间前多少分钟退工，建议90分钟)", font=("Arial", 8)).grid(row=3, column=1, sticky=tk.W, padx=(10, 0))
         
+        # 检查间隔
+        ttk.Label(input_frame, text="检查间隔(秒):").grid(row=4, column=0, sticky=tk.W, pady=5)
+        interval_var = tk.StringVar(value=self.last_check_interval)
+        interval_entry = ttk.Entry(input_frame, textvariable=interval_var, width=40)
+        interval_entry.grid(row=4, column=1, sticky=(tk.W, tk.E), pady=5, padx=(10, 0))
+        ttk.Label(input_frame, text=f"(最小{MIN_CHECK_INTERVAL}秒，间隔越短退工时间越准确)", font=("Arial", 8)).grid(row=5, column=1, sticky=tk.W, padx=(10, 0))
+        
         input_frame.columnconfigure(1, weight=1)
         input_frame.rowconfigure(0, weight=1)
         
@@ -1054,8 +1190,9 @@ RPA调度管理工具 v1.0
         def start_monitor():
             driver_ids_text = driver_text.get("1.0", tk.END).strip()
             minutes_str = minutes_var.get().strip()
+            interval_str = interval_var.get().strip()
             
-            if not driver_ids_text or not minutes_str:
+            if not driver_ids_text or not minutes_str or not interval_str:
                 messagebox.showerror("错误", "请填写所有字段")
                 return
             
@@ -1083,13 +1220,22 @@ RPA调度管理工具 v1.0
                 messagebox.showerror("错误", "退工时间必须是正整数")
                 return
             
+            try:
+                check_interval = int(interval_str)
+                if check_interval < MIN_CHECK_INTERVAL:
+                    raise ValueError
+            except ValueError:
+                messagebox.showerror("错误", f"检查间隔必须是不小于{MIN_CHECK_INTERVAL}的整数")
+                return
+            
             # 保存输入以便下次使用
             self.last_driver_ids = driver_ids_text
             self.last_withdraw_minutes = minutes_str
+            self.last_check_interval = interval_str
             self._save_settings()  # 保存到文件
             
             dialog.destroy()
-            self.start_auto_withdraw(driver_ids, minutes)
+            self.start_auto_withdraw(driver_ids, minutes, check_interval)
         
         # 按钮布局优化
         if self.auto_withdraw_running:
@@ -1099,7 +1245,7 @@ RPA调度管理工具 v1.0
             ttk.Button(btn_frame, text="▶ 开始监控", command=start_monitor, width=20).pack(side=tk.LEFT, padx=5)
             ttk.Button(btn_frame, text="取消", command=dialog.destroy, width=10).pack(side=tk.LEFT, padx=5)
     
-    def start_auto_withdraw(self, driver_ids, minutes_before):
+    def start_auto_withdraw(self, driver_ids, minutes_before, check_interval=30):
         """启动实时退工监控"""
         if self.auto_withdraw_running:
             messagebox.showwarning("警告", "监控已在运行中")
@@ -1117,7 +1263,8 @@ RPA调度管理工具 v1.0
         monitor_window.geometry(f"700x500+{x}+{y}")
         
         # 状态标签
-        status_label = ttk.Label(monitor_window, text="监控运行中...", font=("Arial", 10, "bold"))
+        monitor_status = tk.StringVar(value="监控运行中...")
+        status_label = ttk.Label(monitor_window, textvariable=monitor_status, font=("Arial", 10, "bold"))
         status_label.pack(pady=10)
         
         # 日志区域
@@ -1134,20 +1281,25 @@ RPA调度管理工具 v1.0
         monitor_log.tag_config("error", foreground="red")
         monitor_log.tag_config("countdown", foreground="purple", font=("Consolas", 9, "bold"))
         
+        # 监控线程和退工线程只把日志放入队列，由主线程批量写入监控窗口
+        monitor_sink = TextLogSink(monitor_window, monitor_log)
+        
         def log_to_monitor(msg, level="info"):
-            """输出到监控窗口"""
+            """输出到监控窗口（任意线程可调用）"""
             timestamp = datetime.now().strftime('%H:%M:%S')
-            monitor_log.insert(tk.END, f"[{timestamp}] {msg}\n", level)
-            monitor_log.see(tk.END)
-            monitor_log.update()
+            monitor_sink.write(f"[{timestamp}] {msg}", level)
         
         # 按钮区域
         btn_frame = ttk.Frame(monitor_window)
         btn_frame.pack(pady=10)
         
+        def close_window():
+            monitor_sink.stop()
+            monitor_window.destroy()
+        
         def close_monitor():
             self.stop_auto_withdraw()
-            monitor_window.destroy()
+            close_window()
         
         close_btn = ttk.Button(btn_frame, text="🛑 停止并关闭", command=close_monitor, width=20)
         close_btn.pack()
@@ -1161,42 +1313,140 @@ RPA调度管理工具 v1.0
         log_to_monitor("⏰ 启动实时退工监控", "success")
         log_to_monitor(f"监控司机: {', '.join(driver_ids)}", "info")
         log_to_monitor(f"退工时间: pick up前 {minutes_before} 分钟", "info")
+        log_to_monitor(f"检查间隔: {check_interval} 秒", "info")
         log_to_monitor(f"倒计时: 提前10分钟开始 (红色显示)", "info")
         log_to_monitor(f"详细信息: 仅显示2小时内的订单", "info")
         log_to_monitor("="*60, "info")
         log_to_monitor("", "info")
         
         def monitor_task():
-            from real_api_scraper import RealAPIScraper
-            if not self.real_scraper:
-                self.real_scraper = RealAPIScraper(self.api_client)
-            
-            check_interval = 30  # 每30秒检查一次
+            # 当天订单的本地副本（与其他功能共用），每次检查只增量拉取有变化的订单
+            ride_sync = self._shared_ride_sync()
             countdown_orders = {}  # 存储需要倒计时的订单 {ride_id: {'withdraw_time': datetime, 'info': {}}}
+            # 监控线程和调度线程都会读写 countdown_orders
+            countdown_lock = threading.Lock()
+            
+            def retry_withdraw(ride_id, info, reason):
+                """本次无法退工时稍后重试，超过重试次数后放弃"""
+                with countdown_lock:
+                    record = countdown_orders.setdefault(ride_id, dict(info))
+                    attempts = record.get('attempts', 0) + 1
+                    if attempts > retry_limit:
+                        record.update(processed=True, in_flight=False)
+                    else:
+                        retry_at = time.time() + retry_delay
+                        record.update(in_flight=False, attempts=attempts, retry_at=retry_at)
+                
+                if attempts > retry_limit:
+                    log_to_monitor(f"   ✗ 订单 {ride_id} 已重试 {retry_limit} 次仍未退工，放弃: {reason}", "error")
+                    self.log(f"✗ 自动退工放弃: 订单 {ride_id} - {reason}", "error")
+                    return
+                
+                scheduler.schedule(ride_id, retry_at, info)
+                log_to_monitor(f"   ⏳ 订单 {ride_id} {retry_delay}秒后重试 ({attempts}/{retry_limit}): {reason}", "warning")
+            
+            def execute_withdraw(ride_id, info):
+                """到达退工时间，由调度线程调用"""
+                if not self.auto_withdraw_running:
+                    return
+                
+                # 先标记为处理中，确认和退工请求期间的检查不会再次登记该订单
+                with countdown_lock:
+                    record = countdown_orders.setdefault(ride_id, dict(info, processed=False))
+                    record['in_flight'] = True
+                
+                driver_id = info['driver_id']
+                passenger = info['passenger']
+                pickup_time_str = info['pickup_time_str']
+                
+                # 退工前确认订单仍分配给该司机（增量同步，只传输有变化的订单），无法确认时不退工
+                try:
+                    ride_sync.rides(max_age=2)
+                    current = ride_sync.get(ride_id)
+                except Exception as e:
+                    log_to_monitor(f"✗ 确认订单 {ride_id} 状态失败: {e}", "warning")
+                    retry_withdraw(ride_id, info, f"无法确认订单状态: {e}")
+                    return
+                
+                if current is None:
+                    log_to_monitor(f"订单 {ride_id} 不在当天订单中，暂不退工", "warning")
+                    retry_withdraw(ride_id, info, "无法确认订单状态")
+                    return
+                
+                if (current.get('status') not in ('assigned', 'accepted')
+                        or str(current.get('driver_id')) != str(driver_id)):
+                    log_to_monitor(f"订单 {ride_id} 已不属于司机 {driver_id}，跳过退工", "info")
+                    # 之后若重新分配给该司机，按新的分配重新登记
+                    with countdown_lock:
+                        countdown_orders.pop(ride_id, None)
+                    return
+                
+                log_to_monitor(f"", "info")
+                log_to_monitor(f"⚡ 执行自动退工 (已到退工时间)", "warning")
+                log_to_monitor(f"   订单ID: {ride_id}", "info")
+                log_to_monitor(f"   乘客: {passenger}", "info")
+                log_to_monitor(f"   司机ID: {driver_id}", "info")
+                log_to_monitor(f"   Pick Up: {pickup_time_str}", "info")
+                
+                # 执行退工
+                try:
+                    self.dispatcher.cancel_ride(ride_id, reason="Driver Cancel")
+                    log_to_monitor(f"   ✓ 退工成功", "success")
+                    
+                    # 同时输出到主窗口
+                    self.log(f"✓ 自动退工成功: 订单 {ride_id} - {passenger} (司机 {driver_id})", "success")
+                    
+                    # 标记为已处理
+                    with countdown_lock:
+                        record.update(processed=True, in_flight=False)
+                    
+                except Exception as e:
+                    error_msg = str(e)
+                    if "404" in error_msg:
+                        log_to_monitor(f"   ✗ 退工失败: 订单不允许退工 (404)", "error")
+                    elif "403" in error_msg:
+                        log_to_monitor(f"   ✗ 退工失败: 无权限 (403)", "error")
+                    else:
+                        log_to_monitor(f"   ✗ 退工失败: {e}", "error")
+                    
+                    self.log(f"✗ 自动退工失败: 订单 {ride_id} - {e}", "error")
+                    
+                    if "404" in error_msg or "403" in error_msg:
+                        # 服务器拒绝退工，重试也不会成功
+                        with countdown_lock:
+                            record.update(processed=True, in_flight=False)
+                    else:
+                        retry_withdraw(ride_id, info, error_msg)
+                
+                log_to_monitor(f"", "info")
+            
+            # 每个订单按退工时间登记一个条目，到点立即执行，轮询只负责同步分配变化
+            scheduler = WithdrawScheduler(execute_withdraw)
+            retry_delay = getattr(config, 'AUTO_WITHDRAW_RETRY_DELAY', 30)
+            retry_limit = getattr(config, 'AUTO_WITHDRAW_MAX_RETRIES', 3)
+            scheduler.start()
             
             while self.auto_withdraw_running:
                 try:
                     current_time = datetime.now()
-                    status_label.config(text=f"监控运行中... (每{check_interval}秒检查) - {current_time.strftime('%H:%M:%S')}")
-                    
-                    # 获取今天的订单
-                    today = current_time.strftime('%Y-%m-%d')
+                    monitor_sink.post(monitor_status.set, f"监控运行中... (每{check_interval}秒检查) - {current_time.strftime('%H:%M:%S')}")
                     
                     # 用于统计的字典
                     within_2h_orders = {}  # {driver_id: [(ride_id, pickup_time, withdraw_time_diff)]}
                     
+                    # 本次检查仍需定时退工的订单
+                    scheduled_ids = set()
+                    
+                    directory = get_driver_directory(self.real_scraper)
+                    
+                    # 每次检查只同步一次订单，副本有变化时才重建索引
+                    index = ride_sync.index()
+                    
                     for driver_id in driver_ids:
                         try:
-                            # 获取assigned/accepted订单
-                            log_to_monitor(f"🔍 检查司机 {driver_id}", "info")
-                            rides = self.real_scraper.get_all_rides(
-                                date=today, 
-                                per_page=500,
-                                statuses='assigned,accepted'
-                            )
-                            
-                            # 筛选该司机的订单
-                            driver_rides = [r for r in rides if str(r.get('driver_id')) == str(driver_id)]
+                            # 该司机的assigned/accepted订单
+                            log_to_monitor(f"🔍 检查司机 {driver_id} ({directory.name(driver_id)})", "info")
+                            driver_rides = index.for_driver(driver_id, statuses=('assigned', 'accepted'))
                             
                             log_to_monitor(f"   共 {len(driver_rides)} 个订单", "info")
                             
@@ -1214,15 +1464,10 @@ RPA调度管理工具 v1.0
                                     if not pickup_at_str:
                                         continue
                                     
-                                    # 解析pick up时间
-                                    if 'T' in pickup_at_str:
-                                        pickup_time = datetime.fromisoformat(pickup_at_str.replace('Z', '+00:00'))
-                                        # 转换为本地时间
-                                        ny_tz = pytz.timezone('America/New_York')
-                                        pickup_time = pickup_time.astimezone(ny_tz)
-                                        pickup_time = pickup_time.replace(tzinfo=None)  # 移除时区信息便于比较
-                                    else:
-                                        pickup_time = datetime.strptime(pickup_at_str, '%Y-%m-%d %H:%M:%S')
+                                    # 解析pick up时间（本地时间，不带时区便于比较）
+                                    pickup_time = parse_local(pickup_at_str)
+                                    if pickup_time is None:
+                                        raise ValueError(f"无法解析时间: {pickup_at_str}")
                                     
                                     # 计算时间差（分钟）
                                     time_diff_minutes = (pickup_time - current_time).total_seconds() / 60
@@ -1231,6 +1476,22 @@ RPA调度管理工具 v1.0
                                     withdraw_time = pickup_time - timedelta(minutes=minutes_before)
                                     withdraw_time_diff = (withdraw_time - current_time).total_seconds() / 60
                                     
+                                    # 登记到调度器（已处理过的订单不再重复退工，正在退工的订单不重复登记，
+                                    # 等待重试的订单不早于重试时间）
+                                    with countdown_lock:
+                                        record = dict(countdown_orders.get(ride_id, {}))
+                                    if not record.get('processed'):
+                                        scheduled_ids.add(ride_id)
+                                    if not record.get('processed') and not record.get('in_flight'):
+                                        deadline = max(withdraw_time.timestamp(), record.get('retry_at', 0))
+                                        scheduler.schedule(ride_id, deadline, {
+                                            'withdraw_time': withdraw_time,
+                                            'pickup_time': pickup_time,
+                                            'passenger': passenger,
+                                            'driver_id': driver_id,
+                                            'pickup_time_str': pickup_time.strftime('%H:%M')
+                                        })
+                                    
                                     # 如果订单太远未来（超出监控范围）
                                     if time_diff_minutes > minutes_before:
                                         # 超出监控范围，跳过
@@ -1246,76 +1507,33 @@ RPA调度管理工具 v1.0
                                             'time_to_withdraw': int(withdraw_time_diff)
                                         })
                                     
-                                    # 如果已经过了退工时间或pickup时间（需要立即退工）
+                                    # 已到退工时间的订单由调度器立即退工
                                     if withdraw_time_diff <= 0:
-                                        # 检查是否已经处理过（避免重复退工）
-                                        if ride_id not in countdown_orders or not countdown_orders[ride_id].get('processed'):
-                                            passenger = ride.get('passenger_name', '未知')
-                                            pickup_time_str = pickup_time.strftime('%H:%M')
-                                            
-                                            log_to_monitor(f"", "info")
-                                            log_to_monitor(f"⚡ 执行自动退工 (已到退工时间)", "warning")
-                                            log_to_monitor(f"   订单ID: {ride_id}", "info")
-                                            log_to_monitor(f"   乘客: {passenger}", "info")
-                                            log_to_monitor(f"   司机ID: {driver_id}", "info")
-                                            log_to_monitor(f"   Pick Up: {pickup_time_str}", "info")
-                                            
-                                            # 执行退工
-                                            try:
-                                                self.dispatcher.cancel_ride(ride_id, reason="Driver Cancel")
-                                                log_to_monitor(f"   ✓ 退工成功", "success")
-                                                
-                                                # 同时输出到主窗口
-                                                self.log(f"✓ 自动退工成功: 订单 {ride_id} - {passenger} (司机 {driver_id})", "success")
-                                                
-                                            except Exception as e:
-                                                error_msg = str(e)
-                                                if "404" in error_msg:
-                                                    log_to_monitor(f"   ✗ 退工失败: 订单不允许退工 (404)", "error")
-                                                elif "403" in error_msg:
-                                                    log_to_monitor(f"   ✗ 退工失败: 无权限 (403)", "error")
-                                                else:
-                                                    log_to_monitor(f"   ✗ 退工失败: {e}", "error")
-                                                
-                                                self.log(f"✗ 自动退工失败: 订单 {ride_id} - {e}", "error")
-                                            
-                                            log_to_monitor(f"", "info")
-                                            
-                                            # 标记为已处理
-                                            countdown_orders[ride_id] = {
-                                                'processed': True,
-                                                'withdraw_time': withdraw_time,
-                                                'pickup_time': pickup_time,
-                                                'passenger': passenger,
-                                                'driver_id': driver_id,
-                                                'pickup_time_str': pickup_time_str
-                                            }
                                         continue
                                     
                                     # 如果在倒计时范围内（退工前10分钟以内）
                                     if 0 < withdraw_time_diff <= 10:
-                                        if ride_id not in countdown_orders:
-                                            # 第一次进入倒计时
-                                            pickup_time_str = pickup_time.strftime('%H:%M')
-                                            
-                                            countdown_orders[ride_id] = {
-                                                'withdraw_time': withdraw_time,
-                                                'pickup_time': pickup_time,
-                                                'passenger': passenger,
-                                                'driver_id': driver_id,
-                                                'pickup_time_str': pickup_time_str,
-                                                'processed': False
-                                            }
-                                            
+                                        with countdown_lock:
+                                            entered = ride_id not in countdown_orders
+                                            if entered:
+                                                # 第一次进入倒计时
+                                                countdown_orders[ride_id] = {
+                                                    'withdraw_time': withdraw_time,
+                                                    'pickup_time': pickup_time,
+                                                    'passenger': passenger,
+                                                    'driver_id': driver_id,
+                                                    'pickup_time_str': pickup_time.strftime('%H:%M'),
+                                                    'processed': False
+                                                }
+                                            elif not countdown_orders[ride_id].get('processed'):
+                                                # 更新倒计时（每次检查都更新）
+                                                countdown_orders[ride_id]['withdraw_time'] = withdraw_time
+                                                countdown_orders[ride_id]['pickup_time'] = pickup_time
+                                        
+                                        if entered:
                                             log_to_monitor(f"", "info")
                                             log_to_monitor(f"🔔 订单 {ride_id} 进入倒计时: {int(withdraw_time_diff)}分{int((withdraw_time_diff % 1) * 60)}秒", "error")
                                             log_to_monitor(f"", "info")
-                                        else:
-                                            # 更新倒计时（使用红色显示）
-                                            if not countdown_orders[ride_id].get('processed'):
-                                                # 每次检查都更新
-                                                countdown_orders[ride_id]['withdraw_time'] = withdraw_time
-                                                countdown_orders[ride_id]['pickup_time'] = pickup_time
                                 
                                 except Exception as e:
                                     log_to_monitor(f"   ✗ 处理订单 {ride.get('id', '未知')} 出错: {e}", "error")
@@ -1329,6 +1547,9 @@ RPA调度管理工具 v1.0
                             log_to_monitor(f"   {traceback.format_exc()}", "error")
                             continue
                     
+                    # 取消已改派或已取消的订单
+                    scheduler.reconcile(scheduled_ids)
+                    
                     # 显示2小时内的订单汇总
                     total_2h_orders = sum(len(orders) for orders in within_2h_orders.values())
                     if total_2h_orders > 0:
@@ -1357,7 +1578,8 @@ RPA调度管理工具 v1.0
                         log_to_monitor(f"="*60, "info")
                     
                     # 检查完所有司机后，显示当前倒计时的订单
-                    active_countdowns = {k: v for k, v in countdown_orders.items() if not v.get('processed')}
+                    with countdown_lock:
+                        active_countdowns = {k: dict(v) for k, v in countdown_orders.items() if not v.get('processed')}
                     if active_countdowns:
                         log_to_monitor(f"", "info")
                         log_to_monitor(f"="*60, "info")
@@ -1370,7 +1592,6 @@ RPA调度管理工具 v1.0
                         log_to_monitor(f"", "info")
                     
                     # 等待下一次检查
-                    import time
                     for _ in range(check_interval):
                         if not self.auto_withdraw_running:
                             break
@@ -1378,15 +1599,16 @@ RPA调度管理工具 v1.0
                 
                 except Exception as e:
                     log_to_monitor(f"✗ 监控出错: {e}", "error")
-                    import time
                     time.sleep(check_interval)
             
+            scheduler.stop()
+            
             log_to_monitor("", "info")
             log_to_monitor("="*60, "info")
             log_to_monitor("⏰ 实时退工监控已停止", "warning")
             log_to_monitor("="*60, "info")
-            status_label.config(text="监控已停止")
-            close_btn.config(text="关闭", command=monitor_window.destroy)
+            monitor_sink.post(monitor_status.set, "监控已停止")
+            monitor_sink.post(close_btn.config, {"text": "关闭", "command": close_window})
             
             self.log(f"\n⏰ 实时退工监控已停止", "warning")
             self.set_status("就绪")
@@ -6,13 +6,17 @@ RPA调度系统 - 数据爬取工具
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog, scrolledtext
 import threading
-from concurrent.futures import ThreadPoolExecutor, as_completed
 import json
 import os
-import re
 from datetime import datetime, timedelta
 from api_client import APIClient
 from scraper import DataScraper
+from driver_directory import get_driver_directory
+from billing_excel import export_billing_excel
+from billing_engine import build_driver_billing
+from price_extractor import extract_prices, find_co_pay_text, RULES_RANGE
+from log_sink import TextLogSink
+from log_files import log_file_handler
 import config
 import logging
 
@@ -21,7 +25,7 @@ logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(levelname)s - %(message)s',
     handlers=[
-        logging.FileHandler(config.LOG_FILE, encoding='utf-8'),
+        log_file_handler(),  # 按大小轮转并压缩旧日志
     ]
 )
 logger = logging.getLogger(__name__)
@@ -145,6 +149,9 @@ class DataScraperGUI:
         self.output_text.tag_config("info", foreground="blue")
         self.output_text.tag_config("warning", foreground="orange")
         
+        # 日志先放入队列，由主线程批量写入（后台线程调用log不会阻塞在界面刷新上）
+        self.log_sink = TextLogSink(self.root, self.output_text)
+        
         self.log("=" * 60)
         self.log("欢迎使用 RPA数据爬取工具", "info")
         self.log("=" * 60)
@@ -169,15 +176,12 @@ class DataScraperGUI:
         self.root.after(1000, self.update_time)
     
     def log(self, message, tag=""):
-        """输出日志"""
-        self.output_text.insert(tk.END, f"{message}\n", tag)
-        self.output_text.see(tk.END)
-        self.root.update_idletasks()
+        """输出日志（任意线程可调用）"""
+        self.log_sink.write(message, tag)
     
     def set_status(self, status):
-        """设置状态"""
-        self.status_var.set(status)
-        self.root.update_idletasks()
+        """设置状态（任意线程可调用）"""
+        self.log_sink.post(self.status_var.set, status)
     
     def initialize_client(self):
         """初始化API客户端"""
@@ -352,7 +356,7 @@ class DataScraperGUI:
                 self.log("开始爬取订单数据...", "info")
                 
                 date = datetime.now().strftime('%Y-%m-%d')
-                rides = self.real_scraper.get_all_rides(date=date, per_page=500)
+                rides = self.real_scraper.get_all_rides(date=date, per_page=500, snapshot=True)
                 
                 self.log(f"✓ 成功获取 {len(rides)} 条订单数据", "success")
                 
@@ -360,25 +364,19 @@ class DataScraperGUI:
                 self.log("\n获取订单详细信息（价格、Co Pay、TOLL等）- 并发处理中...", "info")
                 detailed_rides = []
                 
-                def fetch_ride_detail(ride):
-                    """获取单个订单详情"""
+                def merge_ride_detail(ride, ride_detail):
+                    """将单个订单的详情合并到订单"""
                     try:
-                        ride_id = ride.get('id')
-                        ride_detail = self.api_client.get(f'/fleet/rides/{ride_id}')
+                        if isinstance(ride_detail, Exception):
+                            raise ride_detail
+                        ride_detail = ride_detail or {}
                         
                         # 提取价格信息
                         vendor_amount = float(ride_detail.get('vendor_amount', 0) or 0)
                         original_price = vendor_amount
                         
                         # 从notes中提取co_pay
-                        notes = ride_detail.get('notes', [])
-                        co_pay = 0
-                        for note in notes:
-                            note_text = note.get('note', '')
-                            match = re.search(r'Co[- ]?Pay[:\s]*\$?([\d.]+)', note_text, re.IGNORECASE)
-                            if match:
-                                co_pay = float(match.group(1))
-                                break
+                        co_pay = find_co_pay_text(ride_detail.get('notes', []))
                         
                         # 计算订单价格和toll
                         order_status = ride_detail.get('status', '')
@@ -417,16 +415,10 @@ class DataScraperGUI:
                         ride['toll_fee'] = 0
                         return ride
                 
-                # 使用线程池并发处理（10个线程同时处理，速度提升10倍）
-                with ThreadPoolExecutor(max_workers=10) as executor:
-                    futures = {executor.submit(fetch_ride_detail, ride): ride for ride in rides}
-                    completed = 0
-                    for future in as_completed(futures):
-                        detailed_ride = future.result()
-                        detailed_rides.append(detailed_ride)
-                        completed += 1
-                        if completed % 20 == 0 or completed == len(rides):
-                            self.log(f"  进度: {completed}/{len(rides)} 条订单", "info")
+                # 缓存未命中的订单详情在一个事件循环中并发获取
+                details = self.real_scraper.get_ride_details(rides)
+                for ride in rides:
+                    detailed_rides.append(merge_ride_detail(ride, details.get(ride.get('id'))))
                 
                 self.log(f"✓ 已获取 {len(detailed_rides)} 条订单详细信息", "success")
                 
@@ -532,7 +524,6 @@ class DataScraperGUI:
                 self.log("=" * 60)
                 
                 # 解析日期
-                from datetime import datetime, timedelta
                 start = datetime.strptime(start_date, '%Y-%m-%d')
                 end = datetime.strptime(end_date, '%Y-%m-%d')
                 
@@ -544,181 +535,93 @@ class DataScraperGUI:
                     self.set_status("就绪")
                     return
                 
-                # 收集所有日期的订单
-                all_rides = []
-                current = start
-                
                 self.log(f"\n📅 需要处理 {delta.days + 1} 天的数据", "info")
                 
-                while current <= end:
-                    date_str = current.strftime('%Y-%m-%d')
-                    self.log(f"\n获取 {date_str} 的订单...", "info")
-                    
-                    try:
-                        rides = self.real_scraper.get_all_rides(
-                            date=date_str,
-                            per_page=500,
-                            statuses='finished,no_show,driver_canceled'
-                        )
-                        self.log(f"  ✓ {date_str}: {len(rides)} 条订单", "success")
-                        all_rides.extend(rides)
-                    except Exception as e:
-                        self.log(f"  ✗ {date_str}: 获取失败 - {e}", "error")
-                    
-                    current += timedelta(days=1)
-                
-                self.log(f"\n✓ 总共获取 {len(all_rides)} 条订单", "success")
-                
-                if len(all_rides) == 0:
-                    self.log(f"\n⚠️ 未找到符合条件的订单", "warning")
-                    messagebox.showwarning("提示", "未找到符合条件的订单")
-                    self.set_status("就绪")
-                    return
-                
                 # 获取订单详细信息（并发处理，大幅提速）
-                self.log("\n2️⃣ 获取订单详细信息（价格、Co Pay、TOLL）- 并发处理中...", "info")
+                self.log("\n获取订单并同步获取详细信息（价格、Co Pay、TOLL）- 并发处理中...", "info")
                 detailed_rides = []
                 
-                def fetch_billing_ride_detail(ride):
-                    """获取单个账单订单详情"""
-                    try:
-                        ride_id = ride.get('id')
-                        detail = self.api_client.get(f'/fleet/rides/{ride_id}')
-                        ride_detail = detail.get('ride', {})
-                        
-                        # 提取价格信息
-                        vendor_amount = float(ride_detail.get('vendor_amount', 0) or 0)
-                        
-                        # 从events中提取notes里的价格（"reserved the ride for $XX.XX"）
-                        events = ride_detail.get('events', [])
-                        notes_price = 0
-                        for event in events:
-                            body = event.get('body', '')
-                            match = re.search(r'reserved.*for\s+\$([0-9]+\.?[0-9]*)', body, re.IGNORECASE)
-                            if match:
-                                notes_price = float(match.group(1))
-                                break
-                        
-                        # 从notes中提取Co Pay（必须label中含$符号）
-                        # 优先检查icon='private'的notes，其次检查description中含'collect'或'cash'的notes
-                        notes = ride_detail.get('notes', [])
-                        co_pay = 0
-                        for note in notes:
-                            label = note.get('label', '')
-                            description = note.get('description', '').lower()
-                            icon = note.get('icon', '')
-                            
-                            # 先在label中查找$符号和金额
-                            match = re.search(r'\$([0-9]+\.?[0-9]*)', label)
-                            if match:
-                                # 如果找到了$金额，再检查条件
-                                if icon == 'private' or 'collect' in description or 'cash' in description:
-                                    co_pay = float(match.group(1))
-                                    break
-                        
-                        # 检查订单状态
-                        order_status = ride_detail.get('status', '')
-                        
-                        # no_show和driver_canceled订单特殊处理
-                        if order_status in ['no_show', 'driver_canceled']:
-                            order_price = 0
-                            toll_fee = 0
-                            original_price = 0
-                            co_pay = 0
+                def merge_billing_details(rides, details):
+                    """将一批账单订单的详情合并到订单（价格批量提取）"""
+                    fetched = []  # [(订单, 订单详情)]
+                    for ride in rides:
+                        detail = details.get(ride.get('id'))
+                        if isinstance(detail, dict):
+                            fetched.append((ride, detail.get('ride', {})))
                         else:
-                            # 如果notes里有价格，订单价格 = notes价格 - co_pay
-                            if notes_price > 0:
-                                order_price = round(notes_price - co_pay, 2)
-                                toll_fee = round(vendor_amount - notes_price + co_pay, 2)
-                                original_price = notes_price
-                            else:
-                                # 如果notes里没有价格，订单价格 = vendor_amount
-                                order_price = vendor_amount
-                                toll_fee = 0
-                                original_price = vendor_amount
-                        
+                            # 失败时只保留基本信息
+                            ride['vendor_amount'] = 0
+                            ride['co_pay'] = 0
+                            ride['order_price'] = 0
+                            ride['toll_fee'] = 0
+                    
+                    # 从events中提取预订价格（"reserved the ride for $XX.XX"），从notes中提取Co Pay
+                    # no_show和driver_canceled订单金额为0（$5在汇总时另计）
+                    prices = extract_prices([ride_detail for _, ride_detail in fetched], RULES_RANGE)
+                    for (ride, ride_detail), price in zip(fetched, prices):
                         # 合并所有信息到ride
-                        ride['vendor_amount'] = vendor_amount
-                        ride['original_price'] = original_price
-                        ride['co_pay'] = co_pay
-                        ride['order_price'] = order_price
-                        ride['toll_fee'] = toll_fee
-                        ride['has_notes_price'] = notes_price > 0  # 标记是否有events价格
+                        ride['vendor_amount'] = price.vendor_amount
+                        ride['original_price'] = price.original_price
+                        ride['co_pay'] = price.co_pay
+                        ride['order_price'] = price.order_price
+                        ride['toll_fee'] = price.toll_fee
+                        ride['has_notes_price'] = price.has_notes_price  # 标记是否有events价格
                         ride['distance'] = ride_detail.get('distance', 0)
                         ride['pickup_at'] = ride_detail.get('pickup_at', ride.get('schedule_time', ''))
                         ride['start_address'] = ride_detail.get('start_address', ride.get('pickup_address', ''))
                         ride['destination_address'] = ride_detail.get('destination_address', ride.get('dropoff_address', ''))
                         ride['first_name'] = ride_detail.get('first_name', '')
                         ride['last_name'] = ride_detail.get('last_name', '')
-                        
-                        return ride
-                    except Exception as e:
-                        # 失败时返回基本信息
-                        ride['vendor_amount'] = 0
-                        ride['co_pay'] = 0
-                        ride['order_price'] = 0
-                        ride['toll_fee'] = 0
-                        return ride
+                    return rides
+                
+                # 多天订单并发获取，每天的数据到达后立即获取该天的详情（缓存未命中的在一个事件循环中并发请求），
+                # 其余日期在后台继续下载
+                all_rides = []
+                self.real_scraper.ride_cache.reset_stats()
+                for date_str, rides, error in self.real_scraper.iter_rides_for_range(
+                    start_date, end_date,
+                    per_page=500,
+                    statuses='finished,no_show,driver_canceled',
+                    use_snapshots=True  # 已结束且有快照的日期直接读取本地数据
+                ):
+                    if error is not None:
+                        self.log(f"  ✗ {date_str}: 获取失败 - {error}", "error")
+                        continue
+                    self.log(f"  ✓ {date_str}: {len(rides)} 条订单", "success")
+                    all_rides.extend(rides)
+                    
+                    details = self.real_scraper.get_ride_details(rides)
+                    detailed_rides.extend(merge_billing_details(rides, details))
+                    self.log(f"  进度: {len(detailed_rides)} 条订单详情", "info")
                 
-                # 使用线程池并发处理（15个线程同时处理，速度提升15倍）
-                with ThreadPoolExecutor(max_workers=15) as executor:
-                    futures = {executor.submit(fetch_billing_ride_detail, ride): ride for ride in all_rides}
-                    completed = 0
-                    for future in as_completed(futures):
-                        detailed_ride = future.result()
-                        detailed_rides.append(detailed_ride)
-                        completed += 1
-                        if completed % 30 == 0 or completed == len(all_rides):
-                            self.log(f"  进度: {completed}/{len(all_rides)} 条订单", "info")
+                self.log(f"\n✓ 总共获取 {len(all_rides)} 条订单", "success")
+                
+                if len(all_rides) == 0:
+                    self.log(f"\n⚠️ 未找到符合条件的订单", "warning")
+                    messagebox.showwarning("提示", "未找到符合条件的订单")
+                    self.set_status("就绪")
+                    return
                 
                 self.log(f"✓ 已获取 {len(detailed_rides)} 条订单详情", "success")
+                self.log(f"  详情缓存: {self.real_scraper.ride_cache.summary()}", "info")
                 
                 # 按司机分组统计
                 self.log("\n💰 开始生成账单统计...", "info")
-                driver_billing = {}
-                
-                for ride in detailed_rides:
-                    driver_id = ride.get('driver_id')
-                    if not driver_id:
-                        continue
-                    
-                    status = ride.get('status', '')
-                    
-                    if driver_id not in driver_billing:
-                        driver_billing[driver_id] = {
-                            'driver_id': driver_id,
-                            'driver_name': f"{ride.get('driver_first_name', '')} {ride.get('driver_last_name', '')}".strip(),
-                            'finished_count': 0,  # 只统计finished状态的订单
-                            'no_show': 0,
-                            'driver_canceled': 0,
-                            'total_amount': 0,
-                            'rides': []
-                        }
-                    
-                    # 只有finished状态才计入完成订单数
-                    if status == 'finished':
-                        driver_billing[driver_id]['finished_count'] += 1
-                    elif status == 'no_show':
-                        driver_billing[driver_id]['no_show'] += 1
-                    elif status == 'driver_canceled':
-                        driver_billing[driver_id]['driver_canceled'] += 1
-                    
-                    # 简化版价格计算
-                    if status in ['no_show', 'driver_canceled']:
-                        amount = 5.0
-                    else:
-                        amount = float(ride.get('vendor_amount', 0) or 0)
-                    
-                    driver_billing[driver_id]['total_amount'] += amount
-                    driver_billing[driver_id]['rides'].append(ride)
+                directory = get_driver_directory(self.real_scraper)
+                driver_billing = build_driver_billing(
+                    detailed_rides,
+                    name_for=lambda driver_id, ride: (
+                        f"{ride.get('driver_first_name', '')} {ride.get('driver_last_name', '')}".strip()
+                        or directory.name(driver_id))
+                )
                 
                 # 输出账单摘要
                 self.log("\n" + "=" * 60)
                 self.log("📊 账单摘要", "info")
                 self.log("=" * 60)
                 
-                for driver_id, billing in driver_billing.items():
-                    self.log(f"\n司机: {billing['driver_name']} (ID: {driver_id})")
+                for billing in driver_billing:
+                    self.log(f"\n司机: {billing['driver_name']} (ID: {billing['driver_id']})")
                     self.log(f"  完成订单: {billing['finished_count']} 条")
                     self.log(f"  No Show: {billing['no_show']} 条 | Driver Canceled: {billing['driver_canceled']} 条", "warning")
                     self.log(f"  总金额: ${billing['total_amount']:.2f}", "success")
@@ -727,7 +630,7 @@ class DataScraperGUI:
                 self.last_data = {
                     'start_date': start_date,
                     'end_date': end_date,
-                    'billing': list(driver_billing.values()),
+                    'billing': driver_billing,
                     'all_rides': all_rides
                 }
                 
@@ -744,155 +647,8 @@ class DataScraperGUI:
                 excel_file = os.path.join(config.DATA_DIR, f"账单_{start_date}_至_{end_date}_{timestamp}.xlsx")
                 
                 try:
-                    # 使用export_excel的逻辑直接导出
-                    import pandas as pd
-                    from openpyxl.styles import Font, PatternFill, numbers
-                    
-                    billing_data = list(driver_billing.values())
-                    
-                    # 准备导出数据（按司机分组，每个司机包含详细订单+汇总行）
-                    export_rows = []
-                    summary_row_indices = []  # 记录汇总行的索引
-                    no_notes_price_indices = []  # 记录没有events价格的订单行索引
-                    
-                    for billing in billing_data:
-                        driver_name = billing.get('driver_name', '')
-                        rides = billing.get('rides', [])
-                        
-                        # 添加该司机的所有订单
-                        for ride in rides:
-                            status = ride.get('status', '')
-                            co_pay = float(ride.get('co_pay', 0) or 0)
-                            order_price = float(ride.get('order_price', 0) or 0)
-                            toll_fee = float(ride.get('toll_fee', 0) or 0)
-                            has_notes_price = ride.get('has_notes_price', True)
-                            
-                            # 如果没有events价格，记录行索引
-                            if not has_notes_price:
-                                no_notes_price_indices.append(len(export_rows))
-                            
-                            # 计算NO SHOW金额
-                            no_show = 5.0 if status in ['no_show', 'driver_canceled'] else 0.0
-                            
-                            export_rows.append({
-                                '司机姓名': driver_name,
-                                '订单数': None,
-                                '总收入': None,
-                                '订单ID': ride.get('id', ''),
-                                '接客时间': ride.get('pickup_at', ride.get('schedule_time', '')),
-                                '接客地点': ride.get('start_address', ride.get('pickup_address', '')),
-                                '送达地点': ride.get('destination_address', ride.get('dropoff_address', '')),
-                                '乘客姓名': f"{ride.get('first_name', '')} {ride.get('last_name', '')}".strip() or ride.get('customer_name', ''),
-                                '订单价格': order_price,
-                                'NO SHOW': no_show,
-                                'Co Pay': co_pay,
-                                'TOLL': toll_fee,
-                                '状态': status
-                            })
-                        
-                        # 添加该司机的汇总行
-                        finished_count = billing.get('finished_count', 0)
-                        summary_row_indices.append(len(export_rows))
-                        export_rows.append({
-                            '司机姓名': driver_name,
-                            '订单数': finished_count,
-                            '总收入': None,
-                            '订单ID': '',
-                            '接客时间': '',
-                            '接客地点': '',
-                            '送达地点': '',
-                            '乘客姓名': '',
-                            '订单价格': None,
-                            'NO SHOW': None,
-                            'Co Pay': None,
-                            'TOLL': None,
-                            '状态': ''
-                        })
-                    
-                    # 添加底部总计行
-                    total_finished_count = sum(billing.get('finished_count', 0) for billing in billing_data)
-                    total_row_index = len(export_rows)
-                    export_rows.append({
-                        '司机姓名': '总计',
-                        '订单数': total_finished_count,
-                        '总收入': None,
-                        '订单ID': '',
-                        '接客时间': '',
-                        '接客地点': '',
-                        '送达地点': '',
-                        '乘客姓名': '',
-                        '订单价格': None,
-                        'NO SHOW': None,
-                        'Co Pay': None,
-                        'TOLL': None,
-                        '状态': ''
-                    })
-                    
-                    # 创建DataFrame并导出
-                    df = pd.DataFrame(export_rows)
-                    
-                    with pd.ExcelWriter(excel_file, engine='openpyxl') as writer:
-                        df.to_excel(writer, sheet_name='账单详情', index=False)
-                        workbook = writer.book
-                        worksheet = writer.sheets['账单详情']
-                        
-                        # 填充公式和样式
-                        for idx, row_idx in enumerate(summary_row_indices):
-                            excel_row = row_idx + 2
-                            start_row = 2 if idx == 0 else summary_row_indices[idx-1] + 3
-                            
-                            worksheet.cell(row=excel_row, column=9, value=f'=SUM(I{start_row}:I{excel_row-1})')
-                            worksheet.cell(row=excel_row, column=10, value=f'=SUM(J{start_row}:J{excel_row-1})')
-                            worksheet.cell(row=excel_row, column=11, value=f'=SUM(K{start_row}:K{excel_row-1})')
-                            worksheet.cell(row=excel_row, column=12, value=f'=SUM(L{start_row}:L{excel_row-1})')
-                            worksheet.cell(row=excel_row, column=3, value=f'=I{excel_row}+J{excel_row}+K{excel_row}+L{excel_row}')
-                        
-                        last_row = total_row_index + 2
-                        summary_rows_excel = [str(idx + 2) for idx in summary_row_indices]
-                        worksheet.cell(row=last_row, column=9, value=f'={"+".join([f"I{row}" for row in summary_rows_excel])}')
-                        worksheet.cell(row=last_row, column=10, value=f'={"+".join([f"J{row}" for row in summary_rows_excel])}')
-                        worksheet.cell(row=last_row, column=11, value=f'={"+".join([f"K{row}" for row in summary_rows_excel])}')
-                        green_fill = PatternFill(start_color='90EE90', end_color='90EE90', fill_type='solid')  # 浅绿色
-                        yellow_fill = PatternFill(start_color='FFFF00', end_color='FFFF00', fill_type='solid')  # 黄色
-                        orange_fill = PatternFill(start_color='FFA500', end_color='FFA500', fill_type='solid')  # 橙色
-                        bold_font = Font(bold=True)
-                        
-                        # 标记没有events价格的订单行（绿色填充）
-                        for row_idx in no_notes_price_indices:
-                            for col in range(1, 14):
-                                cell = worksheet.cell(row=row_idx + 2, column=col)
-                                cell.fill = green_fill
-                        
-                        # 标记汇总行（黄色填充）
-                        for row_idx in summary_row_indices:
-                            for col in range(1, 14):
-                                cell = worksheet.cell(row=row_idx + 2, column=col)
-                                cell.fill = yellow_fill
-                                cell.font = bold_font
-                        
-                        # 标记总计行（橙色填充）
-                        for row_idx in summary_row_indices:
-                            for col in range(1, 14):
-                                cell = worksheet.cell(row=row_idx + 2, column=col)
-                                cell.fill = yellow_fill
-                                cell.font = bold_font
-                        
-                        for col in range(1, 14):
-                            cell = worksheet.cell(row=last_row, column=col)
-                            cell.fill = orange_fill
-                            cell.font = bold_font
-                        
-                        # 货币格式
-                        for row in range(2, last_row + 1):
-                            for col in [3, 9, 10, 11, 12]:
-                                worksheet.cell(row=row, column=col).number_format = '$#,##0.00'
-                        
-                        # 列宽
-                        worksheet.column_dimensions['A'].width = 20
-                        worksheet.column_dimensions['C'].width = 15
-                        worksheet.column_dimensions['E'].width = 20
-                        worksheet.column_dimensions['F'].width = 40
-                        worksheet.column_dimensions['G'].width = 40
+                    # 流式写入，样式和公式在写入时一次完成
+                    export_billing_excel(excel_file, driver_billing)
                     
                     self.log(f"✓ Excel已导出: {excel_file}", "success")
                     self.set_status("就绪")
@@ -1012,13 +768,11 @@ class DataScraperGUI:
             messagebox.showwarning("警告", "请先生成账单后再导出")
             return
         
-        # 检查pandas和openpyxl是否已安装
-        try:
-            import pandas as pd
-            from openpyxl.styles import Font, PatternFill, numbers
-        except ImportError as e:
-            self.log(f"✗ 缺少必要的库: {e}", "error")
-            messagebox.showerror("错误", "缺少必要的库\n\n请安装:\npip install pandas openpyxl")
+        # 检查openpyxl是否已安装
+        import importlib.util
+        if importlib.util.find_spec('openpyxl') is None:
+            self.log("✗ 缺少必要的库: openpyxl", "error")
+            messagebox.showerror("错误", "缺少必要的库\n\n请安装:\npip install openpyxl")
             return
         
         try:
@@ -1038,184 +792,15 @@ class DataScraperGUI:
             if not filename:
                 return
             
-            # 准备导出数据（按司机分组，每个司机包含详细订单+汇总行）
-            export_rows = []
-            summary_row_indices = []  # 记录汇总行的索引
-            
-            for billing in billing_data:
-                driver_name = billing.get('driver_name', '')
-                rides = billing.get('rides', [])
-                
-                # 添加该司机的所有订单（包括driver_canceled）
-                for ride in rides:
-                    status = ride.get('status', '')
-                    co_pay = float(ride.get('co_pay', 0) or 0)
-                    order_price = float(ride.get('order_price', 0) or 0)
-                    toll_fee = float(ride.get('toll_fee', 0) or 0)
-                    distance = float(ride.get('distance', 0) or 0)
-                    
-                    # 计算NO SHOW金额：no_show和driver_canceled订单为$5
-                    no_show = 5.0 if status in ['no_show', 'driver_canceled'] else 0.0
-                    
-                    export_rows.append({
-                        '司机姓名': driver_name,
-                        '订单数': None,  # 详细行不显示订单数
-                        '总收入': None,
-                        '订单ID': ride.get('id', ''),
-                        '接客时间': ride.get('pickup_at', ride.get('schedule_time', '')),
-                        '接客地点': ride.get('start_address', ride.get('pickup_address', '')),
-                        '送达地点': ride.get('destination_address', ride.get('dropoff_address', '')),
-                        '乘客姓名': f"{ride.get('first_name', '')} {ride.get('last_name', '')}".strip() or ride.get('customer_name', ''),
-                        '订单价格': order_price,
-                        'NO SHOW': no_show,
-                        'Co Pay': co_pay,
-                        'TOLL': toll_fee,
-                        '状态': status
-                    })
-                
-                # 添加该司机的汇总行
-                finished_count = billing.get('finished_count', 0)  # 只计算finished的订单数
-                
-                summary_row_indices.append(len(export_rows))  # 记录汇总行索引
-                export_rows.append({
-                    '司机姓名': driver_name,
-                    '订单数': finished_count,  # 只显示finished订单数
-                    '总收入': None,  # 将用公式填充
-                    '订单ID': '',
-                    '接客时间': '',
-                    '接客地点': '',
-                    '送达地点': '',
-                    '乘客姓名': '',
-                    '订单价格': None,  # 将用公式填充
-                    'NO SHOW': None,  # 将用公式填充
-                    'Co Pay': None,  # 将用公式填充
-                    'TOLL': None,  # 将用公式填充
-                    '状态': ''
-                })
-            
-            # 添加底部总计行
-            total_finished_count = sum(billing.get('finished_count', 0) for billing in billing_data)
-            total_row_index = len(export_rows)
-            
-            export_rows.append({
-                '司机姓名': '总计',
-                '订单数': total_finished_count,
-                '总收入': None,  # 将用公式填充
-                '订单ID': '',
-                '接客时间': '',
-                '接客地点': '',
-                '送达地点': '',
-                '乘客姓名': '',
-                '订单价格': None,  # 将用公式填充
-                'NO SHOW': None,  # 将用公式填充
-                'Co Pay': None,  # 将用公式填充
-                'TOLL': None,  # 将用公式填充
-                '状态': ''
-            })
-            
-            # 创建DataFrame
-            df = pd.DataFrame(export_rows)
-            
-            # 导出到Excel
-            with pd.ExcelWriter(filename, engine='openpyxl') as writer:
-                df.to_excel(writer, sheet_name='账单详情', index=False)
-                
-                # 获取工作表进行样式设置
-                workbook = writer.book
-                worksheet = writer.sheets['账单详情']
-                
-                # 填充司机汇总行的Excel公式
-                for idx, row_idx in enumerate(summary_row_indices):
-                    excel_row = row_idx + 2  # +2 因为Excel从1开始，且有表头
-                    
-                    # 找到该司机的订单起始行
-                    if idx == 0:
-                        start_row = 2
-                    else:
-                        start_row = summary_row_indices[idx-1] + 3  # 上一个汇总行的下一行
-                    
-                    # 订单价格合计 (I列)
-                    worksheet.cell(row=excel_row, column=9, value=f'=SUM(I{start_row}:I{excel_row-1})')
-                    # NO SHOW合计 (J列)
-                    worksheet.cell(row=excel_row, column=10, value=f'=SUM(J{start_row}:J{excel_row-1})')
-                    # Co Pay合计 (K列)
-                    worksheet.cell(row=excel_row, column=11, value=f'=SUM(K{start_row}:K{excel_row-1})')
-                    # TOLL合计 (L列)
-                    worksheet.cell(row=excel_row, column=12, value=f'=SUM(L{start_row}:L{excel_row-1})')
-                    # 总收入 = 订单价格 + Co Pay + TOLL + NO SHOW
-                    worksheet.cell(row=excel_row, column=3, value=f'=I{excel_row}+J{excel_row}+K{excel_row}+L{excel_row}')
-                
-                # 填充底部总计行的Excel公式
-                last_row = total_row_index + 2  # +2 因为Excel从1开始，且有表头
-                
-                # 总计行只汇总各司机的汇总行，而不是所有订单详细行
-                # 构建只汇总司机汇总行的公式
-                summary_rows_excel = [str(idx + 2) for idx in summary_row_indices]
-                sum_formula_order_price = '+'.join([f'I{row}' for row in summary_rows_excel])
-                sum_formula_no_show = '+'.join([f'J{row}' for row in summary_rows_excel])
-                sum_formula_copay = '+'.join([f'K{row}' for row in summary_rows_excel])
-                sum_formula_toll = '+'.join([f'L{row}' for row in summary_rows_excel])
-                
-                worksheet.cell(row=last_row, column=9, value=f'={sum_formula_order_price}')
-                worksheet.cell(row=last_row, column=10, value=f'={sum_formula_no_show}')
-                worksheet.cell(row=last_row, column=11, value=f'={sum_formula_copay}')
-                worksheet.cell(row=last_row, column=12, value=f'={sum_formula_toll}')
-                # 总收入 = 订单价格总计 + Co Pay总计 + TOLL总计 + NO SHOW总计
-                worksheet.cell(row=last_row, column=3, value=f'=I{last_row}+J{last_row}+K{last_row}+L{last_row}')
-                
-                # 设置汇总行样式（黄色背景+加粗）
-                yellow_fill = PatternFill(start_color='FFFF00', end_color='FFFF00', fill_type='solid')
-                bold_font = Font(bold=True)
-                
-                for row_idx in summary_row_indices:
-                    excel_row = row_idx + 2
-                    for col in range(1, 14):  # 所有列（添加Driver Cancel后共13列）
-                        cell = worksheet.cell(row=excel_row, column=col)
-                        cell.fill = yellow_fill
-                        cell.font = bold_font
-                
-                # 设置总计行样式（橙色背景+加粗）
-                orange_fill = PatternFill(start_color='FFA500', end_color='FFA500', fill_type='solid')
-                for col in range(1, 14):  # 所有列（添加Driver Cancel后共13列）
-                    cell = worksheet.cell(row=last_row, column=col)
-                    cell.fill = orange_fill
-                    cell.font = bold_font
-                
-                # 设置货币格式（$符号）
-                for row in range(2, last_row + 1):
-                    # 订单价格 (I列)
-                    worksheet.cell(row=row, column=9).number_format = '$#,##0.00'
-                    # NO SHOW (J列)
-                    worksheet.cell(row=row, column=10).number_format = '$#,##0.00'
-                    # Co Pay (K列)
-                    worksheet.cell(row=row, column=11).number_format = '$#,##0.00'
-                    # TOLL (L列)
-                    worksheet.cell(row=row, column=12).number_format = '$#,##0.00'
-                    # 总收入 (C列)
-                    if worksheet.cell(row=row, column=3).value:
-                        worksheet.cell(row=row, column=3).number_format = '$#,##0.00'
-                
-                # 调整列宽
-                worksheet.column_dimensions['A'].width = 20  # 司机姓名
-                worksheet.column_dimensions['B'].width = 10  # 订单数
-                worksheet.column_dimensions['C'].width = 12  # 总收入
-                worksheet.column_dimensions['D'].width = 12  # 订单ID
-                worksheet.column_dimensions['E'].width = 20  # 接客时间
-                worksheet.column_dimensions['F'].width = 45  # 接客地点
-                worksheet.column_dimensions['G'].width = 45  # 送达地点
-                worksheet.column_dimensions['H'].width = 20  # 乘客姓名
-                worksheet.column_dimensions['I'].width = 15  # 订单价格
-                worksheet.column_dimensions['J'].width = 12  # NO SHOW
-                worksheet.column_dimensions['K'].width = 12  # Co Pay
-                worksheet.column_dimensions['L'].width = 12  # TOLL
-                worksheet.column_dimensions['M'].width = 15  # 状态
+            # 流式写入：每位司机的订单行+汇总行，最后写入总计行
+            export_billing_excel(filename, billing_data)
             
             self.log(f"✓ 账单已导出到: {filename}", "success")
             messagebox.showinfo("成功", f"账单导出成功！\n\n文件: {filename}")
             
         except ImportError:
-            self.log("✗ 需要安装 pandas 和 openpyxl 库", "error")
-            messagebox.showerror("错误", "缺少必要的库\n\n请安装:\npip install pandas openpyxl")
+            self.log("✗ 需要安装 openpyxl 库", "error")
+            messagebox.showerror("错误", "缺少必要的库\n\n请安装:\npip install openpyxl")
         except Exception as e:
             self.log(f"✗ 导出失败: {str(e)}", "error")
             messagebox.showerror("错误", f"导出失败:\n{e}")
@@ -1243,7 +828,7 @@ class DataScraperGUI:
     
     def clear_output(self):
         """清空输出"""
-        self.output_text.delete(1.0, tk.END)
+        self.log_sink.clear()
         self.log("=" * 60)
         self.log("输出已清空", "info")
         self.log("=" * 60)
@@ -0,0 +1,207 @@
+"""
+后台任务 - 将界面上的批量操作（退工、转派、派工、查询）放到后台线程池执行
+提交后立即返回任务对象，界面可以查询进度、取消任务；
+多个任务可以同时运行，超过并发数的任务排队等待。
+"""
+
+import itertools
+import threading
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# 默认同时运行的任务数，可在config.py中通过JOB_MAX_WORKERS覆盖
+DEFAULT_MAX_WORKERS = 3
+
+
+class JobCancelled(Exception):
+    """任务被取消"""
+    pass
+
+
+class Job:
+    """后台任务"""
+    
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    CANCELLED = 'cancelled'
+    
+    STATUS_TEXT = {
+        QUEUED: '排队中',
+        RUNNING: '进行中',
+        DONE: '已完成',
+        FAILED: '失败',
+        CANCELLED: '已取消',
+    }
+    
+    def __init__(self, job_id: int, name: str, on_update: Optional[Callable[['Job'], None]] = None):
+        self.id = job_id
+        self.name = name
+        self.status = self.QUEUED
+        self.done = 0
+        self.total = 0
+        self.message = ''
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self._cancel_event = threading.Event()
+        self._on_update = on_update
+    
+    @property
+    def cancelled(self) -> bool:
+        """是否已请求取消（任务函数应在每一步之间检查）"""
+        return self._cancel_event.is_set()
+    
+    @property
+    def finished(self) -> bool:
+        return self.status in (self.DONE, self.FAILED, self.CANCELLED)
+    
+    def cancel(self):
+        """请求取消：排队中的任务不再执行，运行中的任务在下一步检查时停止"""
+        self._cancel_event.set()
+        self._notify()
+    
+    def check_cancelled(self):
+        """已请求取消时抛出 JobCancelled"""
+        if self.cancelled:
+            raise JobCancelled()
+    
+    def report(self, done: int = None, total: int = None, message: str = None):
+        """
+        报告进度（任务函数在后台线程中调用）
+        
+        Args:
+            done: 已完成数量
+            total: 总数量
+            message: 当前步骤说明
+        """
+        if done is not None:
+            self.done = done
+        if total is not None:
+            self.total = total
+        if message is not None:
+            self.message = message
+        self._notify()
+    
+    def describe(self) -> str:
+        """一行描述，如 "#3 批量退工 司机123 - 进行中 5/20" """
+        text = f"#{self.id} {self.name} - {self.STATUS_TEXT[self.status]}"
+        if self.cancelled and not self.finished:
+            text += '（正在取消）'
+        if self.total:
+            text += f" {self.done}/{self.total}"
+        if self.message and not self.finished:
+            text += f" | {self.message}"
+        return text
+    
+    def _notify(self):
+        if self._on_update is not None:
+            try:
+                self._on_update(self)
+            except Exception as e:
+                logger.error(f"任务状态回调失败: {e}")
+
+
+class JobRunner:
+    """后台任务执行器"""
+    
+    def __init__(self, max_workers: int = None, on_update: Optional[Callable[[Job], None]] = None):
+        """
+        Args:
+            max_workers: 同时运行的任务数
+            on_update: 任务状态或进度变化时的回调 on_update(job)，在后台线程中调用
+        """
+        self.max_workers = max_workers or getattr(config, 'JOB_MAX_WORKERS', DEFAULT_MAX_WORKERS)
+        self.on_update = on_update
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='job')
+        self._ids = itertools.count(1)
+        self._jobs: Dict[int, Job] = {}
+        self._lock = threading.Lock()
+    
+    def submit(self, name: str, func: Callable[..., Any], *args,
+               on_done: Optional[Callable[[Job], None]] = None, **kwargs) -> Job:
+        """
+        提交任务
+        
+        Args:
+            name: 任务名称（显示用）
+            func: 任务函数 func(job, *args, **kwargs)，通过 job.report() 报告进度，
+                  在每一步之间调用 job.check_cancelled() 或检查 job.cancelled
+            on_done: 任务结束（完成/失败/取消）后的回调 on_done(job)，在后台线程中调用
+        
+        Returns:
+            Job
+        """
+        job = Job(next(self._ids), name, self.on_update)
+        with self._lock:
+            self._jobs[job.id] = job
+        self._executor.submit(self._run, job, func, args, kwargs, on_done)
+        job._notify()
+        return job
+    
+    def _run(self, job: Job, func, args, kwargs, on_done):
+        if job.cancelled:
+            job.status = Job.CANCELLED
+        else:
+            job.status = Job.RUNNING
+            job._notify()
+            try:
+                job.result = func(job, *args, **kwargs)
+                job.status = Job.CANCELLED if job.cancelled else Job.DONE
+            except JobCancelled:
+                job.status = Job.CANCELLED
+            except Exception as e:
+                logger.error(f"任务 #{job.id} {job.name} 失败: {e}", exc_info=True)
+                job.error = e
+                job.status = Job.FAILED
+        
+        job.finished_at = time.time()
+        job._notify()
+        if on_done is not None:
+            try:
+                on_done(job)
+            except Exception as e:
+                logger.error(f"任务 #{job.id} 结束回调失败: {e}")
+    
+    def jobs(self, include_finished: bool = True) -> List[Job]:
+        """所有任务（按提交顺序）"""
+        with self._lock:
+            jobs = list(self._jobs.values())
+        if not include_finished:
+            jobs = [job for job in jobs if not job.finished]
+        return jobs
+    
+    def get(self, job_id: int) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+    
+    def cancel(self, job_id: int) -> bool:
+        """取消任务，任务不存在或已结束时返回False"""
+        job = self.get(job_id)
+        if job is None or job.finished:
+            return False
+        job.cancel()
+        return True
+    
+    def cancel_all(self):
+        """取消所有未结束的任务"""
+        for job in self.jobs(include_finished=False):
+            job.cancel()
+    
+    def clear_finished(self):
+        """移除已结束的任务记录"""
+        with self._lock:
+            self._jobs = {job_id: job for job_id, job in self._jobs.items() if not job.finished}
+    
+    def shutdown(self, wait: bool = False):
+        """取消所有任务并关闭线程池"""
+        self.cancel_all()
+        self._executor.shutdown(wait=wait)
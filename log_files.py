@@ -0,0 +1,138 @@
+"""
+日志文件工具 - 按大小轮转并压缩旧日志，从文件末尾读取最近的日志
+轮转后的旧日志保存为 automation.log.1.gz、automation.log.2.gz ...，
+查看日志时从文件末尾向前按块读取，只读取需要的最后N行，与日志文件大小无关。
+"""
+
+import gzip
+import os
+import shutil
+import time
+from logging.handlers import RotatingFileHandler
+from typing import List
+
+import config
+
+# 默认单个日志文件上限和保留的旧日志数，可在config.py中通过LOG_MAX_BYTES/LOG_BACKUP_COUNT覆盖
+DEFAULT_MAX_BYTES = 10 * 1024 * 1024
+DEFAULT_BACKUP_COUNT = 5
+
+# 轮转失败后多久（秒）再重试，期间继续写入当前文件
+ROTATE_RETRY_INTERVAL = 300
+
+# 向前读取的块大小
+TAIL_BLOCK_SIZE = 64 * 1024
+
+
+def _gzip_namer(name: str) -> str:
+    return name + '.gz'
+
+
+def _gzip_rotator(source: str, dest: str) -> bool:
+    """
+    将轮转出的日志压缩为 dest
+    
+    压缩后无法删除原文件（如被其他进程占用）时清空原文件代替删除；
+    压缩或清空失败时删除不完整的 dest，保留原文件继续写入。
+    
+    Returns:
+        是否轮转成功
+    """
+    try:
+        with open(source, 'rb') as src, gzip.open(dest, 'wb') as dst:
+            shutil.copyfileobj(src, dst)
+        try:
+            os.remove(source)
+        except OSError:
+            with open(source, 'r+b') as f:
+                f.truncate(0)
+        return True
+    except OSError:
+        if os.path.exists(dest):
+            try:
+                os.remove(dest)
+            except OSError:
+                pass
+        return False
+
+
+class GzipRotatingFileHandler(RotatingFileHandler):
+    """按大小轮转并压缩旧日志；轮转失败后暂停轮转一段时间，不在每条日志写入时重新压缩整个文件"""
+    
+    def __init__(self, *args, retry_interval: float = ROTATE_RETRY_INTERVAL, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.namer = _gzip_namer
+        self.retry_interval = retry_interval
+        self._rotate_failed_at = 0.0
+    
+    def rotate(self, source: str, dest: str):
+        if _gzip_rotator(source, dest):
+            self._rotate_failed_at = 0.0
+        else:
+            self._rotate_failed_at = time.time()
+    
+    def shouldRollover(self, record) -> bool:
+        if self._rotate_failed_at and time.time() - self._rotate_failed_at < self.retry_interval:
+            return False
+        return super().shouldRollover(record)
+
+
+def log_file_handler(filename: str = None, max_bytes: int = None, backup_count: int = None) -> RotatingFileHandler:
+    """
+    创建按大小轮转、压缩旧日志的文件处理器
+    
+    Args:
+        filename: 日志文件（默认 config.LOG_FILE）
+        max_bytes: 单个日志文件上限（字节）
+        backup_count: 保留的旧日志数
+    
+    Returns:
+        GzipRotatingFileHandler
+    """
+    return GzipRotatingFileHandler(
+        filename or config.LOG_FILE,
+        maxBytes=max_bytes or getattr(config, 'LOG_MAX_BYTES', DEFAULT_MAX_BYTES),
+        backupCount=backup_count or getattr(config, 'LOG_BACKUP_COUNT', DEFAULT_BACKUP_COUNT),
+        encoding='utf-8',
+        delay=True
+    )
+
+
+def tail_lines(filename: str, count: int = 100, encoding: str = 'utf-8') -> List[str]:
+    """
+    读取文件的最后 count 行
+    
+    从文件末尾向前按块读取，直到读到足够的换行符，读取量只与需要的行数有关。
+    
+    Args:
+        filename: 文件路径
+        count: 行数
+        encoding: 文件编码（无法解码的字节替换为占位符）
+    
+    Returns:
+        最后 count 行（不含换行符）
+    """
+    if count <= 0:
+        return []
+    
+    with open(filename, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        blocks = []
+        newlines = 0
+        
+        # 多读一个换行符，保证第一行是完整的
+        while position > 0 and newlines <= count:
+            size = min(TAIL_BLOCK_SIZE, position)
+            position -= size
+            f.seek(position)
+            block = f.read(size)
+            blocks.append(block)
+            newlines += block.count(b'\n')
+    
+    data = b''.join(reversed(blocks))
+    lines = data.decode(encoding, errors='replace').splitlines()
+    if position > 0:
+        # 第一行可能只读到了一半
+        lines = lines[1:]
+    return lines[-count:]
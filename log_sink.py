@@ -0,0 +1,140 @@
+"""
+界面日志输出 - 后台线程只把日志放入队列，主线程按固定帧率批量写入文本框
+工作线程调用 write() 不会触碰Tk，也不会等待界面重绘；
+文本框只保留最近 N 行（超出时删除最早的行），长时间运行也不会无限增长。
+"""
+
+import collections
+import queue
+import tkinter as tk
+import logging
+from typing import Callable
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# 默认最多保留的行数和刷新间隔，可在config.py中通过LOG_PANE_MAX_LINES/LOG_FLUSH_INTERVAL_MS覆盖
+DEFAULT_MAX_LINES = 5000
+DEFAULT_INTERVAL_MS = 50
+
+_CLEAR = object()
+_DIALOG = object()
+
+
+class TextLogSink:
+    """ScrolledText的批量日志写入器（任意线程可调用write）"""
+    
+    def __init__(self, root, text_widget, max_lines: int = None, interval_ms: int = None):
+        """
+        创建写入器并启动刷新循环
+        
+        Args:
+            root: Tk根窗口（用于 after 调度）
+            text_widget: 日志文本框
+            max_lines: 文本框最多保留的行数
+            interval_ms: 刷新间隔（毫秒）
+        """
+        self.root = root
+        self.text = text_widget
+        self.max_lines = max_lines or getattr(config, 'LOG_PANE_MAX_LINES', DEFAULT_MAX_LINES)
+        self.interval_ms = interval_ms or getattr(config, 'LOG_FLUSH_INTERVAL_MS', DEFAULT_INTERVAL_MS)
+        self._queue = queue.SimpleQueue()
+        self._running = True
+        self.root.after(self.interval_ms, self._pump)
+    
+    def write(self, message: str, tag: str = ""):
+        """追加一行日志（不阻塞，实际写入在下一次刷新时进行）"""
+        self._queue.put((f"{message}\n", tag))
+    
+    def post(self, func: Callable, *args):
+        """在主线程的下一次刷新时调用 func(*args)，用于后台线程更新状态栏等控件"""
+        self._queue.put((func, args))
+    
+    def post_dialog(self, func: Callable, *args):
+        """
+        在主线程弹出对话框，如 post_dialog(messagebox.showinfo, "完成", msg)
+        
+        对话框在单独的 after 回调中打开，等待用户点击期间日志照常刷新。
+        """
+        self._queue.put((_DIALOG, (func, args)))
+    
+    def clear(self):
+        """清空文本框（在此之前放入队列的日志一并丢弃）"""
+        self._queue.put(_CLEAR)
+    
+    def stop(self):
+        """停止刷新循环"""
+        self._running = False
+    
+    def _drain(self):
+        """
+        取出队列中的所有条目
+        
+        Returns:
+            (待写入的行, 待调用的函数, 是否清空)；一次积压超过 max_lines 行时只保留最后 max_lines 行
+        """
+        lines = collections.deque(maxlen=self.max_lines)
+        calls = []
+        cleared = False
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _CLEAR:
+                lines.clear()
+                cleared = True
+            elif item[0] is _DIALOG or callable(item[0]):
+                calls.append(item)
+            else:
+                lines.append(item)
+        return lines, calls, cleared
+    
+    def _flush(self, lines, cleared: bool):
+        """批量写入文本框：相邻同样式的行合并为一段，一次insert"""
+        if cleared:
+            self.text.delete("1.0", tk.END)
+        if not lines:
+            return
+        
+        args = []
+        chunk, chunk_tag = [], None
+        for text, tag in lines:
+            if chunk and tag != chunk_tag:
+                args.extend(("".join(chunk), chunk_tag))
+                chunk = []
+            chunk.append(text)
+            chunk_tag = tag
+        args.extend(("".join(chunk), chunk_tag))
+        self.text.insert(tk.END, *args)
+        
+        # 只保留最后 max_lines 行（末尾总有一个空行）
+        line_count = int(self.text.index("end-1c").split(".")[0]) - 1
+        if line_count > self.max_lines:
+            self.text.delete("1.0", f"{line_count - self.max_lines + 1}.0")
+        
+        self.text.see(tk.END)
+    
+    def _pump(self):
+        """主线程刷新循环"""
+        if not self._running:
+            return
+        try:
+            lines, calls, cleared = self._drain()
+            self._flush(lines, cleared)
+            for func, args in calls:
+                if func is _DIALOG:
+                    # 模态对话框会阻塞到用户关闭，放到单独的回调中，不占用本次刷新
+                    dialog, dialog_args = args
+                    self.root.after(0, dialog, *dialog_args)
+                    continue
+                try:
+                    func(*args)
+                except Exception as e:
+                    logger.error(f"界面更新失败: {e}")
+        except tk.TclError:
+            # 窗口已关闭
+            self._running = False
+            return
+        self.root.after(self.interval_ms, self._pump)
@@ -0,0 +1,51 @@
+"""
+流水线工具 - 将生成器的每个元素立即提交到线程池处理
+上游每产生一个元素就提交，下游按完成顺序取得结果，
+多个阶段串联时前一阶段的结果无需等待整批完成即可进入下一阶段。
+"""
+
+import logging
+from concurrent.futures import Executor, wait, FIRST_COMPLETED
+from typing import Any, Callable, Iterable, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def _drain(pending: dict, done) -> Iterator[Tuple[Any, Any, Optional[Exception]]]:
+    """取出已完成任务的结果"""
+    for future in done:
+        item = pending.pop(future)
+        try:
+            yield item, future.result(), None
+        except Exception as e:
+            yield item, None, e
+
+
+def stream_map(executor: Executor, fn: Callable[[Any], Any], items: Iterable,
+               max_pending: int = 32) -> Iterator[Tuple[Any, Any, Optional[Exception]]]:
+    """
+    流式并发处理：逐个从items取元素提交到线程池，按完成顺序返回结果
+    
+    Args:
+        executor: 线程池
+        fn: 处理函数 fn(item)
+        items: 输入（可以是生成器，边产生边处理）
+        max_pending: 同时在途的任务上限，达到上限时等待任意一个完成
+    
+    Yields:
+        (输入元素, 结果, 异常) - 成功时异常为None
+    """
+    pending = {}
+    
+    for item in items:
+        pending[executor.submit(fn, item)] = item
+        
+        if len(pending) >= max_pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        else:
+            done = [future for future in pending if future.done()]
+        yield from _drain(pending, done)
+    
+    while pending:
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        yield from _drain(pending, done)
@@ -0,0 +1,161 @@
+"""
+价格提取 - 从订单详情的events和notes中提取原始价格和Co Pay，计算订单价格和TOLL
+正则只在模块加载时编译一次；不含 "$" 的event和note直接跳过，不进入正则匹配。
+账单（按日期/按日期范围）和订单查询脚本共用同一套提取和计费规则。
+"""
+
+import re
+import logging
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional
+
+from billing_engine import NO_SHOW_FEE, NO_SHOW_STATUSES
+
+logger = logging.getLogger(__name__)
+
+# events中的预订价格，如 "xxx reserved the ride for $45.50"
+RESERVED_PRICE_PATTERN = re.compile(r'reserved.*for\s+\$([0-9]+\.?[0-9]*)', re.IGNORECASE)
+
+# notes的label中的金额，如 "Collect $10"
+DOLLAR_AMOUNT_PATTERN = re.compile(r'\$([0-9]+\.?[0-9]*)')
+
+# notes正文中的Co Pay，如 "Co-Pay: $10"（旧版订单爬取使用）
+CO_PAY_TEXT_PATTERN = re.compile(r'Co[- ]?Pay[:\s]*\$?([\d.]+)', re.IGNORECASE)
+
+# 计费规则
+RULES_DAILY = 'daily'  # 单日账单/订单查询：no_show和driver_canceled订单价格固定$5；无预订价格时订单价格 = vendor_amount - Co Pay
+RULES_RANGE = 'range'  # 日期范围账单：no_show和driver_canceled订单金额全部为0（$5在汇总时另计）；无预订价格时订单价格 = vendor_amount
+
+
+class PriceRecord(NamedTuple):
+    """单个订单的价格信息"""
+    ride_id: Any
+    status: str
+    vendor_amount: float
+    driver_net: float
+    reserved_price: float  # events中的预订价格，没有时为0
+    co_pay: float
+    co_pay_note: Optional[Dict[str, str]]  # Co Pay来源的note {'label', 'description', 'icon'}
+    original_price: float
+    order_price: float
+    toll_fee: float
+
+    @property
+    def has_notes_price(self) -> bool:
+        """events中是否有预订价格"""
+        return self.reserved_price > 0
+
+
+def _to_float(value) -> float:
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def find_reserved_price(events: Optional[Iterable[Dict[str, Any]]]) -> float:
+    """
+    从events中提取预订价格（第一条匹配的event）
+
+    Returns:
+        价格，没有时返回0
+    """
+    for event in events or ():
+        body = event.get('body') or ''
+        if '$' not in body:
+            continue
+        match = RESERVED_PRICE_PATTERN.search(body)
+        if match:
+            return float(match.group(1))
+    return 0.0
+
+
+def find_co_pay(notes: Optional[Iterable[Dict[str, Any]]]):
+    """
+    从notes中提取Co Pay
+
+    label中必须含$金额，并且 icon='private'（优先）或 description 中含 'collect'/'cash'。
+
+    Returns:
+        (金额, 来源note)，没有时返回 (0, None)
+    """
+    for note in notes or ():
+        label = note.get('label') or ''
+        if '$' not in label:
+            continue
+        match = DOLLAR_AMOUNT_PATTERN.search(label)
+        if not match:
+            continue
+        description = (note.get('description') or '').lower()
+        icon = note.get('icon') or ''
+        if icon == 'private' or 'collect' in description or 'cash' in description:
+            return float(match.group(1)), {'label': label, 'description': description, 'icon': icon}
+    return 0.0, None
+
+
+def find_co_pay_text(notes: Optional[Iterable[Dict[str, Any]]]) -> float:
+    """从notes正文（note字段）中提取 "Co Pay: $X"，没有时返回0"""
+    for note in notes or ():
+        text = note.get('note') or ''
+        match = CO_PAY_TEXT_PATTERN.search(text)
+        if match:
+            try:
+                return float(match.group(1))
+            except ValueError:
+                continue
+    return 0.0
+
+
+def extract_price(ride: Dict[str, Any], rules: str = RULES_DAILY) -> PriceRecord:
+    """
+    提取单个订单的价格
+
+    Args:
+        ride: 订单详情（/fleet/rides/{id} 返回的 ride，或包含 'ride' 的完整响应）
+        rules: 计费规则，RULES_DAILY 或 RULES_RANGE
+
+    Returns:
+        PriceRecord
+    """
+    if 'ride' in ride and isinstance(ride['ride'], dict):
+        ride = ride['ride']
+
+    status = ride.get('status', '') or ''
+    vendor_amount = _to_float(ride.get('vendor_amount'))
+    driver_net = _to_float(ride.get('driver_net'))
+    reserved_price = find_reserved_price(ride.get('events'))
+    co_pay, co_pay_note = find_co_pay(ride.get('notes'))
+
+    if status in NO_SHOW_STATUSES:
+        co_pay = 0.0
+        toll_fee = 0.0
+        if rules == RULES_RANGE:
+            order_price = original_price = 0.0
+        else:
+            order_price = original_price = NO_SHOW_FEE
+    elif reserved_price > 0:
+        # 订单价格 = 预订价格 - Co Pay，TOLL = vendor_amount - 订单价格
+        original_price = reserved_price
+        order_price = round(reserved_price - co_pay, 2)
+        toll_fee = round(vendor_amount - order_price, 2)
+    else:
+        # 没有预订价格说明vendor_amount就是最终价格，无TOLL信息
+        original_price = vendor_amount
+        order_price = vendor_amount if rules == RULES_RANGE else round(vendor_amount - co_pay, 2)
+        toll_fee = 0.0
+
+    return PriceRecord(ride.get('id'), status, vendor_amount, driver_net, reserved_price,
+                       co_pay, co_pay_note, original_price, order_price, toll_fee)
+
+
+def extract_prices(rides: Iterable[Dict[str, Any]], rules: str = RULES_DAILY) -> List[PriceRecord]:
+    """
+    批量提取订单价格
+
+    Args:
+        rides: 订单详情列表
+        rules: 计费规则
+
+    Returns:
+        与输入顺序一致的PriceRecord列表
+    """
+    return [extract_price(ride, rules) for ride in rides]
@@ -6,18 +6,40 @@
 import requests
 import json
 import os
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import List, Dict, Any, Optional
-import time
 import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import config
+from ride_cache import RideDetailCache
+from snapshot_store import SnapshotStore
+from scrape_journal import ScrapeJournal
+from time_utils import day_window, in_window, local_isoformat
 
 logger = logging.getLogger(__name__)
 
 
+class IncompleteRidesError(Exception):
+    """部分分页获取失败，订单列表不完整"""
+    
+    def __init__(self, date: str, failed_pages: List[int], rides: List[Dict[str, Any]]):
+        self.date = date
+        self.failed_pages = sorted(failed_pages)
+        self.rides = rides  # 已获取到的部分订单
+        pages = ', '.join(str(page) for page in self.failed_pages)
+        super().__init__(f"{date} 的订单不完整：第 {pages} 页获取失败（已获取 {len(rides)} 条）")
+
+
 class RealAPIScraper:
     """真实API爬虫 - 支持分页获取完整数据"""
     
+    # 分页并发获取订单时的默认线程数
+    RIDES_PAGE_WORKERS = 4
+    # 按日期范围获取订单时同时获取的天数
+    RANGE_DAY_WORKERS = 4
+    # 获取司机及车辆详情时的并发数（请求速率由APIClient的限速器控制）
+    DRIVER_DETAIL_WORKERS = 8
+    
     def __init__(self, api_client=None):
         """初始化"""
         if api_client:
@@ -28,19 +50,78 @@ class RealAPIScraper:
         
         self.data_dir = config.DATA_DIR
         self._ensure_data_dir()
+        self.ride_cache = RideDetailCache()
+        
+        # 列式快照（需要pyarrow，可在config中通过SNAPSHOT_ENABLED关闭）
+        self.snapshots = None
+        if getattr(config, 'SNAPSHOT_ENABLED', True) and SnapshotStore.is_available():
+            self.snapshots = SnapshotStore()
     
     def _ensure_data_dir(self):
         """确保数据目录存在"""
         if not os.path.exists(self.data_dir):
             os.makedirs(self.data_dir)
     
-    def get_all_drivers(self, per_page: int = 100, progress_callback=None) -> List[Dict[str, Any]]:
+    def _snapshot_writer(self, entity: str, date: str, statuses: str = ''):
+        """创建快照写入器，未启用快照或创建失败时返回None"""
+        if self.snapshots is None:
+            return None
+        try:
+            return self.snapshots.writer(entity, date, statuses)
+        except Exception as e:
+            logger.warning(f"创建 {entity} 快照失败: {e}")
+            return None
+    
+    @staticmethod
+    def _snapshot_page(writer, records: List[Dict[str, Any]], total: int = 0):
+        """写入一页快照，写入失败时放弃该快照（不影响爬取）"""
+        if writer is None:
+            return None
+        try:
+            writer.write_page(records, total)
+            return writer
+        except Exception as e:
+            logger.warning(f"写入 {writer.entity} 快照失败: {e}")
+            writer.abort()
+            return None
+    
+    @staticmethod
+    def _snapshot_finish(writer, complete: bool = True):
+        """获取结束后保存快照，获取中断时丢弃"""
+        if writer is None:
+            return
+        try:
+            if complete:
+                writer.commit()
+            else:
+                writer.abort()
+        except Exception as e:
+            logger.warning(f"保存 {writer.entity} 快照失败: {e}")
+            writer.abort()
+    
+    def _journaled_get(self, journal: Optional[ScrapeJournal], entity: str, page: int,
+                       endpoint: str, params: Dict[str, Any]):
+        """获取一页数据：断点中已有时直接返回记录的响应，否则请求API并记录"""
+        if journal is not None:
+            response = journal.page(entity, page)
+            if response is not None:
+                logger.info(f"第 {page} 页已在断点中，跳过请求")
+                return response
+        
+        response = self.api.get(endpoint, params=params)
+        if journal is not None and isinstance(response, dict):
+            journal.record_page(entity, page, response)
+        return response
+    
+    def get_all_drivers(self, per_page: int = 100, progress_callback=None,
+                        journal: ScrapeJournal = None) -> List[Dict[str, Any]]:
         """
         获取所有司机数据（支持分页）
         
         Args:
             per_page: 每页数量（最大100）
             progress_callback: 进度回调函数
+            journal: 断点日志（提供时跳过已完成的分页，并记录新获取的分页）
             
         Returns:
             完整的司机列表
@@ -49,6 +130,8 @@ class RealAPIScraper:
         
         all_drivers = []
         page = 1
+        complete = True
+        snapshot = self._snapshot_writer('drivers', datetime.now().strftime('%Y-%m-%d'))
         
         while True:
             try:
@@ -61,7 +144,7 @@ class RealAPIScraper:
                 }
                 
                 logger.info(f"正在获取第 {page} 页数据...")
-                response = self.api.get('/fleet/drivers', params=params)
+                response = self._journaled_get(journal, 'drivers', page, '/fleet/drivers', params)
                 
                 # 检查响应格式 - API返回格式: {"drivers": {"data": [...], "current_page": 1, ...}}
                 if isinstance(response, dict):
@@ -85,6 +168,7 @@ class RealAPIScraper:
                         break
                     
                     all_drivers.extend(drivers)
+                    snapshot = self._snapshot_page(snapshot, drivers)
                     logger.info(f"✓ 第 {page} 页: 获取 {len(drivers)} 条数据 (累计: {len(all_drivers)})")
                     
                     if progress_callback:
@@ -107,21 +191,25 @@ class RealAPIScraper:
                         break
                     
                     page += 1
-                    time.sleep(0.2)  # 避免请求过快
                     
                 else:
                     logger.error(f"响应格式错误: {type(response)}")
+                    complete = False
                     break
                     
             except Exception as e:
                 logger.error(f"获取第 {page} 页数据失败: {e}")
+                complete = False
                 break
         
+        self._snapshot_finish(snapshot, complete and bool(all_drivers))
+        if journal is not None and complete:
+            journal.mark_complete('drivers')
         logger.info(f"✓ 完成！共获取 {len(all_drivers)} 位司机数据")
         return all_drivers
     
     def get_all_routes(self, date: str = None, per_page: int = 100, 
-                       progress_callback=None) -> List[Dict[str, Any]]:
+                       progress_callback=None, journal: ScrapeJournal = None) -> List[Dict[str, Any]]:
         """
         获取所有路线/订单数据（支持分页）
         
@@ -129,6 +217,7 @@ class RealAPIScraper:
             date: 日期，格式 YYYY-MM-DD（默认今天）
             per_page: 每页数量
             progress_callback: 进度回调
+            journal: 断点日志（提供时跳过已完成的分页，并记录新获取的分页）
             
         Returns:
             完整的路线列表
@@ -140,6 +229,8 @@ class RealAPIScraper:
         
         all_routes = []
         page = 1
+        complete = True
+        snapshot = self._snapshot_writer('routes', date)
         
         while True:
             try:
@@ -157,7 +248,7 @@ class RealAPIScraper:
                 }
                 
                 logger.info(f"正在获取第 {page} 页路线数据...")
-                response = self.api.get('/fleet/routes', params=params)
+                response = self._journaled_get(journal, 'routes', page, '/fleet/routes', params)
                 
                 # API返回格式: {"routes": {"data": [...], ...}}
                 if isinstance(response, dict):
@@ -178,6 +269,7 @@ class RealAPIScraper:
                         break
                     
                     all_routes.extend(routes)
+                    snapshot = self._snapshot_page(snapshot, routes)
                     logger.info(f"✓ 第 {page} 页: 获取 {len(routes)} 条路线 (累计: {len(all_routes)})")
                     
                     if progress_callback:
@@ -195,106 +287,505 @@ class RealAPIScraper:
                         break
                     
                     page += 1
-                    time.sleep(0.2)
                     
                 else:
+                    complete = False
                     break
                     
             except Exception as e:
                 logger.error(f"获取第 {page} 页路线数据失败: {e}")
+                complete = False
                 break
         
+        self._snapshot_finish(snapshot, complete and bool(all_routes))
+        if journal is not None and complete:
+            journal.mark_complete('routes')
         logger.info(f"✓ 完成！共获取 {len(all_routes)} 条路线数据")
         return all_routes
     
+    @staticmethod
+    def _parse_rides_page(response) -> tuple:
+        """
+        解析 /fleet/rides 分页响应
+        
+        Args:
+            response: API响应
+            
+        Returns:
+            (订单列表, 总数, 最后一页, 是否有下一页)
+        """
+        # API返回格式: {"rides": {"data": [...], ...}}
+        if not isinstance(response, dict):
+            return [], 0, None, False
+        
+        rides_data = response.get('rides', response.get('data', {}))
+        if isinstance(rides_data, dict):
+            rides = rides_data.get('data', [])
+            total = rides_data.get('total', 0)
+            last_page = rides_data.get('last_page')
+            # 如果有next_page_url字段且为None，说明没有下一页了
+            has_next = not ('next_page_url' in rides_data and rides_data.get('next_page_url') is None)
+        else:
+            rides = rides_data if isinstance(rides_data, list) else []
+            total = len(rides)
+            last_page = None
+            has_next = True
+        
+        return rides, total, last_page, has_next
+    
+    @staticmethod
+    def _merge_rides(rides: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        按订单ID去重，并按pickup_at排序
+        
+        分页期间数据可能发生变动，同一订单可能出现在相邻两页中，保留先出现的一条。
+        """
+        seen = set()
+        merged = []
+        for ride in rides:
+            ride_id = ride.get('id')
+            if ride_id is not None:
+                if ride_id in seen:
+                    continue
+                seen.add(ride_id)
+            merged.append(ride)
+        
+        merged.sort(key=lambda r: r.get('pickup_at') or '')
+        return merged
+    
+    @staticmethod
+    def rides_query_params(date: str, per_page: int = 500, statuses: str = '',
+                           sort_by: str = 'rides.pickup_at', sort_by_type: str = 'false',
+                           driver_id: int = None, start_time: str = '00:00', end_time: str = '23:59',
+                           search: str = '') -> Dict[str, Any]:
+        """
+        构建 /fleet/rides 的查询参数（不含page）
+        
+        Args:
+            date: 日期，格式 YYYY-MM-DD
+            per_page: 每页数量
+            statuses: 订单状态过滤，多个用逗号分隔
+            sort_by: 排序字段
+            sort_by_type: 排序方向
+            driver_id: 只查询该司机的订单（通过filters参数传给服务器）
+            start_time: 上车时间段开始，格式 HH:MM
+            end_time: 上车时间段结束，格式 HH:MM（包含）
+            search: 搜索关键字
+            
+        Returns:
+            查询参数字典
+        
+        时间段按纽约本地时间换算为带时区偏移的时间戳发送（服务器不会按其他时区理解），
+        结束时间取时间段结束后的下一分钟，边界上多出的订单由 ride_matcher 在本地过滤。
+        """
+        start, end = day_window(date, start_time, end_time)
+        return {
+            'per_page': per_page,
+            'search': search,
+            'sort_by': sort_by,
+            'sort_by_type': sort_by_type,
+            'statuses': statuses,
+            'all_rides': 'true',
+            'from_datetime': local_isoformat(start),
+            'to_datetime': local_isoformat(end),
+            'filters': json.dumps({'driver_id': driver_id}) if driver_id is not None else ''
+        }
+    
+    @staticmethod
+    def ride_matcher(date: str, driver_id: int = None, statuses: str = '',
+                     start_time: str = '00:00', end_time: str = '23:59'):
+        """
+        构建与 rides_query_params 条件相同的本地过滤函数
+        
+        上车时间按 time_utils.parse_local 换算为纽约本地时间后比较（与 RideIndex 相同），
+        没有上车时间或无法解析的订单视为在时间段内。
+        
+        Returns:
+            match(ride) -> bool
+        """
+        wanted = {s.strip() for s in statuses.split(',') if s.strip()}
+        window_start, window_end = day_window(date, start_time, end_time)
+        driver_key = None if driver_id is None else str(driver_id)
+        
+        def match(ride: Dict[str, Any]) -> bool:
+            if driver_key is not None and str(ride.get('driver_id')) != driver_key:
+                return False
+            if wanted and ride.get('status') not in wanted:
+                return False
+            if in_window(ride.get('pickup_at'), window_start, window_end) is False:
+                return False
+            return True
+        
+        return match
+    
+    def find_rides(self, date: str = None, driver_id: int = None, statuses: str = '',
+                   start_time: str = '00:00', end_time: str = '23:59', per_page: int = 500,
+                   max_workers: int = None) -> List[Dict[str, Any]]:
+        """
+        按司机、状态和上车时间段查询订单
+        
+        过滤条件放在 /fleet/rides 的查询参数中由服务器过滤，单个司机通常只需要一页；
+        每一页仍按相同条件在本地过滤一遍，服务器忽略某个条件时（返回了不符合条件的订单）
+        结果同样正确，只是需要获取当天的全部分页。
+        
+        Args:
+            date: 日期，格式 YYYY-MM-DD（默认今天）
+            driver_id: 司机ID（None表示所有司机）
+            statuses: 订单状态过滤，多个用逗号分隔，空字符串表示所有状态
+            start_time: 上车时间段开始，格式 HH:MM
+            end_time: 上车时间段结束，格式 HH:MM（包含）
+            per_page: 每页数量（最大500）
+            max_workers: 并发线程数（默认 RIDES_PAGE_WORKERS）
+            
+        Returns:
+            符合条件的订单列表（按pickup_at排序）
+        
+        Raises:
+            IncompleteRidesError: 有分页获取失败
+        """
+        if date is None:
+            date = datetime.now().strftime('%Y-%m-%d')
+        
+        base_params = self.rides_query_params(date, per_page=per_page, statuses=statuses, driver_id=driver_id,
+                                              start_time=start_time, end_time=end_time)
+        match = self.ride_matcher(date, driver_id=driver_id, statuses=statuses,
+                                  start_time=start_time, end_time=end_time)
+        
+        pages = {}
+        fetched = 0
+        failed = []
+        for page, rides, _ in self.iter_rides_pages(max_workers=max_workers, base_params=base_params,
+                                                    failed=failed):
+            fetched += len(rides)
+            pages[page] = [ride for ride in rides if match(ride)]
+        
+        ordered = [ride for page in sorted(pages) for ride in pages[page]]
+        if len(ordered) < fetched:
+            logger.info(f"服务器未完全按条件过滤（返回 {fetched} 条，符合条件 {len(ordered)} 条），已在本地过滤")
+        
+        rides = self._merge_rides(ordered)
+        if failed:
+            raise IncompleteRidesError(date, failed, rides)
+        logger.info(f"✓ 查询完成: {len(pages)} 页, 共 {len(rides)} 条符合条件的订单")
+        return rides
+    
     def get_all_rides(self, date: str = None, per_page: int = 500, 
-                      statuses: str = '', progress_callback=None) -> List[Dict[str, Any]]:
+                      statuses: str = '', progress_callback=None,
+                      parallel: bool = True, max_workers: int = None,
+                      strict: bool = True, snapshot: bool = False) -> List[Dict[str, Any]]:
         """
         获取所有订单数据（支持分页）
         
+        并发模式下先获取第1页，根据返回的last_page同时获取第2页到最后一页，
+        结果按订单ID去重并按pickup_at排序。
+        
         Args:
             date: 日期，格式 YYYY-MM-DD（默认今天）
             per_page: 每页数量（最大500）
             statuses: 订单状态过滤，多个用逗号分隔，空字符串表示所有状态
             progress_callback: 进度回调
+            parallel: 是否并发获取后续分页
+            max_workers: 并发线程数（默认 RIDES_PAGE_WORKERS）
+            strict: 有分页获取失败时是否抛出异常（False时记录警告并返回已获取的部分订单）
+            snapshot: 是否保存快照（爬取/账单时使用；频繁轮询不保存），有分页获取失败时不保存
             
         Returns:
             完整的订单列表
+        
+        Raises:
+            IncompleteRidesError: strict=True 且有分页获取失败
         """
         if date is None:
             date = datetime.now().strftime('%Y-%m-%d')
         
         logger.info(f"开始获取 {date} 的订单数据（分页模式）...")
         
+        base_params = self.rides_query_params(date, per_page=per_page, statuses=statuses)
+        
+        # 完整查询和按状态过滤的查询分别保存快照
+        writer = self._snapshot_writer('rides', date, statuses) if snapshot else None
+        
+        def on_page(rides, total):
+            nonlocal writer
+            writer = self._snapshot_page(writer, rides, total)
+        
+        failed = []
+        if parallel:
+            all_rides = self._get_rides_pages_parallel(base_params, progress_callback, max_workers, on_page, failed)
+        else:
+            all_rides = self._get_rides_pages_serial(base_params, progress_callback, on_page, failed)
+        
+        # 空结果或不完整的结果不保存快照
+        self._snapshot_finish(writer, bool(all_rides) and not failed)
+        if failed:
+            error = IncompleteRidesError(date, failed, all_rides)
+            if strict:
+                raise error
+            logger.warning(f"⚠️ {error}")
+            return all_rides
+        
+        logger.info(f"✓ 完成！共获取 {len(all_rides)} 条订单数据")
+        return all_rides
+    
+    def load_snapshot(self, entity: str, date: str, statuses: str = '',
+                      columns: Optional[List[str]] = None) -> Optional[List[Dict[str, Any]]]:
+        """
+        读取当天结束之后保存的快照（数据不会再变化，可以代替API请求）
+        
+        Args:
+            entity: 实体名称（rides/routes/drivers）
+            date: 日期，格式 YYYY-MM-DD
+            statuses: 状态过滤，多个用逗号分隔
+            columns: 只读取这些列（默认全部；按状态过滤时需包含status列）
+            
+        Returns:
+            记录列表，没有可用快照时返回None
+        """
+        if self.snapshots is None:
+            return None
+        
+        # 优先使用完整快照（本地按状态过滤），其次使用相同过滤条件的快照
+        if self.snapshots.has(entity, date, final=True):
+            scope = ''
+        elif statuses and self.snapshots.has(entity, date, final=True, statuses=statuses):
+            scope = statuses
+        else:
+            return None
+        
+        try:
+            records = self.snapshots.read_records(entity, date, columns=columns, statuses=scope)
+        except Exception as e:
+            logger.warning(f"读取 {entity} {date} 快照失败: {e}")
+            return None
+        
+        wanted = {s.strip() for s in statuses.split(',') if s.strip()}
+        if wanted and not scope:
+            records = [r for r in records if r.get('status') in wanted]
+        if entity == 'rides':
+            records = self._merge_rides(records)
+        
+        logger.info(f"✓ 从快照读取 {date} 的 {entity}: {len(records)} 条")
+        return records
+    
+    def iter_rides_for_range(self, start_date: str, end_date: str, per_page: int = 500,
+                             statuses: str = '', max_workers: int = None,
+                             use_snapshots: bool = False):
+        """
+        并发获取日期范围内每一天的订单，按完成顺序逐天返回
+        
+        调用方可以在第一天的数据到达后立即开始处理，无需等待整个范围下载完毕。
+        
+        Args:
+            start_date: 开始日期，格式 YYYY-MM-DD
+            end_date: 结束日期，格式 YYYY-MM-DD（包含）
+            per_page: 每页数量（最大500）
+            statuses: 订单状态过滤，多个用逗号分隔
+            max_workers: 同时获取的天数（默认 RANGE_DAY_WORKERS）
+            use_snapshots: 已结束的日期有快照时直接读取快照，不请求API；请求API获取的日期保存快照
+            
+        Yields:
+            (日期, 订单列表, 异常) - 获取成功时异常为None
+        """
+        start = datetime.strptime(start_date, '%Y-%m-%d')
+        end = datetime.strptime(end_date, '%Y-%m-%d')
+        if end < start:
+            raise ValueError("结束日期必须大于等于开始日期")
+        
+        dates = [(start + timedelta(days=i)).strftime('%Y-%m-%d')
+                 for i in range((end - start).days + 1)]
+        if use_snapshots:
+            remaining = []
+            for date in dates:
+                rides = self.load_snapshot('rides', date, statuses=statuses)
+                if rides is None:
+                    remaining.append(date)
+                else:
+                    yield date, rides, None
+            dates = remaining
+            if not dates:
+                return
+        
+        logger.info(f"开始获取 {start_date} 至 {end_date} 的订单数据（{len(dates)} 天并发）...")
+        
+        workers = min(max_workers or self.RANGE_DAY_WORKERS, len(dates))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(self.get_all_rides, date=date, per_page=per_page, statuses=statuses,
+                                snapshot=use_snapshots): date
+                for date in dates
+            }
+            for future in as_completed(futures):
+                date = futures[future]
+                try:
+                    yield date, future.result(), None
+                except Exception as e:
+                    logger.error(f"获取 {date} 的订单失败: {e}")
+                    yield date, [], e
+    
+    def fetch_rides_page(self, base_params: Dict[str, Any], page: int):
+        """
+        获取 /fleet/rides 的单页数据
+        
+        Args:
+            base_params: rides_query_params 构建的查询参数
+            page: 页码
+            
+        Returns:
+            (订单列表, 总数, 最后一页, 是否有下一页)
+        """
+        params = {'page': page, **base_params}
+        logger.info(f"正在获取第 {page} 页订单数据...")
+        response = self.api.get('/fleet/rides', params=params)
+        return self._parse_rides_page(response)
+    
+    def _get_rides_pages_serial(self, base_params: Dict[str, Any], progress_callback=None,
+                                on_page=None, failed: List[int] = None) -> List[Dict[str, Any]]:
+        """逐页获取订单数据，每页到达后调用 on_page(订单列表, 总数)，获取失败的页码追加到 failed"""
+        per_page = base_params['per_page']
         all_rides = []
         page = 1
         
         while True:
             try:
-                params = {
-                    'page': page,
-                    'per_page': per_page,
-                    'search': '',
-                    'sort_by': 'rides.pickup_at',
-                    'sort_by_type': 'false',
-                    'statuses': statuses,
-                    'all_rides': 'true',
-                    'from_datetime': f'{date}T00:00',
-                    'to_datetime': f'{date}T23:59',
-                    'filters': ''
-                }
+                rides, total, last_page, has_next = self.fetch_rides_page(base_params, page)
                 
-                logger.info(f"正在获取第 {page} 页订单数据...")
-                response = self.api.get('/fleet/rides', params=params)
+                if not rides:
+                    break
                 
-                # API返回格式: {"rides": {"data": [...], ...}}
-                if isinstance(response, dict):
-                    rides_data = response.get('rides', response.get('data', {}))
-                    
-                    if isinstance(rides_data, dict):
-                        rides = rides_data.get('data', [])
-                        total = rides_data.get('total', 0)
-                        last_page = rides_data.get('last_page')
-                        next_page_url = rides_data.get('next_page_url')
-                    else:
-                        rides = rides_data if isinstance(rides_data, list) else []
-                        total = len(all_rides) + len(rides)
-                        last_page = None
-                        next_page_url = None
-                    
-                    if not rides:
-                        break
-                    
-                    all_rides.extend(rides)
-                    logger.info(f"✓ 第 {page} 页: 获取 {len(rides)} 条订单 (累计: {len(all_rides)})")
-                    
-                    if progress_callback:
-                        progress_callback(len(all_rides), total if total > 0 else len(all_rides), f"第{page}页")
-                    
-                    # 检查是否还有下一页（优先使用next_page_url判断）
-                    if isinstance(rides_data, dict):
-                        if 'next_page_url' in rides_data and next_page_url is None:
-                            logger.info(f"没有更多订单数据")
-                            break
-                        if last_page is not None and page >= last_page:
-                            break
-                    
-                    if len(rides) < per_page:
-                        break
-                    
-                    page += 1
-                    time.sleep(0.2)
-                    
-                else:
+                all_rides.extend(rides)
+                logger.info(f"✓ 第 {page} 页: 获取 {len(rides)} 条订单 (累计: {len(all_rides)})")
+                if on_page:
+                    on_page(rides, total)
+                
+                if progress_callback:
+                    progress_callback(len(all_rides), total if total > 0 else len(all_rides), f"第{page}页")
+                
+                # 检查是否还有下一页（优先使用next_page_url判断）
+                if not has_next:
+                    logger.info(f"没有更多订单数据")
                     break
-                    
+                if last_page is not None and page >= last_page:
+                    break
+                
+                if len(rides) < per_page:
+                    break
+                
+                page += 1
+                
             except Exception as e:
                 logger.error(f"获取第 {page} 页订单失败: {e}")
+                if failed is not None:
+                    failed.append(page)
                 break
         
-        logger.info(f"✓ 完成！共获取 {len(all_rides)} 条订单数据")
         return all_rides
     
+    def iter_rides_pages(self, date: str = None, per_page: int = 500, statuses: str = '',
+                         max_workers: int = None, base_params: Dict[str, Any] = None,
+                         failed: List[int] = None):
+        """
+        逐页返回订单数据，每一页到达后立即交给调用方
+        
+        先获取第1页，根据返回的last_page并发获取剩余分页，按完成顺序返回；
+        服务器没有返回last_page时逐页获取。不同页之间可能有重复订单，由调用方去重。
+        
+        Args:
+            date: 日期，格式 YYYY-MM-DD（默认今天）
+            per_page: 每页数量（最大500）
+            statuses: 订单状态过滤，多个用逗号分隔
+            max_workers: 并发线程数（默认 RIDES_PAGE_WORKERS）
+            base_params: 已构建好的查询参数（提供时忽略date/per_page/statuses）
+            failed: 获取失败的页码追加到此列表（逐页获取时失败页之后的分页不再获取）
+            
+        Yields:
+            (页码, 订单列表, 总数)
+        """
+        if base_params is None:
+            base_params = self.rides_query_params(date or datetime.now().strftime('%Y-%m-%d'),
+                                                  per_page=per_page, statuses=statuses)
+        
+        try:
+            rides, total, last_page, has_next = self.fetch_rides_page(base_params, 1)
+        except Exception as e:
+            logger.error(f"获取第 1 页订单失败: {e}")
+            if failed is not None:
+                failed.append(1)
+            return
+        
+        if not rides:
+            return
+        
+        logger.info(f"✓ 第 1 页: 获取 {len(rides)} 条订单 (共 {last_page or 1} 页, {total} 条)")
+        yield 1, rides, total
+        
+        if not has_next:
+            return
+        
+        # 服务器没有返回last_page时无法预知页数，逐页获取
+        if last_page is None:
+            if len(rides) < base_params['per_page']:
+                return
+            logger.info("响应中没有last_page，改为逐页获取")
+            page = 2
+            while True:
+                try:
+                    rides, _, _, has_next = self.fetch_rides_page(base_params, page)
+                except Exception as e:
+                    logger.error(f"获取第 {page} 页订单失败: {e}")
+                    if failed is not None:
+                        failed.append(page)
+                    return
+                if not rides:
+                    return
+                logger.info(f"✓ 第 {page} 页: 获取 {len(rides)} 条订单")
+                yield page, rides, total
+                if not has_next or len(rides) < base_params['per_page']:
+                    return
+                page += 1
+        
+        if last_page <= 1:
+            return
+        
+        workers = min(max_workers or self.RIDES_PAGE_WORKERS, last_page - 1)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(self.fetch_rides_page, base_params, page): page
+                for page in range(2, last_page + 1)
+            }
+            for future in as_completed(futures):
+                page = futures[future]
+                try:
+                    page_rides = future.result()[0]
+                except Exception as e:
+                    logger.error(f"获取第 {page} 页订单失败: {e}")
+                    if failed is not None:
+                        failed.append(page)
+                    continue
+                
+                logger.info(f"✓ 第 {page} 页: 获取 {len(page_rides)} 条订单")
+                yield page, page_rides, total
+    
+    def _get_rides_pages_parallel(self, base_params: Dict[str, Any], progress_callback=None,
+                                  max_workers: int = None, on_page=None,
+                                  failed: List[int] = None) -> List[Dict[str, Any]]:
+        """先获取第1页，再并发获取剩余分页，每页到达后调用 on_page(订单列表, 总数)，获取失败的页码追加到 failed"""
+        pages = {}
+        fetched = 0
+        
+        for page, rides, total in self.iter_rides_pages(max_workers=max_workers, base_params=base_params,
+                                                        failed=failed):
+            pages[page] = rides
+            fetched += len(rides)
+            if on_page:
+                on_page(rides, total)
+            
+            if progress_callback:
+                progress_callback(fetched, total if total > 0 else fetched, f"第{page}页")
+        
+        # 按页码顺序拼接后去重，保证重复订单保留靠前页中的记录
+        ordered = [ride for page in sorted(pages) for ride in pages[page]]
+        return self._merge_rides(ordered)
+    
     def get_driver_detail(self, driver_id: int) -> Dict[str, Any]:
         """
         获取单个司机的详细信息
@@ -313,6 +804,31 @@ class RealAPIScraper:
             logger.error(f"获取司机 {driver_id} 详细信息失败: {e}")
             return None
     
+    def get_ride_detail(self, ride_id: int, updated_at: str = None) -> Dict[str, Any]:
+        """
+        获取单个订单的详细信息（优先使用本地缓存）
+        
+        Args:
+            ride_id: 订单ID
+            updated_at: 订单列表中的 updated_at，用于判断未结束订单的缓存是否失效
+            
+        Returns:
+            /fleet/rides/{id} 的完整响应，格式: {"ride": {...}}
+        """
+        return self.ride_cache.fetch(self.api, ride_id, updated_at)
+    
+    def get_ride_details(self, rides: List[Dict[str, Any]]) -> Dict[int, Any]:
+        """
+        批量获取订单详情：缓存命中的直接返回，其余在一个事件循环中并发请求
+        
+        Args:
+            rides: 订单列表（来自 get_all_rides，需包含 id 和 updated_at）
+            
+        Returns:
+            {订单ID: 详情响应或异常对象}
+        """
+        return self.ride_cache.fetch_many(self.api, rides)
+    
     def get_vehicle_detail(self, vehicle_id: int) -> Dict[str, Any]:
         """
         获取单个车辆的详细信息
@@ -332,93 +848,143 @@ class RealAPIScraper:
             logger.error(f"获取车辆 {vehicle_id} 详细信息失败: {e}")
             return None
     
-    def get_all_drivers_with_full_details(self, per_page: int = 100, progress_callback=None) -> List[Dict[str, Any]]:
+    def _enrich_driver(self, driver: Dict[str, Any], journal: ScrapeJournal = None) -> Dict[str, Any]:
+        """
+        获取单个司机的详细信息及其第一辆车的详细信息
+        
+        Args:
+            driver: 司机基本信息
+            journal: 断点日志（已完成的司机直接返回记录的结果，完整获取后记录）
+            
+        Returns:
+            合并后的司机信息（获取失败时返回基本信息）
+        """
+        driver_id = driver.get('id')
+        if not driver_id:
+            return driver
+        
+        if journal is not None and journal.has_detail('driver_full', driver_id):
+            return journal.detail('driver_full', driver_id)
+        
+        # 获取司机详细信息（包含证件信息）
+        driver_detail = self.get_driver_detail(driver_id)
+        if not driver_detail:
+            return driver
+        
+        # 合并基本信息和详细信息
+        merged_driver = {**driver, **driver_detail}
+        
+        # 获取车辆详细信息 - API返回的是'cars'而不是'vehicles'
+        cars = merged_driver.get('cars', []) or merged_driver.get('vehicles', [])
+        if cars and isinstance(cars, list):
+            car = cars[0]
+            vehicle_id = car.get('id') if isinstance(car, dict) else None
+            
+            if vehicle_id:
+                vehicle_detail = self.get_vehicle_detail(vehicle_id)
+                if vehicle_detail:
+                    # 将车辆详细信息添加到司机信息中
+                    merged_driver['vehicle_detail'] = vehicle_detail
+                else:
+                    # 车辆详情缺失时不记录断点，下次继续时重新获取
+                    logger.warning(f"  ✗ 车辆 {vehicle_id} 详情获取失败")
+                    return merged_driver
+        else:
+            logger.warning(f"  司机 {driver_id} 没有关联的车辆")
+        
+        if journal is not None:
+            journal.record_detail('driver_full', driver_id, merged_driver)
+        return merged_driver
+    
+    def get_all_drivers_with_full_details(self, per_page: int = 100, progress_callback=None,
+                                          resume: bool = True) -> List[Dict[str, Any]]:
         """
         获取所有司机数据及其完整的详细信息（包括证件、车辆等）
         
         Args:
             per_page: 每页数量
             progress_callback: 进度回调函数
+            resume: 是否使用断点（中断后重新运行时跳过已完成的分页和司机）
             
         Returns:
             包含完整详细信息的司机列表
         """
         logger.info("开始爬取司机完整详细信息...")
+        journal = ScrapeJournal('driver_full_details') if resume else None
         
         # 第一步：获取所有司机基本信息
-        all_drivers = self.get_all_drivers(per_page=per_page, progress_callback=progress_callback)
+        all_drivers = self.get_all_drivers(per_page=per_page, progress_callback=progress_callback, journal=journal)
         logger.info(f"✓ 获取到 {len(all_drivers)} 位司机的基本信息")
         
         if not all_drivers:
+            if journal is not None:
+                journal.close()
             return []
         
-        # 第二步：逐个获取司机详细信息
-        detailed_drivers = []
+        # 第二步：并发获取司机详细信息，每位司机的详情返回后立即获取其车辆详情
         total = len(all_drivers)
+        detailed_drivers = [None] * total
         
-        logger.info(f"开始获取每位司机的详细信息（包括证件、车辆等）...")
+        logger.info(f"开始获取每位司机的详细信息（包括证件、车辆等，{self.DRIVER_DETAIL_WORKERS} 个并发）...")
         
-        for idx, driver in enumerate(all_drivers, 1):
-            try:
-                driver_id = driver.get('id')
-                if not driver_id:
-                    detailed_drivers.append(driver)
-                    continue
-                
-                # 获取司机详细信息（包含证件信息）
-                driver_detail = self.get_driver_detail(driver_id)
-                
-                if driver_detail:
-                    # 合并基本信息和详细信息
-                    merged_driver = {**driver, **driver_detail}
-                    
-                    # 获取车辆详细信息 - API返回的是'cars'而不是'vehicles'
-                    cars = merged_driver.get('cars', []) or merged_driver.get('vehicles', [])
-                    if cars and isinstance(cars, list) and len(cars) > 0:
-                        car = cars[0]
-                        vehicle_id = car.get('id') if isinstance(car, dict) else None
-                        
-                        if vehicle_id:
-                            logger.info(f"  获取车辆 {vehicle_id} 的详细信息...")
-                            vehicle_detail = self.get_vehicle_detail(vehicle_id)
-                            if vehicle_detail:
-                                # 将车辆详细信息添加到司机信息中
-                                merged_driver['vehicle_detail'] = vehicle_detail
-                                logger.info(f"  ✓ 车辆信息已获取")
-                            else:
-                                logger.warning(f"  ✗ 车辆 {vehicle_id} 详情获取失败")
-                    else:
-                        logger.warning(f"  司机 {driver_id} 没有关联的车辆")
-                    
-                    detailed_drivers.append(merged_driver)
-                else:
-                    detailed_drivers.append(driver)
+        with ThreadPoolExecutor(max_workers=min(self.DRIVER_DETAIL_WORKERS, total)) as executor:
+            futures = {
+                executor.submit(self._enrich_driver, driver, journal): idx
+                for idx, driver in enumerate(all_drivers)
+            }
+            for done, future in enumerate(as_completed(futures), 1):
+                idx = futures[future]
+                try:
+                    detailed_drivers[idx] = future.result()
+                except Exception as e:
+                    logger.error(f"处理司机 {all_drivers[idx].get('id')} 时出错: {e}")
+                    detailed_drivers[idx] = all_drivers[idx]
                 
                 # 每处理10条数据记录一次日志
-                if idx % 10 == 0 or idx == total:
-                    logger.info(f"进度: {idx}/{total} ({idx*100//total}%)")
+                if done % 10 == 0 or done == total:
+                    logger.info(f"进度: {done}/{total} ({done*100//total}%)")
                     if progress_callback:
-                        progress_callback(idx, total, f"获取详情 {idx}/{total}")
-                
-                # 避免请求过快
-                time.sleep(0.3)
-                
-            except Exception as e:
-                logger.error(f"处理司机 {driver.get('id')} 时出错: {e}")
-                detailed_drivers.append(driver)
+                        progress_callback(done, total, f"获取详情 {done}/{total}")
+        
+        if journal is not None:
+            self._finish_journal(journal, ['drivers'],
+                                 [('driver_full', d.get('id')) for d in all_drivers if d.get('id')])
         
         logger.info(f"✓ 完成！成功获取 {len(detailed_drivers)} 位司机的完整详细信息")
         return detailed_drivers
     
+    @staticmethod
+    def _finish_journal(journal: ScrapeJournal, entities: List[str], details: List[tuple]):
+        """
+        所有分页和详情都已完成时清除断点，否则保留断点供下次继续
+        
+        Args:
+            journal: 断点日志
+            entities: 需要完整获取的分页实体
+            details: 需要完成的详情 [(实体, 键), ...]
+        """
+        missing_pages = [entity for entity in entities if not journal.is_complete(entity)]
+        missing_details = sum(1 for entity, key in details if not journal.has_detail(entity, key))
+        if not missing_pages and not missing_details:
+            journal.finish()
+            return
+        
+        journal.close()
+        logger.warning(f"爬取未全部完成（未完成分页: {missing_pages or '无'}, 未完成详情: {missing_details} 条），"
+                       f"已保存断点，重新运行将从断点继续")
+    
     def scrape_all_data(self, get_driver_details: bool = False, date: str = None,
-                        progress_callback=None) -> Dict[str, Any]:
+                        progress_callback=None, resume: bool = True) -> Dict[str, Any]:
         """
         爬取所有数据
         
+        每完成一页或一位司机的详情就写入断点日志，中断后重新运行时跳过已完成的部分。
+        
         Args:
             get_driver_details: 是否获取每个司机的详细信息（会很慢）
             date: 路线日期
             progress_callback: 进度回调
+            resume: 是否使用断点
             
         Returns:
             包含所有数据的字典
@@ -427,6 +993,9 @@ class RealAPIScraper:
         logger.info("开始爬取所有数据")
         logger.info("=" * 70)
         
+        route_date = date or datetime.now().strftime('%Y-%m-%d')
+        journal = ScrapeJournal(f"scrape_all_{route_date}") if resume else None
+        
         result = {
             'timestamp': datetime.now().isoformat(),
             'drivers': [],
@@ -438,7 +1007,7 @@ class RealAPIScraper:
         if progress_callback:
             progress_callback(0, 2, "正在爬取司机数据...")
         
-        result['drivers'] = self.get_all_drivers(progress_callback=progress_callback)
+        result['drivers'] = self.get_all_drivers(progress_callback=progress_callback, journal=journal)
         result['metadata']['total_drivers'] = len(result['drivers'])
         
         # 2. 如果需要详细信息，逐个获取
@@ -449,7 +1018,12 @@ class RealAPIScraper:
             for i, driver in enumerate(result['drivers'], 1):
                 driver_id = driver.get('id')
                 if driver_id:
-                    detail = self.get_driver_detail(driver_id)
+                    if journal is not None and journal.has_detail('driver_detail', driver_id):
+                        detail = journal.detail('driver_detail', driver_id)
+                    else:
+                        detail = self.get_driver_detail(driver_id)
+                        if detail and journal is not None:
+                            journal.record_detail('driver_detail', driver_id, detail)
                     if detail:
                         combined = {**driver, **detail}
                         detailed_drivers.append(combined)
@@ -458,8 +1032,6 @@ class RealAPIScraper:
                     
                     if i % 10 == 0:
                         logger.info(f"已获取 {i}/{len(result['drivers'])} 位司机的详细信息")
-                    
-                    time.sleep(0.1)
             
             result['drivers'] = detailed_drivers
         
@@ -467,9 +1039,15 @@ class RealAPIScraper:
         if progress_callback:
             progress_callback(1, 2, "正在爬取路线数据...")
         
-        result['routes'] = self.get_all_routes(date=date, progress_callback=progress_callback)
+        result['routes'] = self.get_all_routes(date=route_date, progress_callback=progress_callback, journal=journal)
         result['metadata']['total_routes'] = len(result['routes'])
-        result['metadata']['route_date'] = date or datetime.now().strftime('%Y-%m-%d')
+        result['metadata']['route_date'] = route_date
+        
+        if journal is not None:
+            details = []
+            if get_driver_details:
+                details = [('driver_detail', d.get('id')) for d in result['drivers'] if d.get('id')]
+            self._finish_journal(journal, ['drivers', 'routes'], details)
         
         logger.info("=" * 70)
         logger.info("数据爬取完成！")
@@ -0,0 +1,263 @@
+"""
+订单详情缓存 - 将 /fleet/rides/{id} 的详情持久化到本地SQLite
+已结束的订单（finished/no_show/driver_canceled）不会再变化，直接从缓存返回；
+其他状态的订单仅在列表中的 updated_at 发生变化时才重新获取。
+"""
+
+import atexit
+import json
+import os
+import sqlite3
+import threading
+import time
+import logging
+from typing import Dict, Any, List, Optional
+import config
+
+logger = logging.getLogger(__name__)
+
+# 命中时最多每隔多少秒更新一次访问时间（只用于淘汰排序，不需要精确）
+TOUCH_INTERVAL = 300
+
+# 写入累积多少条或多少秒后提交一次
+COMMIT_BATCH = 200
+COMMIT_INTERVAL = 2.0
+
+
+class RideDetailCache:
+    """订单详情本地缓存（按订单ID和updated_at失效）"""
+
+    # 不会再发生变化的订单状态
+    TERMINAL_STATUSES = {'finished', 'no_show', 'driver_canceled'}
+
+    def __init__(self, db_path: str = None, max_entries: int = 50000):
+        """
+        初始化缓存
+
+        Args:
+            db_path: SQLite文件路径（默认 DATA_DIR/ride_detail_cache.db）
+            max_entries: 最多缓存的订单数，超出后按最近访问时间淘汰
+        """
+        if db_path is None:
+            if not os.path.exists(config.DATA_DIR):
+                os.makedirs(config.DATA_DIR)
+            db_path = os.path.join(config.DATA_DIR, "ride_detail_cache.db")
+
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        # WAL模式下提交不需要每次同步整个数据库文件，其他进程读取时也不会被写入阻塞
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS ride_details (
+                ride_id INTEGER PRIMARY KEY,
+                status TEXT,
+                updated_at TEXT,
+                payload TEXT NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_ride_details_accessed ON ride_details (accessed_at)"
+        )
+        self._conn.commit()
+        # 缓存条数只在启动时统计一次，之后随写入/淘汰增减
+        self._count = self._conn.execute("SELECT COUNT(*) FROM ride_details").fetchone()[0]
+        # 未提交的写入数和上次提交时间，写入按批提交
+        self._pending = 0
+        self._committed_at = time.monotonic()
+        atexit.register(self.flush)
+
+    @staticmethod
+    def _ride_of(payload: Dict[str, Any]) -> Dict[str, Any]:
+        """从详情响应中取出订单本体 - API返回格式: {"ride": {...}}"""
+        ride = payload.get('ride') if isinstance(payload, dict) else None
+        return ride if isinstance(ride, dict) else (payload or {})
+
+    def get(self, ride_id: int, updated_at: str = None) -> Optional[Dict[str, Any]]:
+        """
+        读取缓存的订单详情
+
+        Args:
+            ride_id: 订单ID
+            updated_at: 列表接口返回的 updated_at，用于判断非终态订单是否已变化
+
+        Returns:
+            缓存的详情响应，未命中或已失效时返回None
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status, updated_at, payload, accessed_at FROM ride_details WHERE ride_id = ?",
+                (ride_id,)
+            ).fetchone()
+
+            if row is not None:
+                status, cached_updated_at, payload, accessed_at = row
+                if status in self.TERMINAL_STATUSES or (updated_at and updated_at == cached_updated_at):
+                    now = time.time()
+                    if now - accessed_at >= TOUCH_INTERVAL:
+                        self._conn.execute(
+                            "UPDATE ride_details SET accessed_at = ? WHERE ride_id = ?",
+                            (now, ride_id)
+                        )
+                        self._written()
+                    self.hits += 1
+                    return json.loads(payload)
+
+            self.misses += 1
+            return None
+
+    def put(self, ride_id: int, payload: Dict[str, Any], updated_at: str = None):
+        """
+        写入订单详情
+
+        Args:
+            ride_id: 订单ID
+            payload: /fleet/rides/{id} 的完整响应
+            updated_at: 列表接口返回的 updated_at（没有时使用详情中的值）
+        """
+        ride = self._ride_of(payload)
+        status = ride.get('status', '')
+        updated_at = updated_at or ride.get('updated_at')
+
+        values = (status, updated_at, json.dumps(payload, ensure_ascii=False), time.time(), ride_id)
+        with self._lock:
+            # 已缓存的订单直接更新，只有新订单才增加条数
+            updated = self._conn.execute(
+                "UPDATE ride_details SET status = ?, updated_at = ?, payload = ?, accessed_at = ? WHERE ride_id = ?",
+                values
+            ).rowcount
+            if not updated:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO ride_details (status, updated_at, payload, accessed_at, ride_id) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    values
+                )
+                self._count += 1
+                if self._count > self.max_entries:
+                    self._evict()
+            self._written()
+
+    def _written(self):
+        """记录一次写入，累积到一定数量或时间后提交（调用方需持有锁）"""
+        self._pending += 1
+        if self._pending >= COMMIT_BATCH or time.monotonic() - self._committed_at >= COMMIT_INTERVAL:
+            self._commit()
+
+    def _commit(self):
+        """提交未提交的写入（调用方需持有锁）"""
+        self._conn.commit()
+        self._pending = 0
+        self._committed_at = time.monotonic()
+
+    def flush(self):
+        """立即提交所有未提交的写入（退出时自动调用）"""
+        with self._lock:
+            if self._pending:
+                self._commit()
+
+    def _evict(self):
+        """超出容量时淘汰最久未访问的订单（调用方需持有锁）"""
+        # 其他进程（如批量核查脚本）也可能写入同一个缓存文件，淘汰前重新统计
+        self._count = self._conn.execute("SELECT COUNT(*) FROM ride_details").fetchone()[0]
+        if self._count <= self.max_entries:
+            return
+        # 一次淘汰到容量的90%，之后的写入不需要每次都淘汰
+        overflow = self._count - (self.max_entries - self.max_entries // 10)
+        self._conn.execute(
+            "DELETE FROM ride_details WHERE ride_id IN "
+            "(SELECT ride_id FROM ride_details ORDER BY accessed_at LIMIT ?)",
+            (overflow,)
+        )
+        self._count -= overflow
+        logger.info(f"订单详情缓存淘汰 {overflow} 条记录")
+
+    def fetch(self, api, ride_id: int, updated_at: str = None) -> Dict[str, Any]:
+        """
+        优先从缓存读取订单详情，未命中时请求API并写入缓存
+
+        Args:
+            api: API客户端
+            ride_id: 订单ID
+            updated_at: 列表接口返回的 updated_at
+
+        Returns:
+            /fleet/rides/{id} 的完整响应
+        """
+        cached = self.get(ride_id, updated_at)
+        if cached is not None:
+            return cached
+
+        payload = api.get(f'/fleet/rides/{ride_id}')
+        self.put(ride_id, payload, updated_at)
+        return payload
+
+    def fetch_many(self, api, rides: List[Dict[str, Any]], max_concurrency: int = None) -> Dict[int, Any]:
+        """
+        批量读取订单详情：缓存命中的直接返回，其余用异步客户端在一个事件循环中并发请求
+
+        Args:
+            api: API客户端（异步客户端共用它的Token和限速器）
+            rides: 订单列表，每项需包含 id（可选 updated_at）
+            max_concurrency: 同时进行的请求数（默认 ASYNC_MAX_CONCURRENCY）
+
+        Returns:
+            {订单ID: 详情响应或异常对象}
+        """
+        from async_api_client import AsyncAPIClient
+
+        details = {}
+        missing = []
+        for ride in rides:
+            ride_id = ride.get('id')
+            if ride_id is None:
+                continue
+            cached = self.get(ride_id, ride.get('updated_at'))
+            if cached is not None:
+                details[ride_id] = cached
+            else:
+                missing.append(ride)
+
+        if not missing:
+            return details
+
+        if not AsyncAPIClient.is_available():
+            logger.warning("未安装aiohttp，逐个获取订单详情")
+            for ride in missing:
+                try:
+                    details[ride['id']] = self.fetch(api, ride['id'], ride.get('updated_at'))
+                except Exception as e:
+                    details[ride['id']] = e
+            return details
+
+        logger.info(f"并发获取 {len(missing)} 条订单详情...")
+        async_client = AsyncAPIClient.from_client(api, max_concurrency=max_concurrency)
+        results = async_client.run_get_many([f"/fleet/rides/{ride['id']}" for ride in missing])
+        for ride, result in zip(missing, results):
+            if not isinstance(result, Exception):
+                self.put(ride['id'], result, ride.get('updated_at'))
+            details[ride['id']] = result
+
+        return details
+
+    def reset_stats(self):
+        """重置命中统计"""
+        self.hits = 0
+        self.misses = 0
+
+    def summary(self) -> str:
+        """命中统计摘要"""
+        total = self.hits + self.misses
+        rate = self.hits * 100 / total if total else 0
+        return f"命中 {self.hits} / 未命中 {self.misses} (命中率 {rate:.1f}%)"
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._conn.execute("DELETE FROM ride_details")
+            self._commit()
+            self._count = 0
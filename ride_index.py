@@ -0,0 +1,125 @@
+"""
+订单索引 - 对一次获取的订单列表建立内存索引
+上车时间（本地时间）解析一次后按时间排序，时间段查询用二分查找；
+另按司机ID、状态建立哈希索引，"某司机在某时间段的订单"只需 O(log n + k)。
+"""
+
+import logging
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from time_utils import parse_local_series
+
+logger = logging.getLogger(__name__)
+
+
+def _epoch(value: datetime) -> int:
+    return int(np.datetime64(value, 's').astype(np.int64))
+
+
+class RideIndex:
+    """订单列表的只读索引（建立后不随订单变化更新，需要时重新建立）"""
+    
+    def __init__(self, rides: List[Dict[str, Any]], field: str = 'pickup_at'):
+        """
+        Args:
+            rides: 订单列表（如 get_all_rides 的结果）
+            field: 上车时间字段
+        """
+        self.rides = list(rides)
+        
+        local = parse_local_series([ride.get(field) for ride in self.rides])
+        timed = local.notna().to_numpy()
+        epochs = local.to_numpy(dtype='datetime64[s]').astype(np.int64)
+        
+        # 有上车时间的订单按时间排序（同一时间保持原有顺序）
+        positions = np.flatnonzero(timed)
+        order = positions[np.argsort(epochs[positions], kind='stable')]
+        self._order = order
+        self._epochs = epochs[order]
+        self._untimed = np.flatnonzero(~timed)
+        
+        # 每位司机各自按时间排序的 (时间, 位置)
+        driver_positions: Dict[str, List[int]] = {}
+        for position in order.tolist():
+            driver_positions.setdefault(self._driver_key(self.rides[position].get('driver_id')), []).append(position)
+        self._by_driver = {
+            key: (epochs[np.asarray(found, dtype=np.int64)], np.asarray(found, dtype=np.int64))
+            for key, found in driver_positions.items()
+        }
+        self._untimed_by_driver: Dict[str, List[int]] = {}
+        for position in self._untimed.tolist():
+            self._untimed_by_driver.setdefault(self._driver_key(self.rides[position].get('driver_id')), []).append(position)
+        
+        # 每条订单在排序结果中的名次，用于合并多个状态的结果
+        ranked = np.concatenate([order, self._untimed])
+        self._rank = np.empty(len(self.rides), dtype=np.int64)
+        self._rank[ranked] = np.arange(len(ranked))
+        
+        self._by_status: Dict[str, List[int]] = {}
+        for position in ranked.tolist():
+            self._by_status.setdefault(self.rides[position].get('status'), []).append(position)
+    
+    @staticmethod
+    def _driver_key(driver_id) -> str:
+        """司机ID统一按字符串比较（界面输入的ID是字符串，API返回的是整数）"""
+        return '' if driver_id is None else str(driver_id)
+    
+    def __len__(self) -> int:
+        return len(self.rides)
+    
+    def _select(self, positions: Iterable[int], statuses: Optional[Iterable[str]]) -> List[Dict[str, Any]]:
+        rides = [self.rides[position] for position in positions]
+        if statuses:
+            wanted = set(statuses)
+            rides = [ride for ride in rides if ride.get('status') in wanted]
+        return rides
+    
+    def between(self, start: datetime, end: datetime, driver_id=None,
+                statuses: Optional[Iterable[str]] = None, include_untimed: bool = False) -> List[Dict[str, Any]]:
+        """
+        上车时间在 [start, end) 之间的订单（按上车时间排序）
+        
+        Args:
+            start: 开始（本地时间，不带时区），可由 day_window() 构建
+            end: 结束（不包含）
+            driver_id: 只返回该司机的订单
+            statuses: 只返回这些状态的订单
+            include_untimed: 是否在末尾附上没有上车时间的订单
+        
+        Returns:
+            订单列表
+        """
+        if driver_id is not None:
+            key = self._driver_key(driver_id)
+            epochs, positions = self._by_driver.get(key, (self._epochs[:0], self._order[:0]))
+            untimed = self._untimed_by_driver.get(key, [])
+        else:
+            epochs, positions = self._epochs, self._order
+            untimed = self._untimed.tolist()
+        
+        low = np.searchsorted(epochs, _epoch(start), side='left')
+        high = np.searchsorted(epochs, _epoch(end), side='left')
+        found = positions[low:high].tolist()
+        if include_untimed:
+            found += untimed
+        return self._select(found, statuses)
+    
+    def for_driver(self, driver_id, statuses: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
+        """司机的所有订单（有上车时间的按时间排序，没有的在末尾）"""
+        key = self._driver_key(driver_id)
+        timed = self._by_driver.get(key)
+        found = timed[1].tolist() if timed is not None else []
+        found += self._untimed_by_driver.get(key, [])
+        return self._select(found, statuses)
+    
+    def with_status(self, *statuses: str) -> List[Dict[str, Any]]:
+        """指定状态的订单（按上车时间排序，没有上车时间的在末尾）"""
+        found = []
+        for status in statuses:
+            found.extend(self._by_status.get(status, []))
+        if len(statuses) > 1:
+            found.sort(key=self._rank.__getitem__)
+        return [self.rides[position] for position in found]
@@ -0,0 +1,187 @@
+"""
+订单增量同步 - 在内存中维护当天订单的副本
+首次全量获取，之后按 updated_at 倒序只拉取上次同步后发生变化的订单，
+到达上次的高水位线即停止翻页，每次轮询只传输少量数据。
+"""
+
+import threading
+import time
+import logging
+from datetime import datetime
+from typing import List, Dict, Any, Optional
+
+from ride_index import RideIndex
+
+logger = logging.getLogger(__name__)
+
+
+class RideSync:
+    """当天订单的增量同步副本"""
+    
+    def __init__(self, scraper, date: str = None, per_page: int = 100,
+                 full_resync_interval: int = 600, max_delta_pages: int = 5):
+        """
+        初始化同步器
+        
+        Args:
+            scraper: RealAPIScraper实例
+            date: 同步的日期，格式 YYYY-MM-DD（默认今天，跨天时自动切换）
+            per_page: 增量查询每页数量
+            full_resync_interval: 全量校准间隔（秒），用于清理被删除或移出当天的订单
+            max_delta_pages: 增量查询最多翻页数，超出时改为全量同步
+        """
+        self.scraper = scraper
+        self.fixed_date = date
+        self.per_page = per_page
+        self.full_resync_interval = full_resync_interval
+        self.max_delta_pages = max_delta_pages
+        
+        self.date = None
+        self.high_water_mark = ''
+        self.last_sync = 0.0
+        self.last_full_sync = 0.0
+        self._rides = {}
+        self._lock = threading.RLock()
+        
+        # 副本每次变化时递增，索引只在副本变化后重建
+        self._version = 0
+        self._index = None
+        self._index_version = -1
+    
+    def _current_date(self) -> str:
+        """当前同步的日期"""
+        return self.fixed_date or datetime.now().strftime('%Y-%m-%d')
+    
+    def refresh(self) -> List[Dict[str, Any]]:
+        """
+        同步一次
+        
+        Returns:
+            本次新增或发生变化的订单
+        
+        Raises:
+            获取订单失败或不完整时抛出异常，副本保持上次同步的状态
+        """
+        with self._lock:
+            date = self._current_date()
+            if (date != self.date or not self.high_water_mark
+                    or time.time() - self.last_full_sync >= self.full_resync_interval):
+                return self._full_sync(date)
+            return self._delta_sync()
+    
+    def rides(self, statuses: str = '', max_age: float = 0) -> List[Dict[str, Any]]:
+        """
+        读取副本中的订单
+        
+        Args:
+            statuses: 订单状态过滤，多个用逗号分隔，空字符串表示所有状态
+            max_age: 副本最长有效时间（秒），超过时先同步一次；0表示总是同步
+        
+        Returns:
+            按pickup_at排序的订单列表
+        """
+        with self._lock:
+            if not self.last_sync or time.time() - self.last_sync >= max_age:
+                self.refresh()
+            
+            wanted = {s.strip() for s in statuses.split(',') if s.strip()}
+            rides = [r for r in self._rides.values() if not wanted or r.get('status') in wanted]
+        
+        rides.sort(key=lambda r: r.get('pickup_at') or '')
+        return rides
+    
+    def index(self, max_age: float = 0) -> RideIndex:
+        """
+        副本的订单索引（按上车时间、司机ID、状态查询）
+        
+        Args:
+            max_age: 副本最长有效时间（秒），超过时先同步一次；0表示总是同步
+        
+        Returns:
+            RideIndex，副本没有变化时返回上次建立的索引
+        """
+        with self._lock:
+            if not self.last_sync or time.time() - self.last_sync >= max_age:
+                self.refresh()
+            
+            if self._index is None or self._index_version != self._version:
+                self._index = RideIndex(self._rides.values())
+                self._index_version = self._version
+            return self._index
+    
+    def has_date(self, date: str) -> bool:
+        """副本是否已同步过该日期的订单"""
+        with self._lock:
+            return bool(self.last_sync) and self.date == date
+    
+    def _apply(self, rides: List[Dict[str, Any]]):
+        """合并订单到副本并推进高水位线"""
+        changed = False
+        for ride in rides:
+            ride_id = ride.get('id')
+            if ride_id is None:
+                continue
+            if self._rides.get(ride_id) != ride:
+                self._rides[ride_id] = ride
+                changed = True
+            updated_at = ride.get('updated_at') or ''
+            if updated_at > self.high_water_mark:
+                self.high_water_mark = updated_at
+        if changed:
+            self._version += 1
+        self.last_sync = time.time()
+    
+    def _full_sync(self, date: str) -> List[Dict[str, Any]]:
+        """全量获取当天所有状态的订单"""
+        logger.info(f"订单同步: 全量获取 {date} 的订单")
+        # 有分页失败时抛出异常，不用不完整的结果替换现有副本（下次同步时重试）
+        rides = self.scraper.get_all_rides(date=date, per_page=500, statuses='', strict=True)
+        
+        self.date = date
+        self.high_water_mark = ''
+        self._rides = {}
+        self._version += 1
+        self._apply(rides)
+        self.last_full_sync = self.last_sync
+        return rides
+    
+    def _delta_sync(self) -> List[Dict[str, Any]]:
+        """按updated_at倒序获取，遇到不晚于高水位线的订单即停止"""
+        params = self.scraper.rides_query_params(
+            self.date,
+            per_page=self.per_page,
+            statuses='',
+            sort_by='rides.updated_at',
+            sort_by_type='true'
+        )
+        
+        changed = []
+        for page in range(1, self.max_delta_pages + 1):
+            rides, _, last_page, has_next = self.scraper.fetch_rides_page(params, page)
+            if not rides:
+                break
+            
+            stamps = [r.get('updated_at') or '' for r in rides]
+            if stamps != sorted(stamps, reverse=True):
+                # 服务器没有按updated_at排序，无法判断停止位置
+                logger.warning("订单同步: 服务器未按updated_at排序，改为全量同步")
+                return self._full_sync(self.date)
+            
+            # 与高水位线相同的订单也重新合并，避免漏掉同一秒内的更新
+            fresh = [r for r in rides if (r.get('updated_at') or '') >= self.high_water_mark]
+            changed.extend(fresh)
+            
+            if len(fresh) < len(rides) or not has_next or (last_page is not None and page >= last_page):
+                break
+        else:
+            logger.info("订单同步: 变化的订单过多，改为全量同步")
+            return self._full_sync(self.date)
+        
+        self._apply(changed)
+        logger.info(f"订单同步: {len(changed)} 条订单有变化 (副本共 {len(self._rides)} 条)")
+        return changed
+    
+    def get(self, ride_id: int) -> Optional[Dict[str, Any]]:
+        """按ID读取副本中的订单"""
+        with self._lock:
+            return self._rides.get(ride_id)
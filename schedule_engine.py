@@ -0,0 +1,163 @@
+"""
+排班分析 - 路线时间只解析一次为epoch秒，按司机排序后一次扫描算出
+总工时、最早开工/最晚收工、路线重叠和空档时间。
+数千条路线、多天的排班报表也无需对同一时间字符串反复解析。
+"""
+
+import logging
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def parse_epoch(value: str) -> Optional[float]:
+    """
+    将时间字符串解析为epoch秒
+    
+    ISO格式（含 Z / 时区偏移 / 小数秒）直接用 fromisoformat 解析，
+    其他格式再交给 dateutil；不带时区的时间按UTC处理，保证同一批数据之间可以比较。
+    
+    Returns:
+        epoch秒，空值或无法解析时返回None
+    """
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        try:
+            from dateutil import parser
+            parsed = parser.parse(value)
+        except (TypeError, ValueError, OverflowError):
+            return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+class DriverSchedule:
+    """单个司机的路线区间"""
+    
+    __slots__ = ('intervals', 'routes')
+    
+    def __init__(self):
+        # [(开始epoch, 结束epoch, 开始时间字符串, 结束时间字符串)]
+        self.intervals = []
+        self.routes = []
+    
+    def add(self, route_info: Dict[str, Any], start: Optional[float], end: Optional[float]):
+        self.routes.append(route_info)
+        if start is not None and end is not None:
+            self.intervals.append((start, end, route_info['from_time'], route_info['to_time']))
+    
+    def analyze(self) -> Dict[str, Any]:
+        """
+        按开始时间排序后一次扫描
+        
+        Returns:
+            total_hours: 各路线时长之和
+            start_time / end_time: 最早开始、最晚结束的原始时间字符串
+            overlap_count: 与之前路线时间重叠的路线数
+            overlap_hours: 重叠部分的时长（总工时 - 实际覆盖时长）
+            gap_hours: 最早开始到最晚结束之间没有任何路线的空档时长
+        """
+        stats = {
+            'total_hours': 0,
+            'start_time': None,
+            'end_time': None,
+            'overlap_count': 0,
+            'overlap_hours': 0,
+            'gap_hours': 0
+        }
+        if not self.intervals:
+            return stats
+        
+        # 同一开始时间保持原有顺序（与逐条比较时先出现者优先一致）
+        intervals = sorted(self.intervals, key=lambda interval: interval[0])
+        
+        total = 0.0
+        covered = 0.0
+        gaps = 0.0
+        first_start, _, first_from, _ = intervals[0]
+        run_start = first_start
+        run_end = None
+        overlap_count = 0
+        
+        for start, end, _, _ in intervals:
+            total += end - start
+            # 结束早于开始的异常路线计入总工时（与原统计一致），但不覆盖任何时间
+            end = max(end, start)
+            
+            if run_end is None:
+                run_end = end
+            elif start < run_end:
+                overlap_count += 1
+                run_end = max(run_end, end)
+            else:
+                covered += run_end - run_start
+                gaps += start - run_end
+                run_start, run_end = start, end
+        covered += run_end - run_start
+        
+        # 最晚结束的路线按原始顺序取第一条
+        latest_to = max(self.intervals, key=lambda interval: interval[1])[3]
+        
+        stats['total_hours'] = total / 3600
+        stats['start_time'] = first_from
+        stats['end_time'] = latest_to
+        stats['overlap_count'] = overlap_count
+        stats['overlap_hours'] = max(total - covered, 0) / 3600
+        stats['gap_hours'] = gaps / 3600
+        return stats
+
+
+def build_driver_schedules(routes: List[Dict[str, Any]], date: str = None,
+                           name_for: Optional[Callable[[Any], str]] = None) -> List[Dict[str, Any]]:
+    """
+    按司机汇总排班
+    
+    Args:
+        routes: 路线列表（含 driver_id、from_datetime、to_datetime），可以包含多天
+        date: 报表日期（写入每位司机的 date 字段）
+        name_for: 司机姓名函数 name_for(driver_id)，默认 "司机{driver_id}"
+    
+    Returns:
+        每位司机一个字典（按司机第一条路线出现的顺序）：
+        driver_id, driver_name, date, routes, total_hours, start_time, end_time,
+        overlap_count, overlap_hours, gap_hours
+    """
+    drivers: Dict[Any, DriverSchedule] = {}
+    
+    for route in routes:
+        driver_id = route.get('driver_id')
+        if not driver_id:
+            continue
+        
+        schedule = drivers.get(driver_id)
+        if schedule is None:
+            schedule = drivers[driver_id] = DriverSchedule()
+        
+        from_dt = route.get('from_datetime', '')
+        to_dt = route.get('to_datetime', '')
+        schedule.add({
+            'route_id': route.get('id'),
+            'from_time': from_dt,
+            'to_time': to_dt,
+            'status': route.get('status')
+        }, parse_epoch(from_dt), parse_epoch(to_dt))
+    
+    result = []
+    for driver_id, schedule in drivers.items():
+        driver_name = name_for(driver_id) if name_for else f"司机{driver_id}"
+        entry = {
+            'driver_id': driver_id,
+            'driver_name': (driver_name or f"司机{driver_id}").strip(),
+            'date': date,
+            'routes': schedule.routes
+        }
+        entry.update(schedule.analyze())
+        result.append(entry)
+    
+    logger.info(f"排班分析: {len(routes)} 条路线, {len(result)} 位司机")
+    return result
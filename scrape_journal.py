@@ -0,0 +1,167 @@
+"""
+爬取断点日志 - 记录长时间爬取中已完成的分页和详情
+每完成一页（原始响应）或一个详情就追加一行JSON到 DATA_DIR/journal/{任务}.jsonl；
+爬取中断（令牌过期、断网等）后重新运行同一任务时，已完成的分页和详情直接从日志读取，
+只请求剩下的部分。任务全部完成后删除日志。
+"""
+
+import json
+import os
+import re
+import threading
+import time
+import logging
+from typing import Dict, Any, Optional
+import config
+
+logger = logging.getLogger(__name__)
+
+# 断点默认有效期（秒），可在config.py中通过SCRAPE_JOURNAL_TTL覆盖；过期的断点不再使用
+DEFAULT_TTL = 24 * 3600
+
+
+class ScrapeJournal:
+    """单个爬取任务的断点日志（追加写入，线程安全）"""
+    
+    def __init__(self, job: str, root: str = None, ttl: int = None):
+        """
+        打开（或创建）任务的断点日志
+        
+        Args:
+            job: 任务名称，如 "scrape_all_2025-01-15"
+            root: 日志目录（默认 DATA_DIR/journal）
+            ttl: 有效期（秒），日志创建时间超过有效期时重新开始
+        """
+        self.job = job
+        self.root = root or os.path.join(config.DATA_DIR, 'journal')
+        os.makedirs(self.root, exist_ok=True)
+        self.path = os.path.join(self.root, re.sub(r'[^\w.-]+', '_', job) + '.jsonl')
+        self.ttl = ttl if ttl is not None else getattr(config, 'SCRAPE_JOURNAL_TTL', DEFAULT_TTL)
+        
+        self.created_at = time.time()
+        self._pages = {}  # {(实体, 页码): 原始响应}
+        self._details = {}  # {(实体, 键): 详情}
+        self._complete = set()  # 已完成的实体
+        self._lock = threading.Lock()
+        self._file = None
+        
+        self._load()
+    
+    def _load(self):
+        """读取已有日志；中断时写了一半的最后一行从文件中截掉，之后的追加从完整的行后开始"""
+        if not os.path.exists(self.path):
+            return
+        
+        entries = []
+        valid_size = 0
+        try:
+            with open(self.path, 'r+b') as f:
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        break
+                    try:
+                        entries.append(json.loads(line.decode('utf-8')))
+                    except ValueError:
+                        break
+                    valid_size += len(line)
+                
+                f.seek(0, os.SEEK_END)
+                if f.tell() > valid_size:
+                    logger.warning(f"断点日志末尾不完整，已截去 {f.tell() - valid_size} 字节: {self.path}")
+                    f.truncate(valid_size)
+        except OSError as e:
+            logger.warning(f"读取断点日志失败 {self.path}: {e}")
+            return
+        
+        if not entries or entries[0].get('type') != 'header':
+            logger.warning(f"断点日志格式错误，重新开始: {self.path}")
+            self.discard()
+            return
+        
+        created_at = entries[0].get('created_at', 0)
+        if time.time() - created_at > self.ttl:
+            logger.info(f"断点日志已过期，重新开始: {self.job}")
+            self.discard()
+            return
+        
+        self.created_at = created_at
+        for entry in entries[1:]:
+            kind = entry.get('type')
+            if kind == 'page':
+                self._pages[(entry['entity'], entry['page'])] = entry['data']
+            elif kind == 'detail':
+                self._details[(entry['entity'], str(entry['key']))] = entry['data']
+            elif kind == 'complete':
+                self._complete.add(entry['entity'])
+        
+        logger.info(f"从断点继续 {self.job}: 已完成 {len(self._pages)} 页, {len(self._details)} 条详情")
+    
+    def _append(self, entry: Dict[str, Any]):
+        """追加一行并立即刷新到磁盘（调用方需持有锁）"""
+        if self._file is None:
+            is_new = not os.path.exists(self.path)
+            self._file = open(self.path, 'a', encoding='utf-8')
+            if is_new:
+                self._file.write(json.dumps({'type': 'header', 'job': self.job, 'created_at': self.created_at}) + '\n')
+        self._file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        self._file.flush()
+    
+    def page(self, entity: str, page: int) -> Optional[Any]:
+        """已完成分页的原始响应，没有时返回None"""
+        with self._lock:
+            return self._pages.get((entity, page))
+    
+    def record_page(self, entity: str, page: int, response: Any):
+        """记录已完成的分页"""
+        with self._lock:
+            self._pages[(entity, page)] = response
+            self._append({'type': 'page', 'entity': entity, 'page': page, 'data': response})
+    
+    def has_detail(self, entity: str, key) -> bool:
+        with self._lock:
+            return (entity, str(key)) in self._details
+    
+    def detail(self, entity: str, key) -> Optional[Any]:
+        """已完成的详情，没有时返回None"""
+        with self._lock:
+            return self._details.get((entity, str(key)))
+    
+    def record_detail(self, entity: str, key, data: Any):
+        """记录已完成的详情"""
+        with self._lock:
+            self._details[(entity, str(key))] = data
+            self._append({'type': 'detail', 'entity': entity, 'key': str(key), 'data': data})
+    
+    def mark_complete(self, entity: str):
+        """标记实体的所有分页已获取完毕"""
+        with self._lock:
+            if entity not in self._complete:
+                self._complete.add(entity)
+                self._append({'type': 'complete', 'entity': entity})
+    
+    def is_complete(self, entity: str) -> bool:
+        with self._lock:
+            return entity in self._complete
+    
+    def close(self):
+        """关闭日志文件（保留断点）"""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+    
+    def discard(self):
+        """删除断点日志"""
+        self.close()
+        with self._lock:
+            self._pages.clear()
+            self._details.clear()
+            self._complete.clear()
+            self.created_at = time.time()
+            if os.path.exists(self.path):
+                os.remove(self.path)
+    
+    def finish(self):
+        """任务全部完成，删除断点日志"""
+        self.discard()
+        logger.info(f"✓ {self.job} 已全部完成，清除断点")
@@ -0,0 +1,327 @@
+"""
+快照存储 - 将爬取的订单、路线、司机按实体和日期分区保存为Parquet列式文件
+目录结构: DATA_DIR/snapshots/{实体}/date=YYYY-MM-DD/part-00001.parquet
+按状态过滤获取的数据单独存放: DATA_DIR/snapshots/{实体}/statuses=a+b/date=YYYY-MM-DD/
+爬取时每页数据到达后立即写入临时分区，全部获取完毕后整体替换旧分区；
+账单、排班、统计界面可以直接按日期范围读取需要的列，无需重新请求API。
+需要安装 pyarrow，未安装时快照功能自动关闭。
+"""
+
+import json
+import os
+import shutil
+import time
+import uuid
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional, Iterable
+import config
+
+logger = logging.getLogger(__name__)
+
+META_FILE = '_meta.json'
+
+# 仍可能发生变化的订单状态，订单快照中有这些订单时不视为最终快照
+OPEN_STATUSES = ('pending', 'assigned', 'accepted')
+
+# 当天结束后至少多少小时保存的快照才视为最终快照（等待延迟结算的订单状态更新），
+# 可在config.py中通过SNAPSHOT_FINAL_GRACE_HOURS覆盖
+DEFAULT_FINAL_GRACE_HOURS = 6
+
+
+class SnapshotWriter:
+    """单个分区的写入器：逐页写入临时目录，commit时替换正式分区"""
+    
+    def __init__(self, store: 'SnapshotStore', entity: str, date: str, statuses: str = ''):
+        self.store = store
+        self.entity = entity
+        self.date = date
+        self.statuses = statuses
+        self.rows = 0
+        self.total = 0
+        self.open_rows = 0
+        self.json_columns = set()
+        self._parts = 0
+        self._staging = os.path.join(store.dataset_dir(entity, statuses), f".staging-{date}-{uuid.uuid4().hex[:8]}")
+        os.makedirs(self._staging)
+    
+    def write_page(self, records: List[Dict[str, Any]], total: int = 0):
+        """
+        写入一页数据
+        
+        Args:
+            records: 本页记录
+            total: 服务器返回的总数（用于判断快照是否完整）
+        """
+        if total:
+            self.total = total
+        if not records:
+            return
+        
+        import pyarrow.parquet as pq
+        
+        table, json_columns = self.store.to_table(records)
+        self.json_columns.update(json_columns)
+        self._parts += 1
+        pq.write_table(table, os.path.join(self._staging, f"part-{self._parts:05d}.parquet"))
+        self.rows += len(records)
+        if self.entity == 'rides':
+            self.open_rows += sum(1 for record in records if record.get('status') in OPEN_STATUSES)
+    
+    def commit(self) -> bool:
+        """
+        替换正式分区
+        
+        Returns:
+            是否已写入（服务器总数大于实际获取数时视为不完整，放弃写入）
+        """
+        if self.total and self.rows < self.total:
+            logger.warning(f"{self.entity} {self.date} 快照不完整 ({self.rows}/{self.total})，不保存")
+            self.abort()
+            return False
+        
+        with open(os.path.join(self._staging, META_FILE), 'w', encoding='utf-8') as f:
+            json.dump({
+                'entity': self.entity,
+                'date': self.date,
+                'statuses': self.statuses,
+                'rows': self.rows,
+                'open_rows': self.open_rows,
+                'taken_at': time.time(),
+                'json_columns': sorted(self.json_columns)
+            }, f, ensure_ascii=False)
+        
+        target = self.store.partition_dir(self.entity, self.date, self.statuses)
+        trash = None
+        if os.path.exists(target):
+            trash = self._staging + '.old'
+            os.rename(target, trash)
+        os.rename(self._staging, target)
+        if trash:
+            shutil.rmtree(trash, ignore_errors=True)
+        
+        logger.info(f"✓ 已保存 {self.entity} {self.date} 快照: {self.rows} 条")
+        return True
+    
+    def abort(self):
+        """丢弃临时分区"""
+        shutil.rmtree(self._staging, ignore_errors=True)
+
+
+class SnapshotStore:
+    """按实体和日期分区的Parquet快照"""
+    
+    ENTITIES = ('rides', 'routes', 'drivers')
+    
+    def __init__(self, root: str = None):
+        """
+        初始化快照存储
+        
+        Args:
+            root: 快照根目录（默认 DATA_DIR/snapshots）
+        """
+        self.root = root or os.path.join(config.DATA_DIR, 'snapshots')
+        os.makedirs(self.root, exist_ok=True)
+    
+    @staticmethod
+    def is_available() -> bool:
+        """是否已安装pyarrow"""
+        import importlib.util
+        return importlib.util.find_spec('pyarrow') is not None
+    
+    @staticmethod
+    def normalize_statuses(statuses: str) -> str:
+        """状态过滤条件的规范形式（排序去重），空字符串表示所有状态"""
+        return '+'.join(sorted({s.strip() for s in (statuses or '').split(',') if s.strip()}))
+    
+    def dataset_dir(self, entity: str, statuses: str = '') -> str:
+        """实体目录（按状态过滤的数据在 statuses=... 子目录下）"""
+        path = os.path.join(self.root, entity)
+        scope = self.normalize_statuses(statuses)
+        if scope:
+            path = os.path.join(path, f"statuses={scope}")
+        os.makedirs(path, exist_ok=True)
+        return path
+    
+    def partition_dir(self, entity: str, date: str, statuses: str = '') -> str:
+        """分区目录"""
+        return os.path.join(self.dataset_dir(entity, statuses), f"date={date}")
+    
+    @staticmethod
+    def to_table(records: List[Dict[str, Any]]):
+        """
+        将记录转换为Arrow表
+        
+        嵌套的字典/列表保存为JSON字符串；同一列类型不一致时整列转为字符串。
+        
+        Returns:
+            (pyarrow.Table, JSON编码的列名集合)
+        """
+        import pyarrow as pa
+        
+        columns = {}
+        for record in records:
+            for key in record:
+                if key not in columns:
+                    columns[key] = None
+        
+        arrays = {}
+        json_columns = set()
+        for column in columns:
+            values = [record.get(column) for record in records]
+            if any(isinstance(v, (dict, list)) for v in values):
+                json_columns.add(column)
+                values = [None if v is None else json.dumps(v, ensure_ascii=False) for v in values]
+            try:
+                arrays[column] = pa.array(values)
+            except (pa.ArrowInvalid, pa.ArrowTypeError, OverflowError):
+                arrays[column] = pa.array([None if v is None else str(v) for v in values], type=pa.string())
+        
+        return pa.table(arrays), json_columns
+    
+    def writer(self, entity: str, date: str = None, statuses: str = '') -> SnapshotWriter:
+        """
+        创建分区写入器
+        
+        Args:
+            entity: 实体名称（rides/routes/drivers）
+            date: 分区日期（默认今天）
+            statuses: 获取数据时使用的状态过滤条件
+        """
+        return SnapshotWriter(self, entity, date or datetime.now().strftime('%Y-%m-%d'),
+                              self.normalize_statuses(statuses))
+    
+    def write(self, entity: str, date: str, records: List[Dict[str, Any]]) -> bool:
+        """一次写入整个分区"""
+        writer = self.writer(entity, date)
+        writer.write_page(records)
+        return writer.commit()
+    
+    def meta(self, entity: str, date: str, statuses: str = '') -> Optional[Dict[str, Any]]:
+        """分区元数据，分区不存在时返回None"""
+        path = os.path.join(self.partition_dir(entity, date, statuses), META_FILE)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.warning(f"读取快照元数据失败 {path}: {e}")
+            return None
+    
+    def has(self, entity: str, date: str, final: bool = False, statuses: str = '') -> bool:
+        """
+        是否有该日期的快照
+        
+        Args:
+            final: 为True时只认可当天结束 SNAPSHOT_FINAL_GRACE_HOURS 小时之后保存、
+                   且不含未完结订单（OPEN_STATUSES）的快照（订单状态不会再变化）
+            statuses: 状态过滤条件（空字符串表示完整快照）
+        """
+        meta = self.meta(entity, date, statuses)
+        if meta is None:
+            return False
+        if final:
+            grace = getattr(config, 'SNAPSHOT_FINAL_GRACE_HOURS', DEFAULT_FINAL_GRACE_HOURS)
+            settled_at = datetime.strptime(date, '%Y-%m-%d') + timedelta(days=1, hours=grace)
+            if datetime.fromtimestamp(meta.get('taken_at', 0)) < settled_at:
+                return False
+            # 旧版本保存的快照没有 open_rows，无法确认，不视为最终快照
+            return meta.get('open_rows') == 0
+        return True
+    
+    def dates(self, entity: str, statuses: str = '') -> List[str]:
+        """已保存快照的日期列表"""
+        path = self.dataset_dir(entity, statuses)
+        dates = []
+        for name in os.listdir(path):
+            if name.startswith('date=') and os.path.exists(os.path.join(path, name, META_FILE)):
+                dates.append(name[len('date='):])
+        return sorted(dates)
+    
+    @staticmethod
+    def _date_range(start_date: str, end_date: str = None) -> List[str]:
+        """日期范围内的每一天"""
+        start = datetime.strptime(start_date, '%Y-%m-%d')
+        end = datetime.strptime(end_date or start_date, '%Y-%m-%d')
+        return [(start + timedelta(days=i)).strftime('%Y-%m-%d') for i in range((end - start).days + 1)]
+    
+    def _tables(self, entity: str, dates: Iterable[str], columns: Optional[List[str]], statuses: str = ''):
+        """逐个读取分区文件，只读取需要的列"""
+        import pyarrow.parquet as pq
+        
+        for date in dates:
+            meta = self.meta(entity, date, statuses)
+            if meta is None:
+                continue
+            partition = self.partition_dir(entity, date, statuses)
+            for name in sorted(os.listdir(partition)):
+                if not name.endswith('.parquet'):
+                    continue
+                path = os.path.join(partition, name)
+                if columns is not None:
+                    available = set(pq.read_schema(path).names)
+                    table = pq.read_table(path, columns=[c for c in columns if c in available])
+                else:
+                    table = pq.read_table(path)
+                yield meta, table
+    
+    def read_records(self, entity: str, start_date: str, end_date: str = None,
+                     columns: Optional[List[str]] = None, statuses: str = '') -> List[Dict[str, Any]]:
+        """
+        读取日期范围内的记录
+        
+        Args:
+            entity: 实体名称
+            start_date: 开始日期
+            end_date: 结束日期（包含，默认与开始日期相同）
+            columns: 只读取这些列（默认全部）
+            statuses: 读取按该状态过滤条件保存的快照（默认完整快照）
+        
+        Returns:
+            记录列表，JSON编码的列还原为字典/列表
+        """
+        records = []
+        for meta, table in self._tables(entity, self._date_range(start_date, end_date), columns, statuses):
+            json_columns = set(meta.get('json_columns', [])) & set(table.column_names)
+            rows = table.to_pylist()
+            for row in rows:
+                for column in json_columns:
+                    if row.get(column) is not None:
+                        row[column] = json.loads(row[column])
+            records.extend(rows)
+        return records
+    
+    def read(self, entity: str, start_date: str, end_date: str = None,
+             columns: Optional[List[str]] = None, statuses: str = ''):
+        """
+        读取日期范围内的数据为DataFrame（JSON编码的列保持字符串）
+        
+        Args:
+            entity: 实体名称
+            start_date: 开始日期
+            end_date: 结束日期（包含，默认与开始日期相同）
+            columns: 只读取这些列（默认全部）
+            statuses: 读取按该状态过滤条件保存的快照（默认完整快照）
+        
+        Returns:
+            pandas.DataFrame
+        """
+        import pandas as pd
+        import pyarrow as pa
+        
+        tables = [table for _, table in self._tables(entity, self._date_range(start_date, end_date), columns, statuses)]
+        if not tables:
+            return pd.DataFrame(columns=columns or [])
+        
+        # pyarrow 14 起用 promote_options 代替 promote 参数
+        if int(pa.__version__.split('.')[0]) >= 14:
+            promote = {'promote_options': 'permissive'}
+        else:
+            promote = {'promote': True}
+        
+        try:
+            return pa.concat_tables(tables, **promote).to_pandas()
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            # 不同分页的列类型不一致，逐个转换后合并
+            return pd.concat([t.to_pandas() for t in tables], ignore_index=True)
@@ -0,0 +1,129 @@
+"""
+按司机+时间段查找订单：服务器过滤（find_rides / ride_matcher）与本地副本索引（RideIndex）
+两条路径对 Z 结尾（UTC）的上车时间必须选出相同的订单。
+"""
+
+import importlib.util
+import math
+import os
+import sys
+import unittest
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+if importlib.util.find_spec('config') is None:
+    # 没有本地 config.py 时使用 config.example.py
+    spec = importlib.util.spec_from_file_location('config', os.path.join(ROOT, 'config.example.py'))
+    sys.modules['config'] = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(sys.modules['config'])
+
+from real_api_scraper import RealAPIScraper
+from ride_index import RideIndex
+from time_utils import day_window
+
+DATE = '2025-01-15'
+
+RIDES = [
+    # 13:30Z = 纽约 08:30，在 08:00-09:00 内
+    {'id': 1, 'driver_id': 7, 'status': 'assigned', 'pickup_at': '2025-01-15T13:30:00.000000Z'},
+    # 08:30Z = 纽约 03:30，不在时间段内
+    {'id': 2, 'driver_id': 7, 'status': 'assigned', 'pickup_at': '2025-01-15T08:30:00.000000Z'},
+    # 空格分隔的时间视为本地时间
+    {'id': 3, 'driver_id': 7, 'status': 'accepted', 'pickup_at': '2025-01-15 08:59:30'},
+    {'id': 4, 'driver_id': 7, 'status': 'assigned', 'pickup_at': '2025-01-15 09:01:00'},
+    # 没有上车时间的订单两条路径都保留
+    {'id': 5, 'driver_id': 7, 'status': 'assigned', 'pickup_at': ''},
+    {'id': 6, 'driver_id': 8, 'status': 'assigned', 'pickup_at': '2025-01-15T13:45:00Z'},
+]
+
+
+class FakeAPI:
+    """忽略所有过滤条件、按页返回全部订单的 /fleet/rides"""
+    
+    def get(self, endpoint, params=None):
+        per_page = params['per_page']
+        page = params['page']
+        last_page = max(1, math.ceil(len(RIDES) / per_page))
+        return {'rides': {
+            'data': RIDES[(page - 1) * per_page:page * per_page],
+            'total': len(RIDES),
+            'last_page': last_page,
+            'next_page_url': None if page >= last_page else 'next'
+        }}
+
+
+class FilteringFakeAPI(FakeAPI):
+    """按 from_datetime/to_datetime 在服务器端过滤的 /fleet/rides，不带时区的时间按UTC理解"""
+    
+    @staticmethod
+    def parse(value):
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+    
+    def get(self, endpoint, params=None):
+        start, end = self.parse(params['from_datetime']), self.parse(params['to_datetime'])
+        rides = [ride for ride in RIDES
+                 if not ride['pickup_at'] or start <= self.parse(ride['pickup_at']) <= end]
+        per_page = params['per_page']
+        page = params['page']
+        last_page = max(1, math.ceil(len(rides) / per_page))
+        return {'rides': {
+            'data': rides[(page - 1) * per_page:page * per_page],
+            'total': len(rides),
+            'last_page': last_page,
+            'next_page_url': None if page >= last_page else 'next'
+        }}
+
+
+class RideWindowTest(unittest.TestCase):
+    
+    def index_ids(self, driver_id, start_time, end_time):
+        start, end = day_window(DATE, start_time, end_time)
+        rides = RideIndex(RIDES).between(start, end, driver_id=driver_id, include_untimed=True)
+        return sorted(ride['id'] for ride in rides)
+    
+    def matcher_ids(self, driver_id, start_time, end_time):
+        match = RealAPIScraper.ride_matcher(DATE, driver_id=driver_id, start_time=start_time, end_time=end_time)
+        return sorted(ride['id'] for ride in RIDES if match(ride))
+    
+    def find_rides_ids(self, driver_id, start_time, end_time, api=None):
+        scraper = RealAPIScraper.__new__(RealAPIScraper)
+        scraper.api = api or FakeAPI()
+        rides = scraper.find_rides(DATE, driver_id=driver_id, start_time=start_time, end_time=end_time, per_page=2)
+        return sorted(ride['id'] for ride in rides)
+    
+    def test_utc_stamps_use_local_time_on_both_paths(self):
+        expected = [1, 3, 5]
+        self.assertEqual(self.index_ids(7, '08:00', '09:00'), expected)
+        self.assertEqual(self.matcher_ids(7, '08:00', '09:00'), expected)
+        self.assertEqual(self.find_rides_ids(7, '08:00', '09:00'), expected)
+    
+    def test_paths_agree_for_every_window(self):
+        for driver_id in (7, '7', 8):
+            for start_time, end_time in [('00:00', '23:59'), ('03:00', '04:00'), ('08:30', '08:30'),
+                                         ('08:45', '09:01'), ('09:02', '23:59')]:
+                with self.subTest(driver_id=driver_id, window=(start_time, end_time)):
+                    expected = self.index_ids(driver_id, start_time, end_time)
+                    self.assertEqual(self.matcher_ids(driver_id, start_time, end_time), expected)
+                    self.assertEqual(self.find_rides_ids(driver_id, start_time, end_time), expected)
+    
+    def test_server_side_window_keeps_edge_rides(self):
+        # 服务器按 from_datetime/to_datetime 过滤时，时间段边界上的订单不能在本地过滤之前被丢掉
+        api = FilteringFakeAPI()
+        self.assertEqual(self.find_rides_ids(7, '08:00', '09:00', api=api), [1, 5])
+        self.assertEqual(self.find_rides_ids(7, '08:30', '08:30', api=api), [1, 5])
+        self.assertEqual(self.find_rides_ids(8, '08:45', '08:45', api=api), [6])
+        self.assertEqual(self.find_rides_ids(7, '03:00', '04:00', api=api), [2, 5])
+    
+    def test_query_window_has_explicit_offset(self):
+        params = RealAPIScraper.rides_query_params(DATE, start_time='08:00', end_time='09:00')
+        self.assertEqual(params['from_datetime'], '2025-01-15T08:00:00-05:00')
+        self.assertEqual(params['to_datetime'], '2025-01-15T09:01:00-05:00')
+        summer = RealAPIScraper.rides_query_params('2025-07-15', start_time='08:00', end_time='09:00')
+        self.assertEqual(summer['from_datetime'], '2025-07-15T08:00:00-04:00')
+
+
+if __name__ == '__main__':
+    unittest.main()
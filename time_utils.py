@@ -0,0 +1,136 @@
+"""
+时间工具 - 订单时间（pickup_at等）的统一解析
+时区只解析一次；ISO格式（带T、Z或时区偏移）转换为纽约本地时间，
+空格分隔的时间视为已经是本地时间。相同的时间字符串只解析一次（缓存），
+整页/整天的订单可以用 pickup_minutes_array 一次性向量化解析。
+"""
+
+import functools
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+import pytz
+
+logger = logging.getLogger(__name__)
+
+# 订单时间统一换算到的本地时区
+LOCAL_TIMEZONE = 'America/New_York'
+LOCAL_TZ = pytz.timezone(LOCAL_TIMEZONE)
+
+# 缓存的不同时间字符串数量（同一天的订单上车时间大量重复）
+PARSE_CACHE_SIZE = 65536
+
+# 带时区信息（Z 或 ±HH:MM）的时间字符串
+_AWARE_PATTERN = r'(?:Z|[+-]\d{2}:?\d{2})$'
+
+
+@functools.lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse_local(value: str) -> Optional[datetime]:
+    """
+    将时间字符串解析为本地时间（不带tzinfo，便于与 datetime.now() 比较）
+    
+    Args:
+        value: "2025-01-15T13:30:00.000000Z"、"2025-01-15T08:30:00-05:00"、"2025-01-15 08:30:00" 等
+    
+    Returns:
+        本地时间，空值或无法解析时返回None
+    """
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except (TypeError, ValueError):
+        try:
+            parsed = datetime.strptime(value, '%Y-%m-%d %H:%M:%S')
+        except (TypeError, ValueError):
+            return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(LOCAL_TZ).replace(tzinfo=None)
+    return parsed
+
+
+def pickup_minutes(value: str) -> Optional[int]:
+    """本地时间在一天中的分钟数（0-1439），无法解析时返回None"""
+    parsed = parse_local(value)
+    if parsed is None:
+        return None
+    return parsed.hour * 60 + parsed.minute
+
+
+def day_window(date: str, start_time: str = '00:00', end_time: str = '23:59'):
+    """
+    将日期和 "HH:MM" 时间段转换为 [开始, 结束) 的本地时间区间
+    
+    结束时间包含整分钟（end_time="12:00" 时 12:00:59 的订单也在区间内）。
+    订单时间按 parse_local 换算为本地时间后再与区间比较。
+    """
+    start = datetime.strptime(f"{date} {start_time}", '%Y-%m-%d %H:%M')
+    end = datetime.strptime(f"{date} {end_time}", '%Y-%m-%d %H:%M') + timedelta(minutes=1)
+    return start, end
+
+
+def local_isoformat(value: datetime) -> str:
+    """本地时间（不带tzinfo）转换为带时区偏移的ISO字符串，如 "2025-01-15T08:00:00-05:00"（夏令时自动处理）"""
+    return LOCAL_TZ.localize(value).isoformat()
+
+
+def in_window(value: str, start: datetime, end: datetime) -> Optional[bool]:
+    """
+    时间字符串（换算为本地时间后）是否在 [start, end) 内
+    
+    Returns:
+        True/False，空值或无法解析时返回None（由调用方决定是否保留）
+    """
+    parsed = parse_local(value)
+    if parsed is None:
+        return None
+    return start <= parsed < end
+
+
+def parse_local_series(values):
+    """
+    向量化解析一组时间字符串
+    
+    Args:
+        values: 时间字符串列表或 pandas.Series
+    
+    Returns:
+        pandas.Series[datetime64]（本地时间，不带时区），空值或无法解析时为NaT
+    """
+    import numpy as np
+    import pandas as pd
+    
+    strings = pd.Series(values, dtype='object').fillna('').astype(str)
+    local = np.full(len(strings), np.datetime64('NaT'), dtype='datetime64[ns]')
+    
+    aware = strings.str.contains(_AWARE_PATTERN, regex=True).to_numpy(dtype=bool)
+    if aware.any():
+        converted = pd.to_datetime(strings[aware], utc=True, errors='coerce', format='ISO8601')
+        local[aware] = converted.dt.tz_convert(LOCAL_TIMEZONE).dt.tz_localize(None).to_numpy(dtype='datetime64[ns]')
+    
+    naive = ~aware & (strings != '').to_numpy(dtype=bool)
+    if naive.any():
+        local[naive] = pd.to_datetime(strings[naive], errors='coerce', format='ISO8601').to_numpy(dtype='datetime64[ns]')
+    return pd.Series(local, index=strings.index)
+
+
+def pickup_minutes_array(rides: List[Dict[str, Any]], field: str = 'pickup_at'):
+    """
+    一次性计算一组订单的上车时间在一天中的分钟数
+    
+    Args:
+        rides: 订单列表
+        field: 时间字段
+    
+    Returns:
+        numpy.ndarray[int]，与 rides 一一对应，没有时间或无法解析时为 -1
+    """
+    import numpy as np
+    
+    if not rides:
+        return np.empty(0, dtype=np.int64)
+    
+    local = parse_local_series([ride.get(field) for ride in rides])
+    minutes = (local.dt.hour * 60 + local.dt.minute).fillna(-1)
+    return minutes.to_numpy(dtype=np.int64)
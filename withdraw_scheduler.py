@@ -0,0 +1,136 @@
+"""
+退工定时调度器 - 按截止时间精确触发自动退工
+每个订单在堆中保留一个条目（截止时间 = pick up时间 - 提前分钟数），
+后台线程休眠到最近的截止时间后立即执行回调，不依赖轮询周期。
+"""
+
+import heapq
+import itertools
+import threading
+import time
+import logging
+from typing import Dict, Any, Callable, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class WithdrawScheduler:
+    """基于最小堆的截止时间调度器"""
+    
+    def __init__(self, callback: Callable[[Any, Dict[str, Any]], None]):
+        """
+        初始化调度器
+        
+        Args:
+            callback: 到达截止时间时调用 callback(ride_id, info)，在调度线程中执行
+        """
+        self.callback = callback
+        self._heap = []  # [(deadline, seq, ride_id)]
+        self._entries = {}  # {ride_id: (deadline, seq, info)}
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._running = False
+        self._thread = None
+    
+    def start(self):
+        """启动调度线程"""
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        """停止调度线程，未到期的条目全部丢弃"""
+        with self._cond:
+            self._running = False
+            self._heap.clear()
+            self._entries.clear()
+            self._cond.notify()
+    
+    def schedule(self, ride_id, deadline: float, info: Dict[str, Any] = None):
+        """
+        登记或更新订单的截止时间
+        
+        Args:
+            ride_id: 订单ID
+            deadline: 截止时间（epoch秒），已过期的条目会立即触发
+            info: 传给回调的订单信息
+        """
+        with self._cond:
+            current = self._entries.get(ride_id)
+            if current is not None and current[0] == deadline:
+                # 截止时间没变，只更新信息
+                self._entries[ride_id] = (deadline, current[1], info or {})
+                return
+            
+            seq = next(self._seq)
+            self._entries[ride_id] = (deadline, seq, info or {})
+            heapq.heappush(self._heap, (deadline, seq, ride_id))
+            # 新条目可能比当前等待的截止时间更早，唤醒调度线程重新计算
+            self._cond.notify()
+    
+    def cancel(self, ride_id):
+        """取消订单的定时退工（堆中的旧条目在弹出时丢弃）"""
+        with self._cond:
+            self._entries.pop(ride_id, None)
+    
+    def reconcile(self, active_ride_ids: Iterable):
+        """
+        与最新的订单分配对齐：取消不在列表中的条目
+        
+        Args:
+            active_ride_ids: 当前仍需监控的订单ID
+        """
+        active = set(active_ride_ids)
+        with self._cond:
+            for ride_id in list(self._entries):
+                if ride_id not in active:
+                    logger.info(f"订单 {ride_id} 已不在监控范围内，取消定时退工")
+                    del self._entries[ride_id]
+    
+    def next_deadline(self) -> Optional[float]:
+        """最近的截止时间"""
+        with self._cond:
+            return min((entry[0] for entry in self._entries.values()), default=None)
+    
+    def __len__(self):
+        with self._cond:
+            return len(self._entries)
+    
+    def _pop_due(self):
+        """弹出一个已到期的有效条目，没有时返回等待时间（调用方需持有锁）"""
+        while self._heap:
+            deadline, seq, ride_id = self._heap[0]
+            entry = self._entries.get(ride_id)
+            if entry is None or entry[1] != seq:
+                # 已取消或已被新的截止时间替换
+                heapq.heappop(self._heap)
+                continue
+            
+            wait = deadline - time.time()
+            if wait > 0:
+                return None, wait
+            
+            heapq.heappop(self._heap)
+            del self._entries[ride_id]
+            return (ride_id, entry[2]), 0
+        return None, None
+    
+    def _run(self):
+        """调度线程：休眠到最近的截止时间，到期后执行回调"""
+        while True:
+            with self._cond:
+                if not self._running:
+                    return
+                due, wait = self._pop_due()
+                if due is None:
+                    self._cond.wait(timeout=wait)
+                    continue
+            
+            ride_id, info = due
+            try:
+                self.callback(ride_id, info)
+            except Exception as e:
+                logger.error(f"订单 {ride_id} 定时退工回调出错: {e}", exc_info=True)